@@ -6,10 +6,92 @@ load_dotenv()
 class VAPIConfig:
     LLM_MODEL = "llama3.2:3b"
     STT_MODEL = "base"
-    TTS_ENGINE = "elevenlabs"
+    
+    # Silero VAD (ingesta en streaming: ?ingest=vad en /ws/voice)
+    VAD_SAMPLE_RATE = 16000
+    VAD_CHUNK_SIZE = 512  # ~32ms chunks
+    VAD_PRE_ROLL_MS = 100  # Incluir 100ms antes del inicio
+    VAD_THRESHOLD = 0.5
+    VAD_MIN_SILENCE_MS = 300  # Silencio que cierra un segmento de voz
+    VAD_MIN_UTTERANCE_MS = 750  # Segmentos más cortos se descartan (falsa detección)
+    VAD_MAX_UTTERANCE_S = 30  # Tope del buffer preasignado por conexión (se corta el enunciado)
+    VAD_BACKEND = os.getenv("VAD_BACKEND", "onnx")  # onnx (batch compartido entre sesiones) | torch (una inferencia por sesión)
+    VAD_ONNX_PATH = os.getenv("VAD_ONNX_PATH", "")  # Vacío: el modelo incluido en el paquete silero-vad
+    VAD_BATCH_TICK_MS = 4  # Ventana para juntar chunks de todas las sesiones en un mismo batch
+    VAD_MAX_BATCH = 256
+
+    # Servidor de modelos compartido (python -m app.services.model_server): Whisper y Silero VAD
+    # se cargan una sola vez y los workers de uvicorn los usan por un socket Unix. Vacío: modelos en proceso
+    MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+    MODEL_SERVER_STT_WORKERS = int(os.getenv("MODEL_SERVER_STT_WORKERS", "2"))  # Transcripciones simultáneas en el servidor
+    MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "60"))  # Plazo por petición de STT (segundos)
+
+    # Fin de turno adaptativo (modo VAD): en la primera pausa se transcribe lo dicho
+    # y el silencio requerido se ajusta entre MIN y MAX según lo completo que parezca
+    ENDPOINT_ENABLED = os.getenv("ENDPOINT_ENABLED", "1") == "1"  # 0: silencio fijo VAD_MIN_SILENCE_MS
+    ENDPOINT_MIN_SILENCE_MS = 250  # Pausa que dispara la transcripción parcial (y fin de turno más rápido posible)
+    ENDPOINT_MAX_SILENCE_MS = 1200  # Tope cuando la frase parece incompleta
+    ENDPOINT_BASELINE_MS = 1500  # Silencio fijo del cliente (vadConfig.silenceDuration), para medir el ahorro
+
+    # LLM especulativo: arranca con la transcripción parcial mientras se confirma el fin de turno
+    LLM_SPECULATIVE = os.getenv("LLM_SPECULATIVE", "1") == "1"
+    LLM_SPECULATIVE_MIN_COMPLETENESS = 0.4  # No especular sobre frases claramente a medias
+
+    # Historial: sesiones inactivas más de RETENTION_DAYS se archivan (JSONL gzip) y se borran
+    RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "90"))  # 0 desactiva la retención
+    ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+    RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "6"))
+    # API de historial (/v1/history*): exige 'Authorization: Bearer <token>'. Vacío: la API no se sirve
+    HISTORY_API_TOKEN = os.getenv("HISTORY_API_TOKEN", "")
+
+    # Trazas por turno (decode, STT, LLM, TTS, envío): off | console | file (OTLP/JSON, una línea por turno)
+    TRACE_EXPORT = os.getenv("TRACE_EXPORT", "off")
+    TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+    TRACE_CLIENT_TIMINGS = os.getenv("TRACE_CLIENT_TIMINGS", "1") == "1"  # Mensaje 'timings' al cliente tras cada turno
+
+    # Métricas Prometheus (/metrics) y executor de asyncio.to_thread (STT, LLM, BD)
+    THREADPOOL_MAX_WORKERS = int(os.getenv("THREADPOOL_MAX_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+    LOOP_LAG_INTERVAL = 0.5  # Segundos entre muestras del retraso del event loop
+
+    # Control de admisión (por worker): con saturación se rechazan sesiones y turnos nuevos
+    # con un mensaje 'busy' y retry_after en vez de ralentizar a todas las sesiones admitidas
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"  # 0: se mide pero no se rechaza ni se encola
+    ADMISSION_MAX_SESSIONS = int(os.getenv("ADMISSION_MAX_SESSIONS", "100"))
+    ADMISSION_MAX_TURNS = int(os.getenv("ADMISSION_MAX_TURNS", "8"))  # Turnos STT->LLM->TTS simultáneos; el resto espera en cola
+    ADMISSION_MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", "2.0"))  # Espera estimada a partir de la cual se rechaza
+    # Etapas en curso admitidas antes de considerarlas con cola (etapa:límite, separados por comas)
+    ADMISSION_STAGE_LIMITS = {
+        stage: int(limit) for stage, limit in
+        (item.split(":") for item in os.getenv("ADMISSION_STAGE_LIMITS", "stt:4,llm:4,tts:8").split(",") if item.strip())
+    }
+    ADMISSION_STAGE_ESTIMATES_S = {"stt": 1.0, "llm": 1.5, "tts": 0.8}  # Duraciones iniciales hasta tener medidas (EWMA)
+
+    # Grabación de turnos para reproducirlos offline (benchmarks/replay.py). Vacío: desactivada
+    TURN_RECORD_DIR = os.getenv("TURN_RECORD_DIR", "")
+    TURN_RECORD_SAMPLE = float(os.getenv("TURN_RECORD_SAMPLE", "1.0"))  # Fracción de turnos que se graban
+
+    TTS_ENGINE = os.getenv("TTS_ENGINE", "elevenlabs")
+    # Motores de respaldo en orden de preferencia (separados por comas).
+    # 'synthetic' (tono de prueba) sólo para pruebas de carga: hay que pedirlo explícitamente
+    TTS_FALLBACK_ENGINES = [e.strip() for e in os.getenv("TTS_FALLBACK_ENGINES", "espeak").split(",") if e.strip()]
+    TTS_ENGINE_TIMEOUT = float(os.getenv("TTS_ENGINE_TIMEOUT", "6.0"))  # Plazo máximo por motor antes de conmutar
+    TTS_LATENCY_BUDGET = 3.0  # Latencia media (EWMA) a partir de la cual el motor se considera degradado
+    TTS_LATENCY_MIN_SAMPLES = 3  # Respuestas medidas antes de que la latencia media pueda abrir el circuito
+    TTS_BREAKER_FAILURES = 3  # Fallos consecutivos que abren el circuito
+    TTS_BREAKER_RESET_SECONDS = 30  # Tiempo en abierto antes de dejar pasar una petición de prueba
+    ESPEAK_VOICE = os.getenv("ESPEAK_VOICE", "es")
+    
+    # Phrase bank: frases fijas pre-sintetizadas al arrancar
+    PHRASE_BANK_PATH = os.getenv("PHRASE_BANK_PATH", "")  # JSON opcional con frases extra (lista de strings)
+    PHRASE_BANK_BUNDLE = os.getenv("PHRASE_BANK_BUNDLE", "phrase_bank.zip")  # Audio persistido entre reinicios
+    # Fin de examen con la plantilla fija EXAM_TIME_UP_MESSAGE (audio del banco, sin LLM ni TTS).
+    # Por defecto lo redacta el LLM; si su texto coincide con una frase del banco se sirve igualmente desde él
+    EXAM_TIME_UP_TEMPLATE = os.getenv("EXAM_TIME_UP_TEMPLATE", "0") == "1"
     
     # Configuración de Comportamiento Proactivo (VitalBot)
     IDLE_TIMEOUT_SECONDS = 45
+    SESSION_GRACE_SECONDS = int(os.getenv("SESSION_GRACE_SECONDS", "120"))  # Ventana para reconectar con el mismo client_id
+    SESSION_REGISTRY_MAX = 1000  # Sesiones en espera como máximo (guardan el último audio)
     
     # ExaBot Configuration
     EXAM_TOTAL_TIME = 150  # 2.5 minutos
@@ -19,6 +101,19 @@ class VAPIConfig:
     # ElevenLabs Configuration
     ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY", "")
     ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "LnGOA2SxH2fX1e1iNzEp")
-    ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1/text-to-speech"
+    ELEVENLABS_API_URL = os.getenv("ELEVENLABS_API_URL", "https://api.elevenlabs.io/v1/text-to-speech")
+    
+    # Cliente HTTP compartido para TTS (keep-alive, HTTP/2, timeouts por etapa)
+    TTS_HTTP2 = os.getenv("TTS_HTTP2", "1") == "1"
+    TTS_MAX_CONNECTIONS = int(os.getenv("TTS_MAX_CONNECTIONS", "20"))
+    TTS_MAX_KEEPALIVE = int(os.getenv("TTS_MAX_KEEPALIVE", "10"))
+    TTS_KEEPALIVE_EXPIRY = 60.0
+    TTS_CONNECT_TIMEOUT = 3.0
+    TTS_WRITE_TIMEOUT = 5.0
+    TTS_READ_TIMEOUT = 15.0
+    TTS_POOL_TIMEOUT = 2.0
+    TTS_MAX_RETRIES = 2
+    TTS_RETRY_BACKOFF = 0.25  # Segundos (base del backoff exponencial)
+    TTS_RETRY_MAX_BACKOFF = 2.0
 
 config = VAPIConfig()
\ No newline at end of file
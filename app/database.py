@@ -1,16 +1,267 @@
 import sqlite3
 import json
-from typing import List, Dict, Optional
+import gzip
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from collections import deque, OrderedDict
+from itertools import islice
+from typing import Deque, Iterator, List, Dict, Optional, Tuple
+from app.services.metrics import DB_DEAD_LETTER, DB_READ_SECONDS, DB_WRITE_QUEUE, DB_WRITE_SECONDS
 
 DB_NAME = "vapi_history.db"
+DB_BUSY_TIMEOUT_MS = 5000  # Espera ante un lock de escritura antes de dar "database is locked"
+DB_CACHED_STATEMENTS = 64  # Sentencias preparadas que sqlite3 reutiliza por conexión
+DB_WRITE_BATCH_SIZE = 64  # Filas por transacción del escritor (dispara el volcado al llenarse)
+DB_WRITE_FLUSH_MS = 50  # Espera máxima de una fila en cola antes de escribirse
+DB_WRITE_MAX_RETRIES = 5  # Reintentos de un lote con la BD bloqueada antes de desviarlo al dead-letter
+DB_WRITE_MAX_BACKOFF_MS = 2000  # Tope del backoff exponencial entre reintentos
+DB_WRITE_QUEUE_MAX = 10000  # Filas en cola como máximo; el exceso va directo al dead-letter
+DB_CONTEXT_CACHE_MESSAGES = 10  # Mensajes recientes en memoria por sesión (>= limit de get_recent_context)
+DB_CONTEXT_CACHE_BYTES = 32 * 1024 * 1024  # Tope de memoria de la caché; se expulsan las sesiones menos usadas
+DB_CONTEXT_CACHE_TTL_S = 300  # Una ventana cargada de disco se vuelve a leer pasado este tiempo
+
+INSERT_MESSAGE_SQL = '''
+    INSERT INTO conversation_history (session_id, role, content, options_json)
+    VALUES (?, ?, ?, ?)
+'''
+
+# (session_id, role, content, options_json)
+MessageRow = Tuple[str, str, str, Optional[str]]
+
+# Errores de SQLite que se resuelven solos (otro escritor tiene el lock): se reintentan
+TRANSIENT_DB_ERRORS = ("locked", "busy")
+
+def is_transient_error(e: sqlite3.Error) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and any(m in str(e).lower() for m in TRANSIENT_DB_ERRORS)
+
+# Fila completa del historial (exportación, paginación y archivo)
+HISTORY_COLUMNS = ("id", "session_id", "role", "content", "options_json", "selected_option", "created_at")
+HISTORY_SELECT = f"SELECT {', '.join(HISTORY_COLUMNS)} FROM conversation_history"
+
+# ==========================================
+# MIGRACIONES (PRAGMA user_version)
+# ==========================================
+
+def _migration_1_indexes(conn: sqlite3.Connection):
+    """(session_id, id) para el contexto reciente y created_at para la retención"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_session_id
+        ON conversation_history(session_id, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_created_at
+        ON conversation_history(created_at)
+    ''')
+    # Redundante con el compuesto (prefijo session_id)
+    conn.execute("DROP INDEX IF EXISTS idx_session_id")
+
+def _migration_2_incremental_vacuum(conn: sqlite3.Connection):
+    """auto_vacuum sólo cambia en una BD existente con un VACUUM completo (una única vez)"""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
+def _migration_3_fts(conn: sqlite3.Connection):
+    """Índice FTS5 del contenido (sin tildes, sincronizado por triggers)"""
+    # Tabla de contenido externo: el texto vive sólo en conversation_history
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS conversation_fts USING fts5(
+            content,
+            content='conversation_history',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    conn.executescript('''
+        CREATE TRIGGER IF NOT EXISTS conversation_fts_ai AFTER INSERT ON conversation_history BEGIN
+            INSERT INTO conversation_fts(rowid, content) VALUES (new.id, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS conversation_fts_ad AFTER DELETE ON conversation_history BEGIN
+            INSERT INTO conversation_fts(conversation_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS conversation_fts_au AFTER UPDATE OF content ON conversation_history BEGIN
+            INSERT INTO conversation_fts(conversation_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO conversation_fts(rowid, content) VALUES (new.id, new.content);
+        END;
+    ''')
+    # Indexar lo que ya existía
+    conn.execute("INSERT INTO conversation_fts(conversation_fts) VALUES ('rebuild')")
+
+def _migration_4_covering_context_index(conn: sqlite3.Connection):
+    """Índice cubriente (session_id, id, role, content) para el contexto reciente"""
+    # get_recent_context se resuelve sólo con el índice, sin leer la tabla;
+    # sustituye a (session_id, id), que es su prefijo
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_history_session_context
+        ON conversation_history(session_id, id, role, content)
+    ''')
+    conn.execute("DROP INDEX IF EXISTS idx_history_session_id")
+
+MIGRATIONS = [_migration_1_indexes, _migration_2_incremental_vacuum, _migration_3_fts, _migration_4_covering_context_index]
+
+# Palabras vacías que no se exigen en la búsqueda por términos ("dolor de rodilla" -> dolor, rodilla)
+SEARCH_STOPWORDS = {
+    "de", "del", "la", "el", "los", "las", "un", "una", "y", "o", "a", "al", "en", "con", "por",
+    "para", "que", "me", "mi", "se", "lo", "le", "es", "su",
+}
+
+def fts_query(text: str, phrase: bool = False) -> str:
+    """
+    Texto libre -> consulta FTS5 segura (términos entre comillas: sin operadores del usuario).
+    Sin stemmer español en FTS5: cada término se busca como prefijo (rodilla -> rodillas).
+    """
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return ""
+    if phrase:
+        return '"' + " ".join(terms) + '"'
+    content_terms = [t for t in terms if t.lower() not in SEARCH_STOPWORDS] or terms
+    return " ".join(f'"{t}"*' for t in content_terms)
+
+class ContextCache:
+    """
+    Ventana de mensajes recientes por sesión (anillo acotado), con expulsión
+    LRU entre sesiones según un tope aproximado de memoria.
+    No es thread-safe: DatabaseManager la usa bajo su _queue_cond.
+
+    Es por proceso: con varios workers de uvicorn cada uno tiene la suya y no
+    ve lo que escriben los demás. Por eso la sesión se invalida al empezar o
+    reanudarse en un worker (websocket) y cada ventana caduca a los ttl segundos.
+    """
+    MESSAGE_OVERHEAD = 200  # Bytes aproximados de dict + strings además del contenido
+
+    def __init__(
+        self,
+        max_messages: int = DB_CONTEXT_CACHE_MESSAGES,
+        max_bytes: int = DB_CONTEXT_CACHE_BYTES,
+        ttl: float = DB_CONTEXT_CACHE_TTL_S
+    ):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._sessions: "OrderedDict[str, Deque[Dict]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._loaded_at: Dict[str, float] = {}  # Momento (monotonic) de la última lectura de disco
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    @classmethod
+    def _message_size(cls, message: Dict) -> int:
+        return len(message["content"]) + cls.MESSAGE_OVERHEAD
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def get(self, session_id: str, limit: int) -> Optional[List[Dict]]:
+        window = self._sessions.get(session_id)
+        if window is not None and time.monotonic() - self._loaded_at[session_id] > self.ttl:
+            self.invalidate(session_id)
+            self.stats['expired'] += 1
+            window = None
+        if window is None or limit > self.max_messages:
+            self.stats['misses'] += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        self.stats['hits'] += 1
+        return list(islice(window, max(0, len(window) - limit), None))
+
+    def fill(self, session_id: str, messages: List[Dict]):
+        """Carga la ventana de una sesión tras un fallo (mensajes en orden cronológico)"""
+        self.invalidate(session_id)
+        self._sessions[session_id] = deque(messages[-self.max_messages:], maxlen=self.max_messages)
+        self._loaded_at[session_id] = time.monotonic()
+        self._sizes[session_id] = sum(self._message_size(m) for m in self._sessions[session_id])
+        self.total_bytes += self._sizes[session_id]
+        self._evict()
+
+    def append(self, session_id: str, message: Dict):
+        """Mantiene la ventana al día con una escritura (sólo si la sesión ya está en caché)"""
+        window = self._sessions.get(session_id)
+        if window is None:
+            return
+        size = self._message_size(message)
+        if len(window) == window.maxlen:
+            size -= self._message_size(window[0])
+        window.append(message)
+        self._sizes[session_id] += size
+        self.total_bytes += size
+        self._sessions.move_to_end(session_id)
+        self._evict()
+
+    def invalidate(self, session_id: str):
+        if self._sessions.pop(session_id, None) is not None:
+            self.total_bytes -= self._sizes.pop(session_id)
+            del self._loaded_at[session_id]
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._sessions) > 1:
+            session_id, _ = self._sessions.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(session_id)
+            del self._loaded_at[session_id]
+            self.stats['evictions'] += 1
 
 class DatabaseManager:
     def __init__(self, db_path: str = DB_NAME):
         self.db_path = db_path
+        # Filas que no se pudieron escribir (error permanente, reintentos agotados o cola llena), en JSONL
+        self.dead_letter_path = f"{os.path.splitext(db_path)[0]}.dead_letter.jsonl"
+        # Una conexión persistente por hilo (los to_thread del threadpool la reutilizan)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        # Write-behind: add_message sólo encola; un hilo escritor vuelca en lotes
+        self._queue: Deque[MessageRow] = deque()
+        self._pending: Dict[str, Deque[MessageRow]] = {}  # Filas aún no escritas, por sesión
+        self._queue_cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # Escritura del lote + retirada de pendientes es atómica para los lectores
+        self._writer: Optional[threading.Thread] = None
+        self._closing = False
+        self._write_failures = 0  # Fallos transitorios seguidos del lote más antiguo
+        DB_WRITE_QUEUE.set_function(lambda: len(self._queue))
+
+        # Contexto reciente en memoria: get_recent_context casi nunca toca disco
+        self._context_cache = ContextCache()
         self._init_db()
 
-    def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+    def _get_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                cached_statements=DB_CACHED_STATEMENTS,
+                check_same_thread=False  # Sólo la usa su hilo; close() la cierra desde el principal
+            )
+            # WAL: lectores y el escritor no se bloquean; NORMAL sólo sincroniza en checkpoint
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Vuelca la cola pendiente y cierra todas las conexiones (apagado)"""
+        with self._queue_cond:
+            self._closing = True
+            self._queue_cond.notify_all()
+        if self._writer:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+        self._closing = False
+
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
 
     def _init_db(self):
         """Inicializa el esquema de la base de datos"""
@@ -32,51 +283,328 @@ class DatabaseManager:
             )
         ''')
         
-        # Índices para mejorar velocidad de búsqueda por sesión
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_session_id 
-            ON conversation_history(session_id)
-        ''')
-        
         conn.commit()
-        conn.close()
+        
+        # Índices y demás cambios de esquema, versionados
+        self._migrate(conn)
+
+    def _migrate(self, conn: sqlite3.Connection):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, migration in enumerate(MIGRATIONS, start=1):
+            if version >= target:
+                continue
+            print(f"🗄️ Migrando historial a v{target}: {migration.__doc__}")
+            migration(conn)
+            conn.commit()
+            conn.execute(f"PRAGMA user_version={target}")
+            version = target
+
+    # ==========================================
+    # ESCRITURA DIFERIDA (write-behind)
+    # ==========================================
 
     def add_message(self, session_id: str, role: str, content: str, options: Optional[List[str]] = None):
-        """Guarda un mensaje en el historial"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
+        """Encola un mensaje del historial (no bloquea en el commit)"""
         options_str = json.dumps(options) if options else None
+        row = (session_id, role, content, options_str)
         
-        cursor.execute('''
-            INSERT INTO conversation_history (session_id, role, content, options_json)
-            VALUES (?, ?, ?, ?)
-        ''', (session_id, role, content, options_str))
+        with self._queue_cond:
+            overflow = len(self._queue) >= DB_WRITE_QUEUE_MAX
+            if not overflow:
+                self._queue.append(row)
+                self._pending.setdefault(session_id, deque()).append(row)
+                self._context_cache.append(session_id, {"role": role, "content": content})
+            if self._writer is None and not self._closing:
+                self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+                self._writer.start()
+            if len(self._queue) >= DB_WRITE_BATCH_SIZE:
+                self._queue_cond.notify()
+        if overflow:
+            # El escritor no da abasto (BD bloqueada mucho tiempo): mejor a disco aparte que memoria sin límite
+            self._dead_letter([row], "queue_full", f"cola de escritura llena ({DB_WRITE_QUEUE_MAX} mensajes)")
+
+    def _writer_loop(self):
+        while True:
+            with self._queue_cond:
+                while not self._queue and not self._closing:
+                    self._queue_cond.wait()
+                if self._closing:
+                    return
+                # Disparo por tamaño (notify) o por tiempo desde que hay filas en cola
+                self._queue_cond.wait_for(
+                    lambda: self._closing or len(self._queue) >= DB_WRITE_BATCH_SIZE,
+                    timeout=DB_WRITE_FLUSH_MS / 1000
+                )
+            if not self._write_batch():
+                time.sleep(self._retry_delay())
+
+    def _retry_delay(self) -> float:
+        """Backoff exponencial según los fallos transitorios seguidos"""
+        return min(DB_WRITE_MAX_BACKOFF_MS, DB_WRITE_FLUSH_MS * 2 ** self._write_failures) / 1000
+
+    def _write_batch(self) -> bool:
+        """
+        Escribe el lote más antiguo en una transacción. False si la BD está
+        bloqueada y hay que reintentar; los errores permanentes (y los bloqueos
+        que agotan DB_WRITE_MAX_RETRIES) desvían las filas al dead-letter.
+        """
+        with self._flush_lock:
+            with self._queue_cond:
+                rows = list(islice(self._queue, DB_WRITE_BATCH_SIZE))
+            if not rows:
+                return True
+            
+            try:
+                conn = self._get_connection()
+                with DB_WRITE_SECONDS.time(), conn:
+                    conn.executemany(INSERT_MESSAGE_SQL, rows)
+                failed = []
+            except sqlite3.Error as e:
+                if is_transient_error(e) and self._write_failures < DB_WRITE_MAX_RETRIES:
+                    self._write_failures += 1
+                    print(f"⚠️ Historial bloqueado, reintento {self._write_failures}/{DB_WRITE_MAX_RETRIES} ({len(rows)} mensajes): {e}")
+                    return False
+                print(f"❌ Error escribiendo historial ({len(rows)} mensajes): {e}")
+                # Una fila mala no debe arrastrar al resto del lote
+                failed = self._write_rows(rows) if len(rows) > 1 and not is_transient_error(e) else [(row, e) for row in rows]
+            
+            self._write_failures = 0
+            # Sólo este hilo retira de la cola: las primeras len(rows) son las escritas (o desviadas)
+            with self._queue_cond:
+                for _ in rows:
+                    row = self._queue.popleft()
+                    pending = self._pending[row[0]]
+                    pending.popleft()
+                    if not pending:
+                        del self._pending[row[0]]
+                # La ventana en caché contaba con filas que no están en la BD
+                for row, _ in failed:
+                    self._context_cache.invalidate(row[0])
+            for row, error in failed:
+                reason = "retries_exhausted" if is_transient_error(error) else "permanent_error"
+                self._dead_letter([row], reason, str(error))
+            return True
+
+    def _write_rows(self, rows: List[MessageRow]) -> List[Tuple[MessageRow, sqlite3.Error]]:
+        """Escribe fila a fila (cada una en su transacción); devuelve las que fallan con su error"""
+        failed = []
+        for row in rows:
+            try:
+                conn = self._get_connection()
+                with conn:
+                    conn.execute(INSERT_MESSAGE_SQL, row)
+            except sqlite3.Error as e:
+                failed.append((row, e))
+        return failed
+
+    def _dead_letter(self, rows: List[MessageRow], reason: str, error: str):
+        """Guarda filas no escritas en JSONL para recuperarlas a mano; nunca bloquea al escritor"""
+        DB_DEAD_LETTER.labels(reason=reason).inc(len(rows))
+        failed_at = datetime.utcnow().isoformat()
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    record = dict(zip(("session_id", "role", "content", "options_json"), row))
+                    record.update(reason=reason, error=error, failed_at=failed_at)
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            print(f"🪦 {len(rows)} mensajes del historial desviados a {self.dead_letter_path} ({reason}: {error})")
+        except OSError as e:
+            print(f"❌ {len(rows)} mensajes del historial perdidos: no se pudo escribir el dead-letter ({e})")
+
+    def flush(self):
+        """Escribe ya todo lo encolado (apagado, o antes de leer con otra conexión)"""
+        # Termina siempre: los reintentos están acotados y lo que no se escribe va al dead-letter
+        while self._queue:
+            if not self._write_batch():
+                time.sleep(self._retry_delay())
+
+    # ==========================================
+    # RETENCIÓN Y COMPACTACIÓN
+    # ==========================================
+
+    def archive_old_sessions(self, retention_days: int, archive_dir: str, batch_sessions: int = 200) -> int:
+        """
+        Mueve a ficheros JSONL gzip las sesiones sin actividad en los últimos
+        retention_days días y las borra de la BD. Devuelve las filas archivadas.
+        """
+        conn = self._get_connection()
+        cutoff = f"-{int(retention_days)} days"
         
-        conn.commit()
-        conn.close()
+        # Candidatas por el índice de created_at; se descartan las que siguen activas
+        candidates = [r[0] for r in conn.execute('''
+            SELECT DISTINCT session_id FROM conversation_history
+            WHERE created_at < datetime('now', ?)
+        ''', (cutoff,))]
+        expired = []
+        for session_id in candidates:
+            last = conn.execute('''
+                SELECT created_at FROM conversation_history
+                WHERE session_id = ? ORDER BY id DESC LIMIT 1
+            ''', (session_id,)).fetchone()
+            with self._queue_cond:
+                active = session_id in self._pending
+            if not active and last and conn.execute("SELECT ? < datetime('now', ?)", (last[0], cutoff)).fetchone()[0]:
+                expired.append(session_id)
+        if not expired:
+            return 0
+        
+        os.makedirs(archive_dir, exist_ok=True)
+        archived = 0
+        for start in range(0, len(expired), batch_sessions):
+            batch = expired[start:start + batch_sessions]
+            placeholders = ",".join("?" * len(batch))
+            path = os.path.join(archive_dir, f"history-{datetime.utcnow():%Y%m%d-%H%M%S}-{start // batch_sessions}.jsonl.gz")
+            
+            # Primero el archivo completo en disco; después el borrado (como mucho se duplica, nunca se pierde)
+            rows = 0
+            with gzip.open(path, "wt", encoding="utf-8") as archive:
+                cursor = conn.execute(
+                    f"{HISTORY_SELECT} WHERE session_id IN ({placeholders}) ORDER BY session_id, id", batch
+                )
+                for row in cursor:
+                    archive.write(json.dumps(dict(zip(HISTORY_COLUMNS, row)), ensure_ascii=False) + "\n")
+                    rows += 1
+            
+            with conn:
+                conn.execute(f"DELETE FROM conversation_history WHERE session_id IN ({placeholders})", batch)
+            with self._queue_cond:
+                for session_id in batch:
+                    self._context_cache.invalidate(session_id)
+            archived += rows
+            print(f"🗄️ {len(batch)} sesiones ({rows} mensajes) archivadas en {path}")
+        return archived
+
+    def compact(self):
+        """Devuelve al sistema las páginas libres y trunca el WAL"""
+        conn = self._get_connection()
+        # executescript lo ejecuta hasta el final (execute() sólo libera una página por llamada)
+        conn.executescript("PRAGMA incremental_vacuum;")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def invalidate_context(self, session_id: str):
+        """Olvida la ventana en caché de la sesión (empieza o se reanuda en este worker)"""
+        with self._queue_cond:
+            self._context_cache.invalidate(session_id)
 
     def get_recent_context(self, session_id: str, limit: int = 5) -> List[Dict]:
         """Recupera las últimas N interacciones para el contexto del LLM"""
+        with self._queue_cond:
+            cached = self._context_cache.get(session_id, limit)
+        if cached is not None:
+            return cached
+        
+        # Fallo de caché (sesión nueva, reconexión o expulsada): se lee la ventana completa
+        with DB_READ_SECONDS.time():
+            window = self._read_context(session_id, max(limit, DB_CONTEXT_CACHE_MESSAGES), fill_cache=True)
+        return window[-limit:]
+
+    def _read_context(self, session_id: str, limit: int, fill_cache: bool = False) -> List[Dict]:
+        """Últimos N mensajes de SQLite más los que la sesión aún tiene en cola"""
         conn = self._get_connection()
         cursor = conn.cursor() # Habilita acceso por nombre de columna
         
-        # Obtenemos los últimos N mensajes (orden descendente por tiempo)
-        cursor.execute('''
-            SELECT role, content 
-            FROM conversation_history 
-            WHERE session_id = ? 
-            ORDER BY id DESC 
-            LIMIT ?
-        ''', (session_id, limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        # Invertimos la lista para que esté en orden cronológico (antiguo -> nuevo)
-        # Formato esperado por Ollama: {'role': '...', 'content': '...'}
-        history = [{"role": r[0], "content": r[1]} for r in rows]
-        return history[::-1]
+        # Bajo _flush_lock: ninguna fila puede estar a la vez en BD y en pendientes
+        with self._flush_lock:
+            # Obtenemos los últimos N mensajes (orden descendente por tiempo)
+            cursor.execute('''
+                SELECT role, content 
+                FROM conversation_history 
+                WHERE session_id = ? 
+                ORDER BY id DESC 
+                LIMIT ?
+            ''', (session_id, limit))
+            
+            rows = cursor.fetchall()
+            with self._queue_cond:
+                pending = list(self._pending.get(session_id, ()))
+                
+                # Invertimos la lista para que esté en orden cronológico (antiguo -> nuevo)
+                # y añadimos lo que la sesión aún tiene en cola (más reciente que lo escrito)
+                # Formato esperado por Ollama: {'role': '...', 'content': '...'}
+                history = [{"role": r[0], "content": r[1]} for r in rows][::-1]
+                history += [{"role": r[1], "content": r[2]} for r in pending]
+                history = history[-limit:]
+                
+                # Bajo el mismo lock que add_message: ninguna escritura se pierde entre lectura y carga
+                if fill_cache:
+                    self._context_cache.fill(session_id, history)
+        return list(history)
+
+    # ==========================================
+    # LECTURA PARA ANALÍTICA (conexión de sólo lectura)
+    # ==========================================
+
+    @contextmanager
+    def read_only_connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Conexión mode=ro con una transacción de lectura abierta: todas las
+        consultas ven la misma instantánea y en WAL no bloquean al escritor.
+        """
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None, check_same_thread=False)
+        try:
+            conn.execute("BEGIN")
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _keyset_filter(session_id: Optional[str], after: Optional[Tuple[str, int]]) -> Tuple[str, list]:
+        """WHERE por (session_id, id) > cursor, servido por idx_history_session_context"""
+        clauses, params = [], []
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if after is not None:
+            clauses.append("(session_id, id) > (?, ?)")
+            params.extend(after)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def page_history(self, limit: int = 100, after: Optional[Tuple[str, int]] = None,
+                     session_id: Optional[str] = None) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """Página de historial ordenada por (session_id, id). Devuelve (filas, cursor siguiente)."""
+        where, params = self._keyset_filter(session_id, after)
+        with self.read_only_connection() as conn:
+            rows = conn.execute(f"{HISTORY_SELECT}{where} ORDER BY session_id, id LIMIT ?", params + [limit]).fetchall()
+        items = [dict(zip(HISTORY_COLUMNS, row)) for row in rows]
+        next_cursor = (items[-1]["session_id"], items[-1]["id"]) if len(items) == limit else None
+        return items, next_cursor
+
+    def search_history(self, text: str, limit: int = 20, session_id: Optional[str] = None,
+                       phrase: bool = False) -> List[Dict]:
+        """Búsqueda de texto completo ordenada por bm25, con fragmento resaltado"""
+        query = fts_query(text, phrase)
+        if not query:
+            return []
+        where = " AND h.session_id = ?" if session_id is not None else ""
+        params = [query] + ([session_id] if session_id is not None else []) + [limit]
+        with self.read_only_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT h.id, h.session_id, h.role, h.created_at,
+                       snippet(conversation_fts, 0, '<b>', '</b>', '…', 16),
+                       bm25(conversation_fts)
+                FROM conversation_fts
+                JOIN conversation_history h ON h.id = conversation_fts.rowid
+                WHERE conversation_fts MATCH ?{where}
+                ORDER BY bm25(conversation_fts)
+                LIMIT ?
+            ''', params).fetchall()
+        return [
+            {"id": r[0], "session_id": r[1], "role": r[2], "created_at": r[3], "snippet": r[4], "score": round(-r[5], 4)}
+            for r in rows
+        ]
+
+    def iter_history(self, session_id: Optional[str] = None, batch_size: int = 1000) -> Iterator[Dict]:
+        """Recorre todo el historial (o una sesión) en lotes: memoria acotada para cualquier tamaño"""
+        where, params = self._keyset_filter(session_id, None)
+        with self.read_only_connection() as conn:
+            cursor = conn.execute(f"{HISTORY_SELECT}{where} ORDER BY session_id, id", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(zip(HISTORY_COLUMNS, row))
 
 # Instancia global
 db = DatabaseManager()
\ No newline at end of file
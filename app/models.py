@@ -13,6 +13,7 @@ class ChatCompletionRequest(BaseModel):
     stream: Optional[bool] = False
 
 # Nuevo modelo para ExaBot
+# Estado que sobrevive a una desconexión (registro de sesiones, ventana de gracia)
 class ExamState(BaseModel):
     session_id: str
     start_time: float
@@ -20,4 +21,13 @@ class ExamState(BaseModel):
     questions_answered: int = 0
     elapsed_time: float = 0.0
     remaining_time: float = 0.0
-    is_active: bool = False
\ No newline at end of file
+    is_active: bool = False
+    # Reanudación
+    bot_mode: str = "exabot"
+    timer_state: str = "idle"
+    question_elapsed: float = 0.0
+    alert_fired: bool = False
+    welcome_pending: bool = False
+    last_response_text: Optional[str] = None
+    last_audio: Optional[bytes] = None
+    last_audio_mime: Optional[str] = None
\ No newline at end of file
@@ -1,6 +1,5 @@
 import re
 from typing import List
-from app.config import config
 
 # ======================
 # CONFIGURACIÓN DE PERSONA
@@ -58,6 +57,27 @@ ESTADO:
 - Mantén el conteo de preguntas basado en la información que te da el sistema.
 """
 
+# ======================
+# FRASES FIJAS (PHRASE BANK)
+# ======================
+# Conocidas en el despliegue: se pre-sintetizan al arrancar y se sirven desde memoria.
+
+IDLE_NUDGE_FALLBACK = "Hola, estoy aquí si necesitas ayuda para empezar."
+IDLE_NUDGE_ERROR = "¿Hola? ¿Sigues ahí?"
+EXAM_INJECTION_FALLBACK = "¡Vamos, tú puedes!"
+EXAM_TIME_UP_MESSAGE = "¡Se acabó el tiempo! El examen ha terminado. Muchas gracias por participar."
+NO_VOICE_MESSAGE = "No se detectó voz. ¿Puedes repetirlo, por favor?"
+ERROR_MESSAGE = "Lo siento, tuve un problema procesando tu mensaje. ¿Puedes intentarlo de nuevo?"
+
+PHRASE_BANK = [
+    IDLE_NUDGE_FALLBACK,
+    IDLE_NUDGE_ERROR,
+    EXAM_INJECTION_FALLBACK,
+    EXAM_TIME_UP_MESSAGE,
+    NO_VOICE_MESSAGE,
+    ERROR_MESSAGE,
+]
+
 # ======================
 # PARSER DE OPCIONES
 # ======================
@@ -0,0 +1,126 @@
+import base64
+import struct
+import orjson
+from typing import Dict, Optional, Tuple
+from fastapi import WebSocket, WebSocketDisconnect
+from app.services import tracing
+
+# ======================
+# PROTOCOLO /ws/voice
+# ======================
+# v1 (legacy): todo es JSON y el audio viaja en base64 dentro de message['data'].
+# v2: el audio viaja en frames BINARIOS con una cabecera fija de 4 bytes;
+#     los mensajes de control siguen siendo JSON pequeños (codificados con orjson).
+#
+# Cabecera v2: [versión:u8][tipo de frame:u8][formato:u8][reservado:u8] + payload
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_V1, PROTOCOL_V2)
+
+HEADER = struct.Struct("!BBBB")
+
+# Tipos de frame binario
+FRAME_AUDIO = 1  # Clip completo (cliente -> servidor) o audio TTS (servidor -> cliente)
+FRAME_PCM_STREAM = 2  # PCM int16 16 kHz continuo (cliente -> servidor, modo ?ingest=vad)
+PCM_STREAM_MAX_BYTES = 16000 * 2  # 1 s de PCM por frame (el navegador envía ~128 ms)
+
+# Identificadores compactos de formato de audio
+AUDIO_FORMAT_IDS: Dict[int, str] = {
+    0: "application/octet-stream",
+    1: "audio/webm",
+    2: "audio/mpeg",
+    3: "audio/wav",
+    4: "audio/webm;codecs=opus",
+    5: "audio/pcm;rate=16000",
+}
+AUDIO_FORMAT_CODES: Dict[str, int] = {mime: code for code, mime in AUDIO_FORMAT_IDS.items()}
+
+class ProtocolError(ValueError):
+    pass
+
+def pack_frame(frame_type: int, mime: str, payload: bytes) -> bytes:
+    header = HEADER.pack(PROTOCOL_V2, frame_type, AUDIO_FORMAT_CODES.get(mime, 0), 0)
+    return header + payload
+
+def unpack_frame(data: bytes) -> Tuple[int, str, memoryview]:
+    """Devuelve (tipo, mime, payload) sin copiar el payload"""
+    if len(data) < HEADER.size:
+        raise ProtocolError("Frame binario demasiado corto")
+    version, frame_type, fmt, _ = HEADER.unpack_from(data)
+    if version != PROTOCOL_V2:
+        raise ProtocolError(f"Versión de frame no soportada: {version}")
+    return frame_type, AUDIO_FORMAT_IDS.get(fmt, AUDIO_FORMAT_IDS[0]), memoryview(data)[HEADER.size:]
+
+class VoiceChannel:
+    """
+    Envoltorio del WebSocket que habla v1 o v2 según lo negociado en la conexión
+    (?protocol=2). El resto del handler trabaja con mensajes dict + audio bytes.
+    """
+
+    def __init__(self, websocket: WebSocket, version: int = PROTOCOL_V1):
+        if version not in SUPPORTED_PROTOCOLS:
+            version = PROTOCOL_V1
+        self.websocket = websocket
+        self.version = version
+        self.last_decode: Optional[Tuple[int, int]] = None  # (inicio, fin) en ns del último audio decodificado
+
+    async def send_json(self, message: dict):
+        await self.websocket.send_text(orjson.dumps(message).decode("utf-8"))
+
+    async def send_audio(self, audio: bytes, mime: str) -> int:
+        """Envía audio TTS. Devuelve los bytes que ocupa en el cable."""
+        if self.version == PROTOCOL_V2:
+            with tracing.span("encode", protocol=self.version):
+                frame = pack_frame(FRAME_AUDIO, mime, audio)
+            with tracing.span("send", wire_bytes=len(frame)):
+                await self.websocket.send_bytes(frame)
+            return len(frame)
+
+        with tracing.span("encode", protocol=self.version):
+            b64 = base64.b64encode(audio).decode("ascii")
+            text = orjson.dumps({'type': 'audio', 'data': b64, 'format': mime}).decode("utf-8")
+        with tracing.span("send", wire_bytes=len(b64)):
+            await self.websocket.send_text(text)
+        return len(b64)
+
+    async def receive(self) -> Tuple[dict, Optional[bytes]]:
+        """
+        Siguiente mensaje del cliente como (mensaje de control, audio).
+        Los frames binarios se traducen a {'type': 'audio', 'format': mime}
+        o {'type': 'pcm_stream'} para la ingesta continua.
+        """
+        raw = await self.websocket.receive()
+        if raw["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(raw.get("code", 1000))
+
+        data = raw.get("bytes")
+        if data is not None:
+            t0 = tracing.now_ns()
+            frame_type, mime, payload = unpack_frame(data)
+            if frame_type == FRAME_AUDIO:
+                self.last_decode = (t0, tracing.now_ns())
+                return {'type': 'audio', 'format': mime}, payload
+            if frame_type == FRAME_PCM_STREAM:
+                # Muestras int16 completas: un byte suelto rompería np.frombuffer en el VAD
+                if len(payload) % 2:
+                    raise ProtocolError(f"Frame PCM con longitud impar ({len(payload)} bytes)")
+                if len(payload) > PCM_STREAM_MAX_BYTES:
+                    raise ProtocolError(f"Frame PCM demasiado grande ({len(payload)} bytes, máximo {PCM_STREAM_MAX_BYTES})")
+                return {'type': 'pcm_stream', 'format': mime}, payload
+            raise ProtocolError(f"Tipo de frame desconocido: {frame_type}")
+
+        t0 = tracing.now_ns()
+        message = orjson.loads(raw.get("text") or "{}")
+        if not isinstance(message, dict) or not isinstance(message.get('type'), str):
+            raise ProtocolError("Mensaje de control sin 'type'")
+        if message['type'] == 'pcm_stream':
+            raise ProtocolError("El PCM continuo sólo se admite en frames binarios (?protocol=2)")
+        if message['type'] == 'audio':
+            # Modo legacy: audio en base64 dentro del JSON
+            if not isinstance(message.get('data'), str):
+                raise ProtocolError("Mensaje de audio sin 'data' en base64")
+            audio = base64.b64decode(message['data'], validate=True)
+            self.last_decode = (t0, tracing.now_ns())
+            return message, audio
+        return message, None
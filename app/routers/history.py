@@ -0,0 +1,109 @@
+import base64
+import hmac
+import zlib
+import orjson
+from typing import AsyncIterator, Iterator, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.config import config
+from app.database import db
+
+router = APIRouter()
+
+EXPORT_CHUNK_BYTES = 64 * 1024  # Tamaño aproximado de cada trozo enviado al cliente
+
+def require_history_token(authorization: Optional[str] = Header(None)):
+    """Conversaciones de salud: sólo con el token de HISTORY_API_TOKEN (sin token configurado no se sirve nada)"""
+    if not config.HISTORY_API_TOKEN:
+        raise HTTPException(status_code=503, detail="API de historial deshabilitada (HISTORY_API_TOKEN no configurado)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), config.HISTORY_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token inválido", headers={"WWW-Authenticate": "Bearer"})
+
+def encode_cursor(cursor) -> Optional[str]:
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(orjson.dumps(cursor)).decode("ascii")
+
+def decode_cursor(token: Optional[str]):
+    if not token:
+        return None
+    try:
+        session_id, last_id = orjson.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return str(session_id), int(last_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+@router.get("/v1/history", dependencies=[Depends(require_history_token)])
+async def list_history(
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    session_id: Optional[str] = Query(None)
+):
+    """Historial paginado por (session_id, id): coste constante en cualquier página"""
+    items, next_cursor = await run_in_threadpool(db.page_history, limit, decode_cursor(cursor), session_id)
+    return {
+        "object": "list",
+        "data": items,
+        "next_cursor": encode_cursor(next_cursor),
+        "has_more": next_cursor is not None
+    }
+
+@router.get("/v1/history/search", dependencies=[Depends(require_history_token)])
+async def search_history(
+    q: str = Query(..., min_length=1, description="Texto a buscar (sin distinguir tildes ni mayúsculas)"),
+    limit: int = Query(20, ge=1, le=200),
+    session_id: Optional[str] = Query(None),
+    phrase: bool = Query(False, description="Frase exacta en lugar de todos los términos")
+):
+    """Búsqueda FTS5 sobre el historial: fragmentos ordenados por relevancia (bm25)"""
+    results = await run_in_threadpool(db.search_history, q, limit, session_id, phrase)
+    return {"object": "list", "query": q, "data": results}
+
+def _ndjson_chunks(session_id: Optional[str], compress: bool) -> Iterator[bytes]:
+    """NDJSON (opcionalmente gzip en streaming) en trozos de ~64 KB"""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = bytearray()
+    rows = db.iter_history(session_id)
+    try:
+        for row in rows:
+            buffer += orjson.dumps(row)
+            buffer += b"\n"
+            if len(buffer) >= EXPORT_CHUNK_BYTES:
+                chunk = gz.compress(bytes(buffer)) if gz else bytes(buffer)
+                buffer.clear()
+                if chunk:
+                    yield chunk
+    finally:
+        rows.close()  # Cierra la conexión de sólo lectura (y su instantánea) aunque no se llegue al final
+    tail = gz.compress(bytes(buffer)) + gz.flush() if gz else bytes(buffer)
+    if tail:
+        yield tail
+
+async def _stream_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Envía los trozos desde el threadpool; si el cliente se desconecta, cierra el generador al momento"""
+    try:
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+    finally:
+        # Sin esto la conexión de sólo lectura queda abierta (bloqueando checkpoints del WAL) hasta el GC
+        chunks.close()
+
+@router.get("/v1/history/export", dependencies=[Depends(require_history_token)])
+async def export_history(
+    format: str = Query("ndjson", pattern="^(ndjson|gzip)$"),
+    session_id: Optional[str] = Query(None)
+):
+    """
+    Exportación completa en streaming desde una conexión de sólo lectura
+    (instantánea consistente; el generador corre en el threadpool y no bloquea escrituras).
+    """
+    compress = format == "gzip"
+    filename = f"history.ndjson{'.gz' if compress else ''}"
+    return StreamingResponse(
+        _stream_chunks(_ndjson_chunks(session_id, compress)),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from app.services import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Métricas del proceso en formato de texto de Prometheus (para el scrape)"""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
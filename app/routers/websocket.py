@@ -1,16 +1,28 @@
-import json
-import base64
 import uuid
+import time
 import asyncio
-from typing import Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Query
+from functools import partial
+from typing import Callable, List, Optional, Tuple
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from app.services.stt import STTService
 from app.services.llm import LLMService
 from app.services.tts import TTSService
 from app.services.idle_monitor import IdleMonitor
 from app.services.exam_timer import ExamTimer, TimerState
 from app.config import config
-from app.prompts import HEALTH_SYSTEM_PROMPT, EXABOT_SYSTEM_PROMPT
+from app.services.audio_codec import negotiate_format
+from app.services.vad import StreamingVAD, SPEECH_START, SPEECH_PAUSE, UTTERANCE, FALSE_DETECTION
+from app.services.endpointing import EndpointDetector
+from app.services.speculation import SpeculativeLLM
+from app.services.sessions import session_registry
+from app.services import tracing
+from app.services.metrics import ACTIVE_SESSIONS, TURNS, mode_label
+from app.services.recorder import recorder
+from app.services.admission import admission, Busy
+from app.protocol import VoiceChannel, PROTOCOL_V1
+from app.database import db
+from app.models import ExamState
+from app.prompts import HEALTH_SYSTEM_PROMPT, EXABOT_SYSTEM_PROMPT, EXAM_TIME_UP_MESSAGE, NO_VOICE_MESSAGE, ERROR_MESSAGE
 
 router = APIRouter()
 
@@ -18,15 +30,46 @@ router = APIRouter()
 async def websocket_voice_endpoint(
     websocket: WebSocket, 
     client_id: Optional[str] = Query(None),
-    bot_mode: str = Query("vitalbot")
+    bot_mode: str = Query("vitalbot"),
+    audio_formats: Optional[str] = Query(None),
+    protocol: int = Query(PROTOCOL_V1),
+    ingest: str = Query("clip")
 ):
     await websocket.accept()
+    # Control de admisión: con el worker saturado la sesión se rechaza limpia (1013 = Try Again Later)
+    busy = admission.open_session()
+    if busy:
+        print(f"🚦 Sesión rechazada: {busy.reason} (retry_after {busy.retry_after:.0f}s)")
+        await VoiceChannel(websocket, protocol).send_json(busy.to_message())
+        await websocket.close(code=1013, reason="busy")
+        return
+    try:
+        await voice_session(websocket, client_id, bot_mode, audio_formats, protocol, ingest)
+    finally:
+        admission.close_session()
+
+async def voice_session(
+    websocket: WebSocket,
+    client_id: Optional[str],
+    bot_mode: str,
+    audio_formats: Optional[str],
+    protocol: int,
+    ingest: str
+):
     session_id = client_id if client_id else str(uuid.uuid4())
     
+    # v1: JSON + base64 (clientes antiguos) | v2: audio en frames binarios
+    channel = VoiceChannel(websocket, protocol)
+    
+    # Formato de audio de salida negociado (el más compacto que soporte el cliente)
+    audio_format = negotiate_format(audio_formats)
+    wire_stats = {'turns': 0, 'bytes': 0}
+    last_turn = {'text': None, 'audio': None, 'mime': None}  # Se repite si el cliente reconecta
+    
     current_system_prompt = EXABOT_SYSTEM_PROMPT if bot_mode == "exabot" else HEALTH_SYSTEM_PROMPT
     
-    print(f"🔌 Cliente conectado ({bot_mode}). ID: {session_id}")
-    await websocket.send_json({'type': 'status', 'message': f'Modo: {bot_mode.upper()}'})
+    print(f"🔌 Cliente conectado ({bot_mode}, audio={audio_format}, protocolo v{channel.version}). ID: {session_id}")
+    await channel.send_json({'type': 'status', 'message': f'Modo: {bot_mode.upper()}'})
 
     # ==========================================
     # 1. CALLBACKS
@@ -34,20 +77,43 @@ async def websocket_voice_endpoint(
 
     async def send_exam_stats(timer: ExamTimer):
         stats = timer.get_stats()
-        await websocket.send_json({'type': 'exam_update', 'data': stats})
+        await channel.send_json({'type': 'exam_update', 'data': stats})
+
+    async def send_response(text: str):
+        last_turn['text'] = text
+        await channel.send_json({'type': 'response', 'text': text})
+
+    async def send_audio(audio_bytes: bytes, mime: str):
+        """Envía audio TTS y registra los bytes en el cable de este turno"""
+        last_turn['audio'], last_turn['mime'] = audio_bytes, mime
+        wire_bytes = await channel.send_audio(audio_bytes, mime)
+        wire_stats['turns'] += 1
+        wire_stats['bytes'] += wire_bytes
+        print(f"📦 Audio enviado: {wire_bytes} bytes en el cable ({mime}, {len(audio_bytes)} bytes de audio)")
+
+    async def send_cached_phrase(text: str) -> bool:
+        """Envía una frase fija si ya está pre-sintetizada (instantáneo). Devuelve si se envió."""
+        cached = await TTSService.from_phrase_bank(text, audio_format)
+        if not cached:
+            return False
+        last_turn['text'] = text
+        await send_audio(*cached)
+        return True
 
     async def on_idle_timeout():
         """Callback VitalBot (Timeout 45s)"""
+        if not admission.has_capacity():
+            print("🚦 Sugerencia por inactividad omitida (servidor saturado)")
+            return
         try:
-            await websocket.send_json({'type': 'status', 'message': '🤔 Pensando sugerencia...'})
+            await channel.send_json({'type': 'status', 'message': '🤔 Pensando sugerencia...'})
             text_nudge = await asyncio.to_thread(LLMService.generate_proactive_followup, session_id)
             if not text_nudge or not text_nudge.strip(): return
 
-            await websocket.send_json({'type': 'response', 'text': text_nudge})
-            await websocket.send_json({'type': 'status', 'message': '🗣️ Generando voz...'})
-            audio_bytes, mime = await asyncio.to_thread(TTSService.synthesize, text_nudge)
-            b64 = base64.b64encode(audio_bytes).decode('ascii')
-            await websocket.send_json({'type': 'audio', 'data': b64, 'format': mime})
+            await send_response(text_nudge)
+            await channel.send_json({'type': 'status', 'message': '🗣️ Generando voz...'})
+            audio_bytes, mime = await TTSService.synthesize(text_nudge, audio_format)
+            await send_audio(audio_bytes, mime)
         except Exception as e:
             print(f"❌ Error callback idle: {e}")
 
@@ -60,6 +126,9 @@ async def websocket_voice_endpoint(
             if exam_timer:
                 exam_timer.pause()
             
+            # Respuesta fija (phrase bank) cuando no hace falta el LLM
+            response_text = None
+            
             # PARSEAR el mensaje del timer
             if "30s_elapsed" in system_msg:
                 # Extraer datos reales del mensaje
@@ -79,15 +148,20 @@ async def websocket_voice_endpoint(
                     f"Keep it brief (1-2 sentences)."
                 )
                 
-                await websocket.send_json({'type': 'status', 'message': '⏰ Recordatorio de tiempo...'})
+                await channel.send_json({'type': 'status', 'message': '⏰ Recordatorio de tiempo...'})
                 
             elif "time_up" in system_msg:
-                llm_instruction = (
-                    f"[SYSTEM DIRECTIVE]\n"
-                    f"EXAM ENDED: Time is up. "
-                    f"Politely inform the student the exam has concluded and thank them."
-                )
-                await websocket.send_json({'type': 'status', 'message': '⏰ ¡Tiempo terminado!'})
+                if config.EXAM_TIME_UP_TEMPLATE:
+                    # Plantilla fija pre-sintetizada: sin coste de LLM ni de TTS
+                    response_text = EXAM_TIME_UP_MESSAGE
+                    await asyncio.to_thread(db.add_message, session_id, "assistant", response_text)
+                else:
+                    llm_instruction = (
+                        f"[SYSTEM DIRECTIVE]\n"
+                        f"EXAM ENDED: Time is up. "
+                        f"Politely inform the student the exam has concluded and thank them."
+                    )
+                await channel.send_json({'type': 'status', 'message': '⏰ ¡Tiempo terminado!'})
                 
             elif "INICIO EXAMEN" in system_msg:
                 # Mensaje de bienvenida INICIAL (antes de iniciar timer real)
@@ -102,20 +176,20 @@ async def websocket_voice_endpoint(
                 llm_instruction = system_msg
 
             # Generar respuesta usando inyección de sistema
-            response_text = await asyncio.to_thread(
-                LLMService.process_injection,
-                session_id,
-                llm_instruction,
-                current_system_prompt
-            )
+            if response_text is None:
+                response_text = await asyncio.to_thread(
+                    LLMService.process_injection,
+                    session_id,
+                    llm_instruction,
+                    current_system_prompt
+                )
             
-            await websocket.send_json({'type': 'response', 'text': response_text})
+            await send_response(response_text)
             
             # Sintetizar audio
-            await websocket.send_json({'type': 'status', 'message': '🗣️ Generando audio...'})
-            audio_bytes, mime = await asyncio.to_thread(TTSService.synthesize, response_text)
-            b64 = base64.b64encode(audio_bytes).decode('ascii')
-            await websocket.send_json({'type': 'audio', 'data': b64, 'format': mime})
+            await channel.send_json({'type': 'status', 'message': '🗣️ Generando audio...'})
+            audio_bytes, mime = await TTSService.synthesize(response_text, audio_format)
+            await send_audio(audio_bytes, mime)
             
         except Exception as e:
             print(f"❌ Error callback examen: {e}")
@@ -127,28 +201,298 @@ async def websocket_voice_endpoint(
     idle_monitor = None
     exam_timer = None
     welcome_pending = False  # Bandera para saber si esperamos el primer playback_complete
+    
+    # Reconexión dentro de la ventana de gracia: se retoma el estado sin regenerar nada
+    resumed = session_registry.resume(session_id, bot_mode) if client_id else None
+    if client_id:
+        # La caché de contexto es por worker: lo escrito desde otro (o antes de caducar) se relee de la BD
+        db.invalidate_context(session_id)
 
     if bot_mode == "exabot":
         exam_timer = ExamTimer(callback=on_exam_event)
-        exam_timer.prepare_exam()  # Prepara PERO NO inicia conteo
+        if resumed:
+            exam_timer.restore(resumed)
+            welcome_pending = resumed.welcome_pending
+        else:
+            exam_timer.prepare_exam()  # Prepara PERO NO inicia conteo
+            welcome_pending = True
         await send_exam_stats(exam_timer)
-        welcome_pending = True
         
-        # Enviar mensaje de bienvenida (el timer NO corre aún)
-        asyncio.create_task(on_exam_event("[SYSTEM] INICIO EXAMEN: Saluda y lanza Pregunta 1."))
+        # Enviar mensaje de bienvenida (el timer NO corre aún), salvo que ya se generara
+        if welcome_pending and not (resumed and resumed.last_audio):
+            asyncio.create_task(on_exam_event("[SYSTEM] INICIO EXAMEN: Saluda y lanza Pregunta 1."))
     else:
         idle_monitor = IdleMonitor(config.IDLE_TIMEOUT_SECONDS, on_idle_timeout)
+    
+    if resumed:
+        print(f"♻️ Sesión {session_id} reanudada")
+        await channel.send_json({'type': 'status', 'message': '♻️ Sesión reanudada'})
+        if resumed.last_audio:
+            # Se repite la última respuesta desde caché; playback_complete reanuda los timers
+            if resumed.last_response_text:
+                await send_response(resumed.last_response_text)
+            await send_audio(resumed.last_audio, resumed.last_audio_mime)
+        else:
+            if exam_timer and exam_timer.state == TimerState.PAUSED:
+                exam_timer.resume()
+            if idle_monitor:
+                idle_monitor.start()
+    
+    # Ingesta en streaming: el servidor segmenta los enunciados con Silero VAD
+    vad = None
+    vad_listening = True
+    endpointer = EndpointDetector(bot_mode) if config.ENDPOINT_ENABLED else None
+    vad_partial = None  # (pause_id, transcripción parcial) de la última pausa
+    endpoint_stats = {'turns': 0, 'saved_ms': 0, 'stt_reused': 0}
+    speculation = SpeculativeLLM() if endpointer and config.LLM_SPECULATIVE else None
+    if ingest == "vad":
+        try:
+            vad = StreamingVAD(endpointing=endpointer is not None)
+        except RuntimeError as e:
+            await channel.send_json({'type': 'error', 'message': f'VAD no disponible: {e}'})
+
+    # ==========================================
+    # 3. TURNO DE USUARIO (común a clip completo y VAD en servidor)
+    # ==========================================
+
+    def exam_metadata() -> str:
+        """Estado del examen en este instante (vacío fuera de ExaBot)"""
+        if bot_mode != "exabot":
+            return ""
+        stats = exam_timer.get_stats()
+        return (
+            f"[METADATA: Question {stats['current_q']}/{stats['total_q']} | "
+            f"Time spent: {stats['elapsed_question']}s | "
+            f"Total remaining: {stats['remaining_total']}]"
+        )
+
+    def build_user_message(transcription: str, metadata: Optional[str] = None) -> str:
+        """Mensaje de usuario para el LLM (ExaBot lo enriquece con el estado del examen)"""
+        if bot_mode != "exabot":
+            return transcription
+        return (
+            f"STUDENT ANSWER: '{transcription}'\n"
+            f"{exam_metadata() if metadata is None else metadata}\n"
+            f"Evaluate if correct and move to next question."
+        )
+
+    async def process_turn(
+        transcribe: Callable[[], str],
+        speculative: bool = False,
+        decode: Optional[Tuple[int, int]] = None,
+        audio=None
+    ) -> bool:
+        """
+        STT -> LLM -> TTS de un turno. Devuelve True si se envió audio
+        (el cliente responderá con playback_complete).
+        Con speculative=True se reutiliza la respuesta ya generada sobre la
+        transcripción parcial si coincide con la final.
+        decode: (inicio, fin) de la decodificación del audio recibido, para la traza.
+        audio: (bytes, mime) del clip o segmento PCM del VAD, para el grabador de turnos.
+        """
+        if idle_monitor: idle_monitor.cancel()
+        if exam_timer: exam_timer.pause()
+        
+        trace = tracing.start_turn(session_id, bot_mode, decode[0] if decode else None,
+                                   ingest=ingest, protocol=channel.version)
+        if decode:
+            trace.add("decode", *decode)
+
+        # Admisión: en cola si la espera estimada lo permite, si no se rechaza con retry_after
+        try:
+            wait_s = admission.estimate_wait()
+            if admission.saturated and wait_s <= admission.max_wait_s:
+                await channel.send_json({'type': 'status', 'message': f'⏳ Servidor ocupado, en cola (~{wait_s:.1f} s)'})
+            with tracing.span("admission.wait"):
+                await admission.acquire_turn()
+        except Busy as busy:
+            print(f"🚦 Turno rechazado ({session_id}): {busy.reason}")
+            TURNS.labels(bot_mode=mode_label(bot_mode), outcome="busy").inc()
+            trace.set(outcome="busy")
+            await send_timings(trace)
+            await channel.send_json(busy.to_message())
+            if exam_timer: exam_timer.resume()
+            if idle_monitor: idle_monitor.start()
+            return False
+
+        record = recorder.start(session_id, bot_mode, ingest, audio)
+        outcome = "error"
+        try:
+            # Transcribir
+            await channel.send_json({'type': 'status', 'message': '🎤 Transcribiendo...'})
+            with admission.stage("stt"):
+                transcription = await tracing.to_thread("stt", transcribe)
+            
+            if not transcription or not transcription.strip():
+                await channel.send_json({'type': 'status', 'message': '⚠️ No se detectó voz.'})
+                outcome = "no_voice"
+                # El timer sigue pausado mientras suena el aviso (se reanuda en playback_complete)
+                if await send_cached_phrase(NO_VOICE_MESSAGE):
+                    return True
+                await channel.send_json({'type': 'playback_complete'})
+                if exam_timer: exam_timer.resume()
+                return False
+
+            await channel.send_json({'type': 'transcription', 'text': transcription})
+            recorder.capture(transcript=transcription)
+            
+            # PROCESAMIENTO
+            if bot_mode == "exabot":
+                await channel.send_json({'type': 'status', 'message': '📝 Evaluando respuesta...'})
+            
+            # Respuesta especulativa ya en marcha sobre la transcripción parcial
+            t0 = tracing.now_ns()
+            # (con los metadatos del examen de ahora: si cambiaron, la respuesta especulada no vale)
+            hit = await speculation.take(transcription, exam_metadata()) if speculative and speculation else None
+            if hit:
+                user_msg, (response_text, messages) = hit
+                tracing.record("llm.total", t0, tracing.now_ns(), speculative=True)
+                recorder.capture(messages=messages, temperature=0.7, user_message=user_msg, speculative=True)
+                await asyncio.to_thread(LLMService.commit_reply, session_id, user_msg, response_text)
+            else:
+                user_msg = build_user_message(transcription)
+                recorder.capture(user_message=user_msg)
+                with admission.stage("llm"):
+                    response_text = await tracing.to_thread(
+                        "llm",
+                        LLMService.process_user_interaction,
+                        session_id,
+                        user_msg,
+                        0.7,
+                        current_system_prompt
+                    )
+            recorder.capture(response=response_text)
+            
+            if bot_mode == "exabot":
+                # IMPORTANTE: Avanzar pregunta DESPUÉS de la respuesta del LLM
+                exam_timer.next_question()
+                await send_exam_stats(exam_timer)
+            
+            await send_response(response_text)
+            
+            await channel.send_json({'type': 'status', 'message': '🗣️ Sintetizando...'})
+            with admission.stage("tts"):
+                audio_bytes, mime = await TTSService.synthesize(response_text, audio_format)
+            await send_audio(audio_bytes, mime)
+            outcome = "speculative" if hit else "ok"
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error procesando audio: {str(e)}")
+            trace.set(error=str(e))
+            await channel.send_json({'type': 'error', 'message': str(e)})
+            if await send_cached_phrase(ERROR_MESSAGE):
+                return True
+            if exam_timer: exam_timer.resume()
+            return False
+        finally:
+            admission.release_turn()
+            TURNS.labels(bot_mode=mode_label(bot_mode), outcome=outcome).inc()
+            trace.set(outcome=outcome)
+            await send_timings(trace)
+            if record:
+                await recorder.finish(record, outcome=outcome, timings=trace.timings())
+
+    async def send_timings(trace: tracing.TurnTrace):
+        """Cierra y exporta la traza del turno; el cliente recibe el resumen por etapa"""
+        tracing.finish_turn(trace)
+        if not config.TRACE_CLIENT_TIMINGS:
+            return
+        try:
+            await channel.send_json({'type': 'timings', 'stages': trace.timings(), 'server_timing': trace.server_timing()})
+        except Exception:
+            pass  # Cliente ya desconectado
 
     # ==========================================
-    # 3. BUCLE PRINCIPAL
+    # 4. VAD EN SERVIDOR (fin de turno adaptativo)
     # ==========================================
+
+    async def on_speech_pause(segment):
+        """Primera pausa: transcripción parcial y el endpointer fija cuánto silencio más esperar"""
+        nonlocal vad_partial
+        t0 = time.perf_counter()
+        try:
+            with admission.stage("stt"):
+                partial_text = await asyncio.to_thread(STTService.transcribe_pcm, segment)
+        except Exception as e:
+            print(f"⚠️ Transcripción parcial fallida: {e}")
+            partial_text = ""
+        decision = endpointer.decide(partial_text, vad.last_prob, vad.trailing_silence_ms)
+        vad.set_required_silence_ms(decision.wait_ms)
+        vad_partial = (vad.pause_id, partial_text)
+        print(f"⏸️ Pausa: '{partial_text.strip()}' → esperar {decision.wait_ms} ms "
+              f"({decision.reason}, completitud {decision.completeness:.1f}, STT parcial {(time.perf_counter() - t0) * 1000:.0f} ms)")
+
+        # El LLM arranca ya sobre lo dicho mientras se confirma el fin de turno (no con el LLM saturado)
+        if speculation and partial_text.strip() and decision.completeness >= config.LLM_SPECULATIVE_MIN_COMPLETENESS:
+            if admission.has_capacity("llm"):
+                metadata = exam_metadata()
+                speculation.start(partial_text, build_user_message(partial_text, metadata), speculate, context=metadata)
+            else:
+                print("🚦 Especulación omitida (LLM saturado)")
+
+    async def speculate(user_msg: str) -> Tuple[str, List[dict]]:
+        with admission.stage("llm"):
+            return await LLMService.generate_reply(session_id, user_msg, temperature=0.7, system_prompt=current_system_prompt)
+
+    async def on_vad_frame(pcm: bytes):
+        nonlocal vad_listening, vad_partial
+        events = await vad.feed(pcm)
+        while events:
+            for event, segment in events:
+                if event == SPEECH_START:
+                    if idle_monitor: idle_monitor.cancel()
+                    await channel.send_json({'type': 'vad', 'event': event})
+                elif event == FALSE_DETECTION:
+                    vad_partial = None
+                    if speculation: speculation.cancel()
+                    await channel.send_json({'type': 'vad', 'event': event})
+                elif event == SPEECH_PAUSE:
+                    await on_speech_pause(segment)
+                elif event == UTTERANCE:
+                    # Fin de voz: el segmento va directo a STT (sin contenedor ni fichero)
+                    silence_ms = int(vad.last_silence_ms)
+                    await channel.send_json({'type': 'vad', 'event': 'speech_end', 'silence_ms': silence_ms})
+                    transcribe = partial(STTService.transcribe_pcm, segment)
+                    if endpointer:
+                        saved_ms = max(0, config.ENDPOINT_BASELINE_MS - silence_ms)
+                        endpoint_stats['turns'] += 1
+                        endpoint_stats['saved_ms'] += saved_ms
+                        # Sin voz desde la pausa: la transcripción parcial ya es la final
+                        if vad.ended_in_pause and vad_partial and vad_partial[0] == vad.pause_id:
+                            transcribe = partial(str, vad_partial[1])
+                            endpoint_stats['stt_reused'] += 1
+                        print(f"⏱️ Fin de turno tras {silence_ms} ms de silencio "
+                              f"(-{saved_ms} ms frente a {config.ENDPOINT_BASELINE_MS} ms fijos)")
+                    vad_partial = None
+                    vad_listening = not await process_turn(transcribe, speculative=True, audio=segment)
+                    if speculation: speculation.cancel()
+                    vad.reset()
+                    return
+            # Seguir con el PCM que quedó en el buffer tras la pausa
+            events = vad.commit_if_ready() or await vad.feed(b"")
+
+    # ==========================================
+    # 5. BUCLE PRINCIPAL
+    # ==========================================
+    active_sessions = ACTIVE_SESSIONS.labels(bot_mode=mode_label(bot_mode))
+    active_sessions.inc()
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            try:
+                message, audio_payload = await channel.receive()
+            except ValueError as e:
+                # Frame binario o JSON mal formado: se descarta sin cerrar la sesión
+                await channel.send_json({'type': 'error', 'message': f'Mensaje inválido: {e}'})
+                continue
             
             # --- PLAYBACK COMPLETE ---
             if message['type'] == 'playback_complete':
+                # El bot terminó de hablar: el VAD vuelve a escuchar desde cero
+                if vad:
+                    vad.reset()
+                    vad_listening = True
+                
                 # CASO ESPECIAL: Primer playback_complete después del welcome
                 if welcome_pending and exam_timer:
                     welcome_pending = False
@@ -169,85 +513,67 @@ async def websocket_voice_endpoint(
             if message['type'] == 'clear_chat':
                 if idle_monitor: idle_monitor.cancel()
                 continue
+            
+            # --- PCM CONTINUO (VAD EN SERVIDOR) ---
+            if message['type'] == 'pcm_stream':
+                # Se ignora mientras el bot procesa/habla o si no está activo el modo VAD
+                if not vad or not vad_listening or welcome_pending:
+                    continue
+                
+                try:
+                    await on_vad_frame(audio_payload)
+                except WebSocketDisconnect:
+                    raise
+                except Exception as e:
+                    # Fallo de inferencia (p.ej. un batch del VAD compartido): se pierde lo que
+                    # iba dicho, pero la sesión sigue escuchando desde cero
+                    print(f"❌ Error en VAD ({session_id}): {e}")
+                    vad_partial = None
+                    if speculation: speculation.cancel()
+                    vad.reset()
+                    await channel.send_json({'type': 'error', 'message': '⚠️ Error procesando el audio, vuelve a intentarlo'})
+                continue
                 
             # --- AUDIO RECIBIDO ---
             if message['type'] == 'audio':
                 # Validar estado (no procesar si aún no terminó el welcome)
                 if welcome_pending:
-                    await websocket.send_json({
+                    await channel.send_json({
                         'type': 'error', 
                         'message': '⚠️ Espera a que termine la introducción'
                     })
                     continue
                 
-                if idle_monitor: idle_monitor.cancel()
-                if exam_timer: exam_timer.pause()
-                
-                try:
-                    # Transcribir
-                    audio_data = base64.b64decode(message['data'])
-                    await websocket.send_json({'type': 'status', 'message': '🎤 Transcribiendo...'})
-                    transcription = await asyncio.to_thread(STTService.transcribe, audio_data)
-                    
-                    if not transcription or not transcription.strip():
-                        await websocket.send_json({'type': 'status', 'message': '⚠️ No se detectó voz.'})
-                        await websocket.send_json({'type': 'playback_complete'})
-                        if exam_timer: exam_timer.resume()
-                        continue
-
-                    await websocket.send_json({'type': 'transcription', 'text': transcription})
-                    
-                    # PROCESAMIENTO
-                    response_text = ""
-                    
-                    if bot_mode == "exabot":
-                        stats = exam_timer.get_stats()
-                        
-                        # Enriquecer mensaje del usuario con metadata
-                        enriched_user_msg = (
-                            f"STUDENT ANSWER: '{transcription}'\n"
-                            f"[METADATA: Question {stats['current_q']}/{stats['total_q']} | "
-                            f"Time spent: {stats['elapsed_question']}s | "
-                            f"Total remaining: {stats['remaining_total']}]\n"
-                            f"Evaluate if correct and move to next question."
-                        )
-                        
-                        await websocket.send_json({'type': 'status', 'message': '📝 Evaluando respuesta...'})
-                        
-                        response_text = await asyncio.to_thread(
-                            LLMService.process_user_interaction, 
-                            session_id,
-                            enriched_user_msg,
-                            0.7,
-                            current_system_prompt
-                        )
-                        
-                        # IMPORTANTE: Avanzar pregunta DESPUÉS de la respuesta del LLM
-                        exam_timer.next_question()
-                        await send_exam_stats(exam_timer)
-                        
-                    else:
-                        response_text = await asyncio.to_thread(
-                            LLMService.process_user_interaction,
-                            session_id,
-                            transcription
-                        )
-                    
-                    await websocket.send_json({'type': 'response', 'text': response_text})
-                    
-                    await websocket.send_json({'type': 'status', 'message': '🗣️ Sintetizando...'})
-                    audio_bytes, mime = await asyncio.to_thread(TTSService.synthesize, response_text)
-                    b64 = base64.b64encode(audio_bytes).decode('ascii')
-                    
-                    await websocket.send_json({'type': 'audio', 'data': b64, 'format': mime})
-                    
-                except Exception as e:
-                    print(f"❌ Error procesando audio: {str(e)}")
-                    await websocket.send_json({'type': 'error', 'message': str(e)})
-                    if exam_timer: exam_timer.resume()
+                await process_turn(
+                    partial(STTService.transcribe, audio_payload),
+                    decode=channel.last_decode,
+                    audio=(audio_payload, message.get('format'))
+                )
 
     except WebSocketDisconnect:
         print("🔌 Cliente desconectado")
     finally:
+        active_sessions.dec()
+        if wire_stats['turns']:
+            avg = wire_stats['bytes'] // wire_stats['turns']
+            print(f"📦 Sesión {session_id}: {wire_stats['turns']} audios, {wire_stats['bytes']} bytes ({avg} por turno, {audio_format})")
+        if endpoint_stats['turns']:
+            avg = endpoint_stats['saved_ms'] // endpoint_stats['turns']
+            print(f"⏱️ Sesión {session_id}: {endpoint_stats['turns']} turnos VAD, {avg} ms ahorrados de media "
+                  f"en el fin de turno, {endpoint_stats['stt_reused']} STT finales reutilizados del parcial")
+        if speculation:
+            speculation.cancel()
+            if speculation.stats['attempts']:
+                print(f"🔮 Sesión {session_id}: {speculation.summary()}")
+        # Con client_id la sesión espera una reconexión (salvo examen ya terminado)
+        if client_id and not (exam_timer and exam_timer.state == TimerState.FINISHED):
+            state = exam_timer.snapshot(session_id) if exam_timer else ExamState(session_id=session_id, start_time=0.0)
+            state.bot_mode = bot_mode
+            state.welcome_pending = welcome_pending
+            state.last_response_text = last_turn['text']
+            state.last_audio = last_turn['audio']
+            state.last_audio_mime = last_turn['mime']
+            session_registry.park(state)
         if exam_timer: exam_timer.stop()
-        if idle_monitor: idle_monitor.cancel()
\ No newline at end of file
+        if idle_monitor: idle_monitor.cancel()
+        if vad: vad.close()
\ No newline at end of file
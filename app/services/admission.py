@@ -0,0 +1,207 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+from app.config import config
+from app.services.metrics import (
+    ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS, ESTIMATED_WAIT, STAGE_IN_FLIGHT, TURNS_IN_FLIGHT, TURNS_QUEUED
+)
+
+# ==========================================
+# CONTROL DE ADMISIÓN (por worker)
+# ==========================================
+# Con saturación es mejor rechazar limpio a unos pocos que ralentizar a todos:
+# - Turnos: hasta ADMISSION_MAX_TURNS a la vez; el resto espera en cola FIFO
+#   si la espera estimada cabe en ADMISSION_MAX_WAIT_S, si no se rechaza (Busy).
+# - Etapas (stt, llm, tts): trabajos en curso frente a ADMISSION_STAGE_LIMITS,
+#   parciales y especulativos incluidos; lo que exceda el límite es cola.
+# - Sesiones: se rechazan por encima de ADMISSION_MAX_SESSIONS o si un turno
+#   nuevo ya no cumpliría la espera máxima.
+# La espera se estima con la duración media (EWMA) de cada etapa.
+
+EWMA_ALPHA = 0.2
+TURN_STAGES = ("stt", "llm", "tts")
+
+class Busy(Exception):
+    """Sesión o turno rechazado: el cliente debe reintentar pasados retry_after segundos"""
+
+    def __init__(self, scope: str, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.scope = scope
+        self.retry_after = retry_after
+        self.reason = reason
+
+    def to_message(self) -> dict:
+        return {'type': 'busy', 'scope': self.scope, 'retry_after': self.retry_after, 'message': self.reason}
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_sessions: int = config.ADMISSION_MAX_SESSIONS,
+        max_turns: int = config.ADMISSION_MAX_TURNS,
+        max_wait_s: float = config.ADMISSION_MAX_WAIT_S,
+        stage_limits: Optional[Dict[str, int]] = None,
+        enabled: bool = config.ADMISSION_ENABLED
+    ):
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_wait_s = max_wait_s
+        self.stage_limits = dict(stage_limits or config.ADMISSION_STAGE_LIMITS)
+        self.stage_seconds = {s: config.ADMISSION_STAGE_ESTIMATES_S.get(s, 1.0) for s in self.stage_limits}
+        self.stage_depth = {s: 0 for s in self.stage_limits}
+        self.sessions = 0
+        self.turns = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.stats = {'sessions_rejected': 0, 'turns_rejected': 0, 'turns_queued': 0}
+
+        TURNS_IN_FLIGHT.set_function(lambda: self.turns)
+        TURNS_QUEUED.set_function(lambda: len(self._waiters))
+        ESTIMATED_WAIT.set_function(self.estimate_wait)
+        for stage in self.stage_limits:
+            STAGE_IN_FLIGHT.labels(stage=stage).set_function(lambda s=stage: self.stage_depth[s])
+
+    # --- Estimación ---
+
+    @property
+    def turn_seconds(self) -> float:
+        """Duración media de un turno completo (suma de las etapas)"""
+        return sum(self.stage_seconds.get(s, 0.0) for s in TURN_STAGES)
+
+    @property
+    def saturated(self) -> bool:
+        """Todos los huecos de turno ocupados: un turno nuevo esperaría en cola"""
+        return self.enabled and (self.turns >= self.max_turns or bool(self._waiters))
+
+    def estimate_wait(self) -> float:
+        """
+        Segundos que esperaría un turno nuevo: su puesto en la cola de huecos
+        (un hueco se libera cada turn_seconds / max_turns de media) más la cola
+        de la etapa cuello de botella.
+        """
+        slot_wait = 0.0
+        if self.saturated:
+            slot_wait = (len(self._waiters) + 1) / self.max_turns * self.turn_seconds
+        stage_wait = max(
+            (max(0, self.stage_depth[s] + 1 - limit) / limit * self.stage_seconds[s] for s, limit in self.stage_limits.items()),
+            default=0.0
+        )
+        return slot_wait + stage_wait
+
+    def has_capacity(self, stage: Optional[str] = None) -> bool:
+        """
+        Sitio para trabajo opcional (especulación, sugerencias por inactividad):
+        sin turnos en cola y la etapa (o todas) por debajo de su límite.
+        """
+        if not self.enabled:
+            return True
+        if self.saturated:
+            return False
+        stages = [stage] if stage else list(self.stage_limits)
+        return all(self.stage_depth[s] < self.stage_limits[s] for s in stages if s in self.stage_limits)
+
+    @staticmethod
+    def _retry_after(seconds: float) -> float:
+        return float(max(1, math.ceil(seconds)))
+
+    # --- Sesiones ---
+
+    def open_session(self) -> Optional[Busy]:
+        """Cuenta la sesión o devuelve el Busy con el que rechazarla"""
+        if self.enabled:
+            wait = self.estimate_wait()
+            if self.sessions >= self.max_sessions:
+                busy = Busy("session", self._retry_after(max(wait, self.turn_seconds)),
+                            f"Servidor completo ({self.sessions} sesiones), inténtalo de nuevo en unos segundos")
+            elif wait > self.max_wait_s:
+                busy = Busy("session", self._retry_after(wait),
+                            f"Servidor saturado (espera estimada {wait:.1f} s), inténtalo de nuevo en unos segundos")
+            else:
+                busy = None
+            if busy:
+                self.stats['sessions_rejected'] += 1
+                ADMISSION_REJECTED.labels(scope="session").inc()
+                return busy
+        self.sessions += 1
+        return None
+
+    def close_session(self):
+        self.sessions -= 1
+
+    # --- Turnos ---
+
+    async def acquire_turn(self):
+        """
+        Reserva un hueco para un turno (esperando en cola si hace falta).
+        Lanza Busy si la espera estimada supera ADMISSION_MAX_WAIT_S.
+        """
+        if not self.saturated:
+            self.turns += 1
+            return
+
+        wait = self.estimate_wait()
+        if wait > self.max_wait_s:
+            self.stats['turns_rejected'] += 1
+            ADMISSION_REJECTED.labels(scope="turn").inc()
+            raise Busy("turn", self._retry_after(wait), f"Servidor saturado (espera estimada {wait:.1f} s)")
+
+        self.stats['turns_queued'] += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        t0 = time.perf_counter()
+        try:
+            await fut  # release_turn() cede su hueco (self.turns no cambia)
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release_slot()  # El hueco llegó justo al cancelar: se pasa al siguiente
+            elif fut in self._waiters:
+                self._waiters.remove(fut)
+            raise
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - t0)
+
+    def release_turn(self):
+        self._release_slot()
+
+    def _release_slot(self):
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.turns -= 1
+
+    # --- Etapas ---
+
+    @contextmanager
+    def stage(self, name: str):
+        """Marca un trabajo en curso en la etapa y actualiza su duración media"""
+        tracked = name in self.stage_depth
+        if tracked:
+            self.stage_depth[name] += 1
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            if tracked:
+                self.stage_depth[name] -= 1
+                if ok:
+                    elapsed = time.perf_counter() - t0
+                    self.stage_seconds[name] += EWMA_ALPHA * (elapsed - self.stage_seconds[name])
+
+    def snapshot(self) -> dict:
+        return {
+            "sessions": self.sessions,
+            "turns_in_flight": self.turns,
+            "turns_queued": len(self._waiters),
+            "stage_depth": dict(self.stage_depth),
+            "stage_seconds": {s: round(v, 3) for s, v in self.stage_seconds.items()},
+            "estimated_wait_s": round(self.estimate_wait(), 3),
+            **self.stats,
+        }
+
+# Instancia global
+admission = AdmissionController()
@@ -0,0 +1,104 @@
+import numpy as np
+
+# Escala int16 -> float32 [-1, 1)
+INT16_SCALE = np.float32(1.0 / 32768.0)
+
+class PCMRingBuffer:
+    """
+    Buffer int16 preasignado para el PCM entrante de una conexión.
+    Los frames se escriben sin realocar y los chunks de tamaño fijo se leen
+    como VISTAS (sin copia). Cuando la escritura alcanza el final, el resto
+    pendiente (menos de un chunk) vuelve al inicio del buffer.
+    Una vista devuelta por read() es válida hasta la siguiente write().
+    """
+
+    def __init__(self, capacity: int):
+        self._buf = np.zeros(capacity, dtype=np.int16)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def clear(self):
+        self._start = self._end = 0
+
+    def write(self, samples: np.ndarray):
+        n = samples.size
+        if self._end + n > self._buf.size:
+            # Compactar: mover lo pendiente al inicio
+            pending = len(self)
+            self._buf[:pending] = self._buf[self._start:self._end]
+            self._start, self._end = 0, pending
+            if pending + n > self._buf.size:
+                # Frame más grande de lo previsto: crecer una sola vez
+                grown = np.zeros(max(self._buf.size * 2, pending + n), dtype=np.int16)
+                grown[:pending] = self._buf[:pending]
+                self._buf = grown
+        self._buf[self._end:self._end + n] = samples
+        self._end += n
+
+    def read(self, n: int) -> np.ndarray:
+        view = self._buf[self._start:self._start + n]
+        self._start += n
+        if self._start == self._end:
+            self._start = self._end = 0
+        return view
+
+class PreRollBuffer:
+    """Anillo fijo de los últimos N chunks int16 (pre-roll antes del inicio de voz)"""
+
+    def __init__(self, n_chunks: int, chunk_size: int):
+        self._buf = np.zeros((max(1, n_chunks), chunk_size), dtype=np.int16)
+        self._next = 0
+        self._count = 0
+
+    def clear(self):
+        self._next = self._count = 0
+
+    def append(self, chunk: np.ndarray):
+        self._buf[self._next] = chunk
+        self._next = (self._next + 1) % len(self._buf)
+        self._count = min(self._count + 1, len(self._buf))
+
+    def drain_into(self, utterance: "UtteranceBuffer"):
+        """Copia el pre-roll (en orden cronológico) al inicio del enunciado y se vacía"""
+        first = (self._next - self._count) % len(self._buf)
+        for i in range(self._count):
+            utterance.extend(self._buf[(first + i) % len(self._buf)])
+        self.clear()
+
+class UtteranceBuffer:
+    """
+    Enunciado en curso en int16 preasignado (la mitad de memoria que float32).
+    La conversión a float32 se hace una sola vez, al entregarlo a STT.
+    """
+
+    def __init__(self, max_samples: int):
+        self._buf = np.zeros(max_samples, dtype=np.int16)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_full(self) -> bool:
+        return self._size >= self._buf.size
+
+    def clear(self):
+        self._size = 0
+
+    def extend(self, samples: np.ndarray):
+        n = min(samples.size, self._buf.size - self._size)
+        self._buf[self._size:self._size + n] = samples[:n]
+        self._size += n
+
+    def int16(self) -> np.ndarray:
+        """Vista int16 (sin copia; válida hasta el siguiente clear/extend)"""
+        return self._buf[:self._size]
+
+    def float32(self) -> np.ndarray:
+        """Copia float32 [-1, 1) lista para Whisper (una única asignación)"""
+        out = np.empty(self._size, dtype=np.float32)
+        np.multiply(self._buf[:self._size], INT16_SCALE, out=out)
+        return out
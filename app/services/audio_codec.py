@@ -0,0 +1,51 @@
+import io
+import av
+from typing import Optional, Tuple
+
+# Formatos de salida que el cliente puede anunciar en /ws/voice (?audio_formats=opus,mp3,pcm)
+# Ordenados del más compacto al más pesado: se elige el primero que el cliente soporte.
+AUDIO_FORMATS = {
+    "opus": {"mime": "audio/webm;codecs=opus", "container": "webm", "codec": "libopus", "rate": 48000, "bit_rate": 32000},
+    "mp3": {"mime": "audio/mpeg", "container": "mp3", "codec": "libmp3lame", "rate": 44100, "bit_rate": 64000},
+    "pcm": {"mime": "audio/wav", "container": "wav", "codec": "pcm_s16le", "rate": 16000, "bit_rate": None},
+}
+FORMAT_PREFERENCE = ["opus", "mp3", "pcm"]
+DEFAULT_FORMAT = "mp3"  # Lo que siempre se ha enviado (compatibilidad con clientes antiguos)
+
+def negotiate_format(audio_formats: Optional[str]) -> str:
+    """Elige el formato más compacto de la lista anunciada por el cliente"""
+    if not audio_formats:
+        return DEFAULT_FORMAT
+    accepted = {f.strip().lower() for f in audio_formats.split(",")}
+    return next((f for f in FORMAT_PREFERENCE if f in accepted), DEFAULT_FORMAT)
+
+def transcode(audio: bytes, src_mime: str, target: str) -> Tuple[bytes, str]:
+    """
+    Transcodifica en proceso con PyAV (sin ffmpeg externo ni ficheros temporales).
+    Es CPU-bound: llamar con asyncio.to_thread.
+    """
+    fmt = AUDIO_FORMATS[target]
+    if src_mime == fmt["mime"]:
+        return audio, src_mime
+
+    out_buf = io.BytesIO()
+    with av.open(io.BytesIO(audio), mode="r") as src, av.open(out_buf, mode="w", format=fmt["container"]) as dst:
+        stream = dst.add_stream(fmt["codec"], rate=fmt["rate"], layout="mono")
+        if fmt["bit_rate"]:
+            stream.bit_rate = fmt["bit_rate"]
+        resampler = av.AudioResampler(format=stream.codec_context.codec.audio_formats[0].name, layout="mono", rate=fmt["rate"])
+
+        for frame in src.decode(audio=0):
+            frame.pts = None
+            for resampled in resampler.resample(frame):
+                for packet in stream.encode(resampled):
+                    dst.mux(packet)
+
+        # Vaciar resampler y codificador
+        for resampled in resampler.resample(None):
+            for packet in stream.encode(resampled):
+                dst.mux(packet)
+        for packet in stream.encode(None):
+            dst.mux(packet)
+
+    return out_buf.getvalue(), fmt["mime"]
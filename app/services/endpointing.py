@@ -0,0 +1,106 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from app.config import config
+
+# Palabras tras las que casi nunca termina un turno (conectores, artículos, muletillas)
+TRAILING_CONNECTORS = {
+    "y", "e", "o", "u", "pero", "que", "porque", "pues", "entonces", "como", "cuando", "si",
+    "de", "del", "la", "el", "los", "las", "un", "una", "a", "al", "con", "para", "por", "en",
+    "mi", "tu", "su", "es", "eh", "em", "mmm", "este", "bueno", "osea", "sea", "mas", "menos",
+}
+
+# Números en palabras (respuestas de ExaBot: sumas/restas 1-20)
+NUMBER_WORDS = {
+    "cero", "uno", "una", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve", "diez",
+    "once", "doce", "trece", "catorce", "quince", "dieciseis", "diecisiete", "dieciocho", "diecinueve",
+    "veinte", "treinta", "cuarenta",
+}
+
+# Respuestas de una palabra que cierran el turno (opción, sí/no)
+SHORT_ANSWERS = {"a", "b", "c", "d", "si", "no"}
+
+# "opción A", "la b", "a)", "la primera"...
+OPTION_PATTERN = re.compile(r"\b(opcion\s+[a-d1-9]|la\s+[a-d]\b|la\s+(primera|segunda|tercera|cuarta))")
+
+@dataclass
+class EndpointDecision:
+    wait_ms: int  # Silencio total requerido antes de declarar fin de turno
+    completeness: float  # 0 = claramente incompleto, 1 = respuesta completa
+    reason: str
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+class EndpointDetector:
+    """
+    Decide cuánto silencio esperar antes de cerrar el turno combinando:
+    - la probabilidad de voz del VAD en la pausa,
+    - la duración del silencio ya acumulado,
+    - la completitud lingüística de la transcripción parcial
+      (puntuación de cierre, conectores colgando, respuesta completa a ExaBot).
+    Confiado -> ENDPOINT_MIN_SILENCE_MS. Dudoso -> hasta ENDPOINT_MAX_SILENCE_MS.
+    """
+
+    def __init__(self, bot_mode: str):
+        self.bot_mode = bot_mode
+        self.min_ms = config.ENDPOINT_MIN_SILENCE_MS
+        self.max_ms = config.ENDPOINT_MAX_SILENCE_MS
+
+    def completeness(self, partial_text: str) -> tuple:
+        text = partial_text.strip()
+        if not text:
+            return 0.0, "vacío"
+
+        norm = _normalize(text)
+        words = re.findall(r"[a-z0-9]+", norm)
+        if not words:
+            return 0.0, "sin palabras"
+
+        # Pausa a media frase (coma, puntos suspensivos, guion): seguramente sigue hablando
+        if text.endswith((",", "...", "…", "-")):
+            return 0.0, "pausa a media frase"
+
+        # Respuestas cortas completas en ambos modos. Van antes que los conectores:
+        # "a" y "sí" también lo son, pero dichas solas son una respuesta
+        if len(words) == 1 and words[0] in SHORT_ANSWERS:
+            return 0.9, "respuesta corta"
+        option = OPTION_PATTERN.search(norm)
+        if option and not re.search(r"[a-z0-9]", norm[option.end():]):
+            return 0.9, "elección de opción"
+
+        # Varias palabras que terminan en conector / muletilla: sigue hablando
+        if len(words) > 1 and words[-1] in TRAILING_CONNECTORS:
+            return 0.0, f"conector final '{words[-1]}'"
+
+        score = 0.3
+        reason = "frase abierta"
+
+        if text.endswith((".", "?", "!", "¿", "¡")):
+            score = 0.7
+            reason = "puntuación de cierre"
+
+        if option:
+            score = max(score, 0.9)
+            reason = "elección de opción"
+        elif self.bot_mode == "exabot" and any(w.isdigit() or w in NUMBER_WORDS for w in words):
+            # Una respuesta numérica corta es una respuesta completa a la pregunta
+            score = max(score, 0.9 if len(words) <= 6 else 0.7)
+            reason = "respuesta numérica"
+
+        if len(words) >= 4 and score < 0.7:
+            score += 0.1
+        return min(score, 1.0), reason
+
+    def decide(self, partial_text: str, speech_prob: float, silence_ms: float) -> EndpointDecision:
+        score, reason = self.completeness(partial_text)
+
+        # Silencio nítido (prob. muy baja) refuerza el fin de turno; zona gris lo retrasa
+        if speech_prob < 0.05:
+            score = min(1.0, score + 0.1)
+        elif speech_prob > config.VAD_THRESHOLD - 0.2:
+            score = max(0.0, score - 0.2)
+
+        wait_ms = int(self.max_ms - score * (self.max_ms - self.min_ms))
+        return EndpointDecision(wait_ms=max(wait_ms, int(silence_ms), self.min_ms), completeness=score, reason=reason)
@@ -1,8 +1,9 @@
-import asyncio
 import time
-from typing import Callable, Awaitable, Dict
+from typing import Callable, Awaitable, Dict, Optional
 from enum import Enum
 from app.config import config
+from app.models import ExamState
+from app.services.scheduler import scheduler, Deadline
 
 class TimerState(Enum):
     """Estados explícitos del examen"""
@@ -13,6 +14,11 @@ class TimerState(Enum):
     FINISHED = "finished"      # Terminado (time_up o todas las preguntas)
 
 class ExamTimer:
+    """
+    Tiempo del examen sin bucles de sondeo: el fin global y la alerta de
+    pregunta son plazos en el scheduler compartido. Pausar guarda lo que
+    falta y cancela los plazos; reanudar los vuelve a programar.
+    """
     def __init__(self, callback: Callable[[str], Awaitable[None]]):
         self.callback = callback
         self.total_time = config.EXAM_TOTAL_TIME
@@ -30,8 +36,10 @@ class ExamTimer:
         self._question_pause_start = 0.0
         self._question_accumulated_pause = 0.0
         
-        self._global_task: asyncio.Task | None = None
-        self._question_task: asyncio.Task | None = None
+        self._global_deadline: Optional[Deadline] = None
+        self._question_deadline: Optional[Deadline] = None
+        self._global_remaining = 0.0  # Segundos restantes de cada plazo mientras está en pausa
+        self._question_remaining = 0.0
         self._alert_30s_fired = False  # Bandera para evitar doble disparo
 
     # ==========================================
@@ -39,7 +47,7 @@ class ExamTimer:
     # ==========================================
     
     def prepare_exam(self):
-        """Prepara el examen (crea tasks) pero NO inicia el conteo"""
+        """Prepara el examen pero NO inicia el conteo"""
         self.stop()
         self.state = TimerState.WAITING_WELCOME
         self.current_question = 1
@@ -51,12 +59,12 @@ class ExamTimer:
             print(f"⚠️ No se puede iniciar desde estado {self.state}")
             return
         
-        self.start_time = time.time()
-        self._question_start_time = time.time()
+        self.start_time = time.monotonic()
+        self._question_start_time = time.monotonic()
         self.state = TimerState.RUNNING
         
-        self._global_task = asyncio.create_task(self._global_timer_loop())
-        self._question_task = asyncio.create_task(self._question_timer_loop())
+        self._global_deadline = scheduler.call_later(self.total_time, self._on_time_up)
+        self._question_deadline = scheduler.call_later(self.alert_interval, self._on_question_alert)
         print("🏁 ExamTimer INICIADO (conteo real)")
 
     def pause(self):
@@ -65,29 +73,38 @@ class ExamTimer:
             return
         
         self.state = TimerState.PAUSED
-        self.pause_start = time.time()
-        self._question_pause_start = time.time()
+        self.pause_start = time.monotonic()
+        self._question_pause_start = time.monotonic()
+        
+        # Congelar los plazos: se guarda lo que falta
+        self._global_remaining = self._freeze(self._global_deadline)
+        self._question_remaining = self._freeze(self._question_deadline)
+        self._global_deadline = self._question_deadline = None
 
     def resume(self):
         """Reanuda el conteo"""
         if self.state != TimerState.PAUSED:
             return
         
-        pause_duration = time.time() - self.pause_start
+        pause_duration = time.monotonic() - self.pause_start
         self.accumulated_pause += pause_duration
         
-        question_pause = time.time() - self._question_pause_start
+        question_pause = time.monotonic() - self._question_pause_start
         self._question_accumulated_pause += question_pause
         
         self.state = TimerState.RUNNING
+        
+        # Los plazos se desplazan exactamente lo que duró la pausa
+        self._global_deadline = scheduler.call_later(self._global_remaining, self._on_time_up)
+        if not self._alert_30s_fired:
+            self._question_deadline = scheduler.call_later(self._question_remaining, self._on_question_alert)
 
     def stop(self):
         """Detiene completamente el examen"""
         self.state = TimerState.FINISHED
-        if self._global_task: 
-            self._global_task.cancel()
-        if self._question_task: 
-            self._question_task.cancel()
+        self._freeze(self._global_deadline)
+        self._freeze(self._question_deadline)
+        self._global_deadline = self._question_deadline = None
         print("🛑 ExamTimer detenido")
 
     def next_question(self):
@@ -97,26 +114,72 @@ class ExamTimer:
         
         if self.current_question < self.total_questions:
             self.current_question += 1
-            self._question_start_time = time.time()
+            self._question_start_time = time.monotonic()
             self._question_accumulated_pause = 0.0
             self._alert_30s_fired = False  # RESET crítico
             
-            # Recrear task de pregunta limpia
-            if self._question_task: 
-                self._question_task.cancel()
-            self._question_task = asyncio.create_task(self._question_timer_loop())
+            # Plazo de pregunta limpio (si está en pausa, se programa al reanudar)
+            self._freeze(self._question_deadline)
+            self._question_deadline = None
+            self._question_remaining = self.alert_interval
+            if self.state == TimerState.RUNNING:
+                self._question_deadline = scheduler.call_later(self.alert_interval, self._on_question_alert)
             print(f"➡️ Avanzando a pregunta {self.current_question}/{self.total_questions}")
         else:
             print("✅ Todas las preguntas completadas")
             self.stop()
 
+    # ==========================================
+    # REANUDACIÓN (registro de sesiones)
+    # ==========================================
+
+    def snapshot(self, session_id: str) -> ExamState:
+        """Congela el examen (pausa) y devuelve su estado serializable"""
+        self.pause()
+        now = time.monotonic()
+        counting = self.state in (TimerState.RUNNING, TimerState.PAUSED)
+        elapsed_total = (self.pause_start - self.start_time - self.accumulated_pause) if counting else 0.0
+        elapsed_question = (self._question_pause_start - self._question_start_time - self._question_accumulated_pause) if counting else 0.0
+        return ExamState(
+            session_id=session_id,
+            start_time=time.time() - (now - self.start_time) if counting else 0.0,
+            current_question=self.current_question,
+            questions_answered=self.current_question - 1,
+            elapsed_time=elapsed_total,
+            remaining_time=max(0.0, self.total_time - elapsed_total),
+            is_active=counting,
+            timer_state=self.state.value,
+            question_elapsed=elapsed_question,
+            alert_fired=self._alert_30s_fired
+        )
+
+    def restore(self, state: ExamState):
+        """Retoma un examen congelado: queda en PAUSED hasta resume() (o en espera del welcome)"""
+        self.stop()
+        self.current_question = state.current_question
+        self._alert_30s_fired = state.alert_fired
+        if not state.is_active:
+            self.state = TimerState(state.timer_state)
+            print(f"♻️ ExamTimer restaurado ({self.state.value})")
+            return
+        
+        now = time.monotonic()
+        self.start_time = now - state.elapsed_time
+        self._question_start_time = now - state.question_elapsed
+        self.accumulated_pause = self._question_accumulated_pause = 0.0
+        self.pause_start = self._question_pause_start = now
+        self._global_remaining = state.remaining_time
+        self._question_remaining = max(0.0, self.alert_interval - state.question_elapsed)
+        self.state = TimerState.PAUSED
+        print(f"♻️ ExamTimer restaurado: pregunta {self.current_question}, {int(state.remaining_time)}s restantes")
+
     # ==========================================
     # GETTERS
     # ==========================================
     
     def get_stats(self) -> Dict:
         """Estadísticas para el frontend/LLM (descontando pausas)"""
-        now = time.time()
+        now = time.monotonic()
         
         # Tiempo total (descontando pausas)
         elapsed_total = int((now - self.start_time) - self.accumulated_pause)
@@ -136,7 +199,7 @@ class ExamTimer:
         }
 
     # ==========================================
-    # LOOPS INTERNOS (Private)
+    # PLAZOS INTERNOS (Private)
     # ==========================================
 
     async def _emit_event(self, trigger_type: str):
@@ -155,43 +218,27 @@ class ExamTimer:
         
         await self.callback(message)
 
-    async def _global_timer_loop(self):
-        """Monitor del tiempo total del examen"""
-        try:
-            while self.state in [TimerState.RUNNING, TimerState.PAUSED]:
-                await asyncio.sleep(1)
-                
-                if self.state != TimerState.RUNNING:
-                    continue
-                
-                stats = self.get_stats()
-                elapsed = int(stats["remaining_total"].split(":")[0]) * 60 + int(stats["remaining_total"].split(":")[1])
-                
-                if elapsed <= 0:
-                    print("⏰ TIEMPO GLOBAL AGOTADO")
-                    await self._emit_event("time_up")
-                    self.stop()
-                    break
-        except asyncio.CancelledError:
-            pass
-
-    async def _question_timer_loop(self):
-        """Monitor del tiempo por pregunta (alerta a los 30s)"""
-        try:
-            while self.state in [TimerState.RUNNING, TimerState.PAUSED]:
-                await asyncio.sleep(0.5)  # Check más frecuente
-                
-                if self.state != TimerState.RUNNING or self._alert_30s_fired:
-                    continue
-                
-                stats = self.get_stats()
-                elapsed_q = stats["elapsed_question"]
-                
-                # Disparar UNA SOLA VEZ a los 30s
-                if elapsed_q >= 30:
-                    self._alert_30s_fired = True
-                    print(f"⏰ ALERTA 30s en pregunta {self.current_question}")
-                    await self._emit_event("30s_elapsed")
-                    
-        except asyncio.CancelledError:
-            pass
\ No newline at end of file
+    @staticmethod
+    def _freeze(deadline: Optional[Deadline]) -> float:
+        """Cancela un plazo y devuelve los segundos que le faltaban"""
+        if deadline is None:
+            return 0.0
+        remaining = deadline.remaining()
+        deadline.cancel()
+        return remaining
+
+    async def _on_time_up(self):
+        """Plazo del tiempo total del examen"""
+        if self.state != TimerState.RUNNING:
+            return  # Pausado justo al vencer: resume() lo reprograma con lo que faltaba
+        print("⏰ TIEMPO GLOBAL AGOTADO")
+        await self._emit_event("time_up")
+        self.stop()
+
+    async def _on_question_alert(self):
+        """Plazo de la pregunta actual (alerta UNA SOLA VEZ a los EXAM_QUESTION_TIME s)"""
+        if self._alert_30s_fired or self.state != TimerState.RUNNING:
+            return
+        self._alert_30s_fired = True
+        print(f"⏰ ALERTA 30s en pregunta {self.current_question}")
+        await self._emit_event("30s_elapsed")
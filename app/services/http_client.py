@@ -0,0 +1,44 @@
+import random
+import httpx
+from app.config import config
+
+# Códigos HTTP que vale la pena reintentar (saturación o fallo transitorio del proveedor)
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+_client: httpx.AsyncClient | None = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Cliente HTTP asíncrono compartido para el tráfico saliente de TTS.
+    Mantiene las conexiones vivas (keep-alive / HTTP/2) para no pagar
+    TCP+TLS en cada frase.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=config.TTS_HTTP2,
+            limits=httpx.Limits(
+                max_connections=config.TTS_MAX_CONNECTIONS,
+                max_keepalive_connections=config.TTS_MAX_KEEPALIVE,
+                keepalive_expiry=config.TTS_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=config.TTS_CONNECT_TIMEOUT,
+                read=config.TTS_READ_TIMEOUT,
+                write=config.TTS_WRITE_TIMEOUT,
+                pool=config.TTS_POOL_TIMEOUT
+            )
+        )
+    return _client
+
+async def close_http_client():
+    """Cierra el pool de conexiones (llamar al apagar el servidor)"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+def retry_delay(attempt: int) -> float:
+    """Backoff exponencial con 'full jitter' para el intento N (0-based)"""
+    cap = config.TTS_RETRY_BACKOFF * (2 ** attempt)
+    return random.uniform(0, min(cap, config.TTS_RETRY_MAX_BACKOFF))
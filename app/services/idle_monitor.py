@@ -1,40 +1,41 @@
-import asyncio
-from typing import Callable, Awaitable
+from typing import Callable, Awaitable, Optional
+from app.services.scheduler import scheduler, Deadline
 
 class IdleMonitor:
     """
-    Gestiona un temporizador asíncrono que ejecuta un callback 
+    Gestiona un temporizador que ejecuta un callback
     si no se reinicia antes de que expire el tiempo (TTL).
+    El plazo vive en el scheduler compartido (sin una task por sesión).
     """
     def __init__(self, timeout_seconds: int, callback: Callable[[], Awaitable[None]]):
         self.timeout = timeout_seconds
         self.callback = callback
-        self._task: asyncio.Task | None = None
+        self._deadline: Optional[Deadline] = None
         self._is_running = False
 
     def start(self):
         """Inicia o reinicia el temporizador (Síncrono)"""
         self.cancel() # Cancelar cualquier timer previo
         self._is_running = True
-        self._task = asyncio.create_task(self._timer_loop())
+        self._deadline = scheduler.call_later(self.timeout, self._on_expire)
 
     def cancel(self):
         """Detiene el temporizador"""
-        if self._task and not self._task.done():
-            self._task.cancel()
+        if self._deadline:
+            self._deadline.cancel()
+            self._deadline = None
         self._is_running = False
 
     def is_active(self):
         return self._is_running
 
-    async def _timer_loop(self):
-        """La corrutina que espera y ejecuta el callback"""
+    async def _on_expire(self):
+        """Plazo vencido: ejecuta el callback"""
+        if not self._is_running:
+            return
+        self._is_running = False
+        self._deadline = None
         try:
-            await asyncio.sleep(self.timeout)
-            if self._is_running:
-                self._is_running = False
-                await self.callback()
-        except asyncio.CancelledError:
-            raise
+            await self.callback()
         except Exception as e:
-            print(f"❌ Error en IdleMonitor: {e}")
\ No newline at end of file
+            print(f"❌ Error en IdleMonitor: {e}")
@@ -1,10 +1,39 @@
+import asyncio
 import ollama
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from fastapi import HTTPException
 from app.config import config
 from app.database import db
+from app.services import tracing
+from app.services.metrics import LLM_SECONDS
+from app.services.recorder import recorder
 # Importamos AMBOS prompts por si necesitamos valores por defecto
-from app.prompts import HEALTH_SYSTEM_PROMPT, PROACTIVE_NUDGE_PROMPT, extract_options_from_text
+from app.prompts import (
+    HEALTH_SYSTEM_PROMPT, PROACTIVE_NUDGE_PROMPT, extract_options_from_text,
+    IDLE_NUDGE_FALLBACK, IDLE_NUDGE_ERROR, EXAM_INJECTION_FALLBACK
+)
+
+_async_client: Optional[ollama.AsyncClient] = None
+
+def get_async_client() -> ollama.AsyncClient:
+    """Cliente asíncrono compartido: cancelar la tarea corta la generación en Ollama"""
+    global _async_client
+    if _async_client is None:
+        _async_client = ollama.AsyncClient()
+    return _async_client
+
+def observe_ollama(response, start_ns: int, end_ns: int):
+    """
+    Métrica de latencia del LLM y spans a partir de las duraciones que reporta
+    Ollama (ns): carga del modelo + evaluación del prompt (prefill) = tiempo hasta el primer token.
+    """
+    LLM_SECONDS.observe((end_ns - start_ns) / 1e9)
+    load = response.get('load_duration') or 0
+    prefill = response.get('prompt_eval_duration') or 0
+    first_token = start_ns + load + prefill
+    tracing.record("llm.prefill", start_ns + load, first_token, prompt_tokens=response.get('prompt_eval_count'))
+    tracing.record("llm.first_token", start_ns, first_token)
+    tracing.record("llm.total", start_ns, end_ns, model=config.LLM_MODEL, completion_tokens=response.get('eval_count'))
 
 class LLMService:
     """Servicio de Lenguaje Local con Gestión de Contexto y Persistencia"""
@@ -27,7 +56,8 @@ class LLMService:
             db.add_message(session_id=session_id, role="user", content=user_text)
             
             # 2. Recuperar contexto
-            history = db.get_recent_context(session_id, limit=5)
+            with tracing.span("llm.context"):
+                history = db.get_recent_context(session_id, limit=5)
             
             # 3. Construir payload
             # CAMBIO 2: Usamos la variable 'system_prompt' en lugar de la constante fija
@@ -36,14 +66,7 @@ class LLMService:
             ] + history
             
             # 4. Llamada a Ollama
-            response_raw = ollama.chat(
-                model=config.LLM_MODEL,
-                messages=messages_payload,
-                stream=False,
-                options={'temperature': temperature, 'num_predict': 400}
-            )
-            
-            assistant_text = response_raw['message']['content']
+            assistant_text = LLMService.complete(messages_payload, temperature)
             
             # 5. Extraer y guardar (Lógica común para ambos bots)
             detected_options = extract_options_from_text(assistant_text)
@@ -60,6 +83,67 @@ class LLMService:
             print(f"❌ Error en LLM Service: {e}")
             raise HTTPException(status_code=500, detail=f"Error procesando interacción: {str(e)}")
 
+    @staticmethod
+    def complete(messages_payload: List[dict], temperature: float = 0.7, num_predict: int = 400) -> str:
+        """
+        Llamada a Ollama con métricas y trazas. El payload queda en el turno
+        que se esté grabando (para reproducirlo tal cual offline).
+        """
+        recorder.capture(messages=messages_payload, temperature=temperature)
+        t0 = tracing.now_ns()
+        response_raw = ollama.chat(
+            model=config.LLM_MODEL,
+            messages=messages_payload,
+            stream=False,
+            options={'temperature': temperature, 'num_predict': num_predict}
+        )
+        observe_ollama(response_raw, t0, tracing.now_ns())
+        return response_raw['message']['content']
+
+    # ==========================================
+    # GENERACIÓN ESPECULATIVA (sin persistir hasta confirmar)
+    # ==========================================
+    @staticmethod
+    async def generate_reply(
+        session_id: str,
+        user_text: str,
+        temperature: float = 0.7,
+        system_prompt: str = HEALTH_SYSTEM_PROMPT
+    ) -> Tuple[str, List[dict]]:
+        """
+        Misma respuesta que process_user_interaction pero SIN escribir en BD
+        (el mensaje del usuario se añade al final del historial en memoria).
+        Cancelable: se usa para especular sobre transcripciones parciales.
+        Devuelve (respuesta, payload): el payload se graba con el turno si se confirma
+        (la especulación corre antes de que exista el turno en el grabador).
+        """
+        history = await asyncio.to_thread(db.get_recent_context, session_id, 4)
+        messages_payload = [
+            {"role": "system", "content": system_prompt}
+        ] + history + [{"role": "user", "content": user_text}]
+
+        t0 = tracing.now_ns()
+        response_raw = await get_async_client().chat(
+            model=config.LLM_MODEL,
+            messages=messages_payload,
+            stream=False,
+            options={'temperature': temperature, 'num_predict': 400}
+        )
+        observe_ollama(response_raw, t0, tracing.now_ns())
+        return response_raw['message']['content'], messages_payload
+
+    @staticmethod
+    def commit_reply(session_id: str, user_text: str, assistant_text: str):
+        """Persiste un turno generado con generate_reply (mismo formato que process_user_interaction)"""
+        db.add_message(session_id=session_id, role="user", content=user_text)
+        detected_options = extract_options_from_text(assistant_text)
+        db.add_message(
+            session_id=session_id,
+            role="assistant",
+            content=assistant_text,
+            options=detected_options if detected_options else None
+        )
+
     # ==========================================
     # NUEVO MÉTODO: Para las inyecciones del Timer
     # ==========================================
@@ -86,11 +170,13 @@ class LLMService:
             })
             
             # 4. Llamada a Ollama
+            t0 = tracing.now_ns()
             response = ollama.chat(
                 model=config.LLM_MODEL,
                 messages=messages_payload,
                 options={'temperature': 0.7, 'num_predict': 150}
             )
+            observe_ollama(response, t0, tracing.now_ns())
             
             assistant_text = response['message']['content']
             
@@ -102,7 +188,7 @@ class LLMService:
             
         except Exception as e:
             print(f"❌ Error en Injection: {e}")
-            return "¡Vamos, tú puedes!" # Fallback de emergencia
+            return EXAM_INJECTION_FALLBACK # Fallback de emergencia
 
     @staticmethod
     def generate_proactive_followup(session_id: str) -> str:
@@ -113,7 +199,7 @@ class LLMService:
         try:
             history = db.get_recent_context(session_id, limit=5)
             if not history:
-                return "Hola, estoy aquí si necesitas ayuda para empezar."
+                return IDLE_NUDGE_FALLBACK
 
             # Usamos trigger message para VitalBot
             trigger_message = {
@@ -125,11 +211,13 @@ class LLMService:
                 {"role": "system", "content": PROACTIVE_NUDGE_PROMPT}
             ] + history + [trigger_message]
             
+            t0 = tracing.now_ns()
             response_raw = ollama.chat(
                 model=config.LLM_MODEL,
                 messages=messages_payload,
                 options={'temperature': 0.8, 'num_predict': 60}
             )
+            observe_ollama(response_raw, t0, tracing.now_ns())
             
             proactive_text = response_raw['message']['content']
             
@@ -144,4 +232,4 @@ class LLMService:
 
         except Exception as e:
             print(f"❌ Error nudge: {e}")
-            return "¿Hola? ¿Sigues ahí?"
\ No newline at end of file
+            return IDLE_NUDGE_ERROR
\ No newline at end of file
@@ -0,0 +1,82 @@
+import asyncio
+import resource
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from app.config import config
+
+# ==========================================
+# MÉTRICAS PROMETHEUS (agregadas, para Grafana)
+# ==========================================
+# Complementan las trazas por turno (tracing.py): aquí sólo contadores e
+# histogramas baratos de actualizar. El ProcessCollector por defecto de
+# prometheus_client ya exporta process_resident_memory_bytes y la CPU.
+
+# Latencias de voz: de milisegundos (BD) a varios segundos (STT/LLM en CPU)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+TURNS = Counter("vapi_turns", "Turnos de voz procesados", ["bot_mode", "outcome"])
+STAGE_SECONDS = Histogram("vapi_stage_duration_seconds", "Duración por etapa del turno", ["stage"], buckets=STAGE_BUCKETS)
+ACTIVE_SESSIONS = Gauge("vapi_active_sessions", "Sesiones /ws/voice abiertas", ["bot_mode"])
+LOOP_LAG = Histogram("vapi_event_loop_lag_seconds", "Retraso del event loop sobre lo programado", buckets=LAG_BUCKETS)
+THREADPOOL_MAX = Gauge("vapi_threadpool_max_workers", "Hilos máximos del executor de asyncio.to_thread")
+THREADPOOL_WORKERS = Gauge("vapi_threadpool_workers", "Hilos creados en el executor de asyncio.to_thread")
+THREADPOOL_QUEUED = Gauge("vapi_threadpool_queued", "Trabajos esperando un hilo libre (saturación)")
+PEAK_RSS = Gauge("vapi_process_peak_rss_bytes", "Pico de RSS desde el arranque (ru_maxrss: nunca baja; el RSS actual es process_resident_memory_bytes)")
+ADMISSION_REJECTED = Counter("vapi_admission_rejected", "Sesiones y turnos rechazados por saturación", ["scope"])
+TURNS_IN_FLIGHT = Gauge("vapi_turns_in_flight", "Turnos con hueco asignado (STT -> LLM -> TTS en curso)")
+TURNS_QUEUED = Gauge("vapi_turns_queued", "Turnos esperando hueco en el control de admisión")
+STAGE_IN_FLIGHT = Gauge("vapi_stage_in_flight", "Trabajos en curso por etapa (parciales y especulativos incluidos)", ["stage"])
+ESTIMATED_WAIT = Gauge("vapi_admission_estimated_wait_seconds", "Espera estimada para un turno nuevo")
+DB_WRITE_QUEUE = Gauge("vapi_db_write_queue", "Mensajes del historial en cola de escritura")
+DB_DEAD_LETTER = Counter("vapi_db_dead_letter_rows", "Mensajes del historial desviados al fichero dead-letter", ["reason"])
+
+# Hijos con la etiqueta ya resuelta: observar no busca en el dict de labels
+STT_SECONDS = STAGE_SECONDS.labels(stage="stt")
+LLM_SECONDS = STAGE_SECONDS.labels(stage="llm")
+TTS_SECONDS = STAGE_SECONDS.labels(stage="tts")
+DB_READ_SECONDS = STAGE_SECONDS.labels(stage="db_read")
+DB_WRITE_SECONDS = STAGE_SECONDS.labels(stage="db_write")
+QUEUE_WAIT_SECONDS = STAGE_SECONDS.labels(stage="threadpool_wait")
+ADMISSION_WAIT_SECONDS = STAGE_SECONDS.labels(stage="admission_wait")
+
+# Sólo el máximo histórico (dimensionar la máquina con los modelos cargados): para ver memoria
+# liberada o fugas usar process_resident_memory_bytes del ProcessCollector (/proc/self/stat)
+PEAK_RSS.set_function(lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)  # ru_maxrss en KiB (Linux)
+
+def mode_label(bot_mode: str) -> str:
+    """bot_mode llega por query string: se acota para no disparar la cardinalidad"""
+    return "exabot" if bot_mode == "exabot" else "vitalbot"
+
+# ==========================================
+# THREADPOOL Y EVENT LOOP
+# ==========================================
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def install_executor(loop: asyncio.AbstractEventLoop) -> ThreadPoolExecutor:
+    """
+    Executor por defecto del loop (el de asyncio.to_thread) con tamaño fijo
+    (THREADPOOL_MAX_WORKERS) y gauges de ocupación leídos al hacer scrape.
+    """
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=config.THREADPOOL_MAX_WORKERS, thread_name_prefix="vapi-worker")
+    loop.set_default_executor(_executor)
+    THREADPOOL_MAX.set(config.THREADPOOL_MAX_WORKERS)
+    THREADPOOL_WORKERS.set_function(lambda: len(_executor._threads))
+    THREADPOOL_QUEUED.set_function(lambda: _executor._work_queue.qsize())
+    return _executor
+
+async def loop_lag_monitor():
+    """Tarea de fondo: cuánto tarda el loop en despertar una espera de LOOP_LAG_INTERVAL"""
+    loop = asyncio.get_running_loop()
+    interval = config.LOOP_LAG_INTERVAL
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - t0 - interval))
+
+def render() -> Tuple[bytes, str]:
+    """Exposición en formato de texto de Prometheus"""
+    return generate_latest(), CONTENT_TYPE_LATEST
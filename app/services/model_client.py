@@ -0,0 +1,215 @@
+import asyncio
+import queue
+import socket
+import struct
+import numpy as np
+import orjson
+from typing import Dict, Optional, Set, Tuple
+from app.config import config
+
+# ==========================================
+# PROTOCOLO DEL SERVIDOR DE MODELOS
+# ==========================================
+# Cada mensaje es un frame: "!II" (longitud de cabecera, longitud de payload),
+# cabecera JSON y payload binario (audio). Las respuestas llevan el mismo "id"
+# que la petición, así una conexión admite varias peticiones en vuelo (VAD).
+# Operaciones: transcribe (kind file|pcm), vad, vad_reset, vad_close y ping.
+
+FRAME = struct.Struct("!II")
+
+def encode_frame(header: dict, payload: bytes = b"") -> bytes:
+    head = orjson.dumps(header)
+    return FRAME.pack(len(head), len(payload)) + head + payload
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[dict, bytes]:
+    head_len, payload_len = FRAME.unpack(await reader.readexactly(FRAME.size))
+    header = orjson.loads(await reader.readexactly(head_len))
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return header, payload
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while view:
+        n = sock.recv_into(view)
+        if not n:
+            raise ConnectionError("El servidor de modelos cerró la conexión")
+        view = view[n:]
+    return bytes(buf)
+
+class ModelServerError(RuntimeError):
+    """Error devuelto por el servidor de modelos (o servidor inaccesible)"""
+
+# ==========================================
+# CLIENTE SÍNCRONO (STT, desde el threadpool)
+# ==========================================
+
+class ModelClient:
+    """
+    Cliente del servidor de modelos para llamadas bloqueantes.
+    STTService se ejecuta en el threadpool: cada hilo toma una conexión del
+    pool (una petición a la vez por conexión) y la devuelve al terminar.
+    """
+
+    def __init__(self, path: str = config.MODEL_SERVER_SOCKET, timeout: float = config.MODEL_SERVER_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise ModelServerError(f"Servidor de modelos no disponible en {self.path}: {e}")
+        return sock
+
+    def request(self, header: dict, payload: bytes = b"") -> dict:
+        frame = encode_frame(header, payload)
+        while True:
+            try:
+                sock, pooled = self._pool.get_nowait(), True
+            except queue.Empty:
+                sock, pooled = self._connect(), False
+            try:
+                sock.sendall(frame)
+                head_len, payload_len = FRAME.unpack(_recv_exactly(sock, FRAME.size))
+                response = orjson.loads(_recv_exactly(sock, head_len))
+                if payload_len:
+                    _recv_exactly(sock, payload_len)
+                break
+            except (OSError, ConnectionError) as e:
+                sock.close()  # Estado del stream desconocido: no vuelve al pool
+                # Conexión del pool caducada (p.ej. servidor reiniciado): se reintenta con otra
+                if not pooled or isinstance(e, socket.timeout):
+                    raise ModelServerError(f"Error con el servidor de modelos: {e}")
+        self._pool.put(sock)
+        if not response.get("ok"):
+            raise ModelServerError(response.get("error", "Error desconocido"))
+        return response
+
+    def transcribe(self, audio: bytes, kind: str, language: str = "es") -> str:
+        """kind: 'file' (contenedor que decodifica ffmpeg) o 'pcm' (float32 mono 16 kHz)"""
+        return self.request({"op": "transcribe", "kind": kind, "language": language}, audio)["text"]
+
+    def ping(self) -> dict:
+        return self.request({"op": "ping"})
+
+# ==========================================
+# MOTOR VAD REMOTO (asíncrono, en el event loop)
+# ==========================================
+
+class RemoteVADEngine:
+    """
+    Misma interfaz que BatchedVADEngine, pero la inferencia la hace el servidor
+    de modelos: una conexión por worker con las peticiones multiplexadas por id.
+    El servidor junta en un mismo batch los chunks de todos los workers.
+    Los streams se crean en el servidor con su primer chunk; si la conexión se
+    pierde, el estado recurrente vuelve a cero (como tras un reset).
+    """
+
+    def __init__(self, path: str = config.MODEL_SERVER_SOCKET):
+        self.path = path
+        self._streams: Set[int] = set()
+        self._next_id = 0
+        self._next_request = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+
+    # --- Streams ---
+
+    def register(self) -> int:
+        stream_id = self._next_id
+        self._next_id += 1
+        self._streams.add(stream_id)
+        return stream_id
+
+    def reset(self, stream_id: int):
+        self._notify("vad_reset", stream_id)
+
+    def unregister(self, stream_id: int):
+        if stream_id in self._streams:
+            self._streams.discard(stream_id)
+            self._notify("vad_close", stream_id)
+
+    @property
+    def active_streams(self) -> int:
+        return len(self._streams)
+
+    def _notify(self, op: str, stream_id: int):
+        # Sin conexión no hay estado remoto que tocar
+        if self._writer is not None:
+            self._writer.write(encode_frame({"op": op, "stream": stream_id}))
+
+    # --- Inferencia ---
+
+    async def infer(self, stream_id: int, chunk: np.ndarray) -> float:
+        """Probabilidad de voz de un chunk (resuelta por el servidor en su próximo batch)"""
+        writer = self._writer or await self._connect()
+        request_id = self._next_request
+        self._next_request += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = fut
+        writer.write(encode_frame({"id": request_id, "op": "vad", "stream": stream_id}, chunk.tobytes()))
+        try:
+            return await fut
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        async with self._connect_lock:
+            if self._writer is None:
+                try:
+                    reader, writer = await asyncio.open_unix_connection(self.path)
+                except OSError as e:
+                    raise ModelServerError(f"Servidor de modelos no disponible en {self.path}: {e}")
+                self._writer = writer
+                self._reader_task = asyncio.create_task(self._read_loop(reader, writer))
+            return self._writer
+
+    async def close(self):
+        """Apagado: corta la conexión; las inferencias pendientes fallan con ModelServerError"""
+        task, self._reader_task = self._reader_task, None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        error: Exception = ModelServerError("Conexión con el servidor de modelos cerrada")
+        try:
+            while True:
+                header, _ = await read_frame(reader)
+                fut = self._pending.get(header.get("id"))
+                if fut is None or fut.done():
+                    continue
+                if header.get("ok"):
+                    fut.set_result(header["prob"])
+                else:
+                    fut.set_exception(ModelServerError(header.get("error", "Error desconocido")))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = ModelServerError(f"Conexión con el servidor de modelos perdida: {e}")
+        except Exception as e:
+            # Respuesta ilegible: la conexión ya no es fiable, se descarta
+            print(f"❌ Servidor de modelos: respuesta inválida ({e})")
+            error = ModelServerError(f"Respuesta inválida del servidor de modelos: {e}")
+        finally:
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(error)
+
+# Instancia global (STT)
+model_client = ModelClient()
@@ -0,0 +1,172 @@
+"""
+Servidor de modelos compartido: Whisper y Silero VAD cargados una sola vez
+para todos los workers de uvicorn (que quedan como procesos de E/S ligeros).
+
+Uso:
+    MODEL_SERVER_SOCKET=/tmp/vapi-models.sock python -m app.services.model_server
+    MODEL_SERVER_SOCKET=/tmp/vapi-models.sock uvicorn main:app --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+import numpy as np
+from app.config import config
+from app.services.model_client import encode_frame, read_frame
+
+def load_whisper_model(name: str = config.STT_MODEL):
+    """Carga Whisper (import perezoso: torch sólo entra en el proceso que hace la inferencia)"""
+    import whisper
+    print(f"🎤 Cargando modelo Whisper '{name}'...")
+    try:
+        model = whisper.load_model(name)
+        print("✅ Modelo Whisper cargado")
+        return model
+    except Exception as e:
+        print(f"❌ Error cargando Whisper: {e}")
+        return None
+
+class ModelServer:
+    """Atiende transcripciones (en un pool propio) y chunks de VAD (batch compartido) por un socket Unix"""
+
+    def __init__(self, path: str, stt_workers: int = config.MODEL_SERVER_STT_WORKERS, load_stt: bool = True):
+        self.path = path
+        self.whisper_model = load_whisper_model() if load_stt else None
+        self.vad_engine = None
+        if config.VAD_BACKEND == "onnx":
+            # Siempre el motor local (get_vad_engine() devolvería el remoto con MODEL_SERVER_SOCKET)
+            from app.services.vad import BatchedVADEngine
+            print("🔊 Cargando Silero VAD (onnxruntime, batch compartido)...")
+            self.vad_engine = BatchedVADEngine()
+            print("✅ Silero VAD cargado")
+        self.stt_pool = ThreadPoolExecutor(max_workers=stt_workers, thread_name_prefix="stt")
+        self.stt_workers = stt_workers
+        self.connections = 0
+        self.started_at = time.time()
+
+    # --- Inferencia ---
+
+    def _transcribe(self, kind: str, payload: bytes, language: str) -> str:
+        if kind == "pcm":
+            audio = np.frombuffer(payload, dtype=np.float32)
+            return self.whisper_model.transcribe(audio=audio, language=language, fp16=False)["text"]
+        # Contenedor (webm/wav/mp3): Whisper lo decodifica con ffmpeg desde un fichero
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
+                tmp_file.write(payload)
+                tmp_path = tmp_file.name
+            return self.whisper_model.transcribe(audio=tmp_path, language=language, fp16=False)["text"]
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    async def _reply_transcribe(self, writer: asyncio.StreamWriter, header: dict, payload: bytes):
+        response = {"id": header.get("id")}
+        if self.whisper_model is None:
+            response.update(ok=False, error="Modelo Whisper no inicializado")
+        else:
+            try:
+                loop = asyncio.get_running_loop()
+                text = await loop.run_in_executor(
+                    self.stt_pool, self._transcribe, header.get("kind", "file"), payload, header.get("language", "es")
+                )
+                response.update(ok=True, text=text)
+            except Exception as e:
+                response.update(ok=False, error=str(e))
+        writer.write(encode_frame(response))
+
+    async def _reply_vad(self, writer: asyncio.StreamWriter, header: dict, fut: asyncio.Future):
+        try:
+            response = {"id": header["id"], "ok": True, "prob": await fut}
+        except Exception as e:
+            response = {"id": header["id"], "ok": False, "error": str(e) or type(e).__name__}
+        writer.write(encode_frame(response))
+
+    # --- Conexiones (una por worker y, para STT, una por hilo del worker) ---
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        streams: Dict[int, int] = {}  # stream del worker -> stream del motor VAD
+        tasks = set()
+        try:
+            while True:
+                header, payload = await read_frame(reader)
+                op = header.get("op")
+                if op == "vad":
+                    if self.vad_engine is None:
+                        writer.write(encode_frame({"id": header["id"], "ok": False, "error": "VAD no disponible"}))
+                        continue
+                    stream = streams.get(header["stream"])
+                    if stream is None:
+                        stream = streams[header["stream"]] = self.vad_engine.register()
+                    # Se encola ya (orden del stream frente a vad_reset) y se responde al resolverse el batch
+                    fut = self.vad_engine.submit(stream, np.frombuffer(payload, dtype=np.float32))
+                    task = asyncio.create_task(self._reply_vad(writer, header, fut))
+                elif op == "vad_reset":
+                    if header["stream"] in streams:
+                        self.vad_engine.reset(streams[header["stream"]])
+                    continue
+                elif op == "vad_close":
+                    if header["stream"] in streams:
+                        self.vad_engine.unregister(streams.pop(header["stream"]))
+                    continue
+                elif op == "transcribe":
+                    task = asyncio.create_task(self._reply_transcribe(writer, header, payload))
+                elif op == "ping":
+                    writer.write(encode_frame({"id": header.get("id"), "ok": True, **self.status()}))
+                    continue
+                else:
+                    writer.write(encode_frame({"id": header.get("id"), "ok": False, "error": f"Operación desconocida: {op}"}))
+                    continue
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            for task in tasks:
+                task.cancel()
+            for stream in streams.values():
+                self.vad_engine.unregister(stream)
+            writer.close()
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "stt_model": config.STT_MODEL if self.whisper_model is not None else None,
+            "vad": self.vad_engine is not None,
+            "vad_streams": self.vad_engine.active_streams if self.vad_engine else 0,
+            "stt_workers": self.stt_workers,
+            "connections": self.connections,
+            "uptime_s": round(time.time() - self.started_at, 1),
+        }
+
+    async def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Socket de una ejecución anterior
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"🧠 Servidor de modelos en {self.path} (pid {os.getpid()}, {self.stt_workers} hilos STT)")
+        async with server:
+            await stop.wait()
+        self.stt_pool.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        print("🧠 Servidor de modelos detenido")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=config.MODEL_SERVER_SOCKET or "/tmp/vapi-models.sock")
+    parser.add_argument("--stt-workers", type=int, default=config.MODEL_SERVER_STT_WORKERS)
+    parser.add_argument("--no-stt", action="store_true", help="Sólo VAD (p.ej. para medir memoria sin Whisper)")
+    args = parser.parse_args()
+    asyncio.run(ModelServer(args.socket, args.stt_workers, load_stt=not args.no_stt).serve())
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import json
+import os
+import zipfile
+from typing import Dict, List, Optional, Tuple
+from app.config import config
+from app.prompts import PHRASE_BANK
+from app.services.tts_engines import get_engine
+
+class PhraseBank:
+    """
+    Audio pre-sintetizado para frases conocidas en el despliegue
+    (fallbacks de nudge, avisos de examen, errores...).
+    Se sirve desde memoria: cero latencia de síntesis y cero coste por sesión.
+    """
+
+    def __init__(self, bundle_path: str = config.PHRASE_BANK_BUNDLE):
+        self.bundle_path = bundle_path
+        self._audio: Dict[str, Tuple[bytes, str]] = {}
+        # Variantes ya transcodificadas por formato de salida: (texto, formato) -> (audio, mime)
+        self._variants: Dict[Tuple[str, str], Tuple[bytes, str]] = {}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _voice_signature() -> str:
+        """Si cambia el motor o la voz, el bundle persistido deja de ser válido"""
+        return f"{config.TTS_ENGINE}:{config.ELEVENLABS_VOICE_ID}"
+
+    def get(self, text: str, audio_format: Optional[str] = None) -> Optional[Tuple[bytes, str]]:
+        if audio_format:
+            return self._variants.get((self.normalize(text), audio_format))
+        return self._audio.get(self.normalize(text))
+
+    def put_variant(self, text: str, audio_format: str, audio: Tuple[bytes, str]):
+        self._variants[(self.normalize(text), audio_format)] = audio
+
+    def load_phrases(self) -> List[str]:
+        """Frases por defecto (prompts.PHRASE_BANK) + las del JSON de configuración"""
+        phrases = list(PHRASE_BANK)
+        if config.PHRASE_BANK_PATH:
+            try:
+                with open(config.PHRASE_BANK_PATH, "r", encoding="utf-8") as f:
+                    phrases += [p for p in json.load(f) if isinstance(p, str)]
+            except (OSError, ValueError) as e:
+                print(f"⚠️ No se pudo leer PHRASE_BANK_PATH: {e}")
+        # Sin duplicados, conservando el orden
+        return list(dict.fromkeys(self.normalize(p) for p in phrases if p.strip()))
+
+    # ==========================================
+    # PERSISTENCIA
+    # ==========================================
+
+    def load_bundle(self) -> int:
+        """Carga el audio persistido (zip: index.json + audio/<key>)"""
+        if not self.bundle_path or not os.path.exists(self.bundle_path):
+            return 0
+        try:
+            with zipfile.ZipFile(self.bundle_path, "r") as zf:
+                index = json.loads(zf.read("index.json"))
+                if index.get("voice") != self._voice_signature():
+                    print("⚠️ Phrase bank persistido con otra voz/motor: se ignora")
+                    return 0
+                for key, entry in index["phrases"].items():
+                    self._audio[entry["text"]] = (zf.read(f"audio/{key}"), entry["mime"])
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            print(f"⚠️ Phrase bank corrupto ({e}): se regenerará")
+            self._audio.clear()
+            return 0
+        print(f"📦 Phrase bank cargado: {len(self._audio)} frases")
+        return len(self._audio)
+
+    def save_bundle(self):
+        if not self.bundle_path:
+            return
+        tmp_path = f"{self.bundle_path}.tmp"
+        index = {"voice": self._voice_signature(), "phrases": {}}
+        with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_STORED) as zf:
+            for text, (audio, mime) in self._audio.items():
+                key = self._key(text)
+                index["phrases"][key] = {"text": text, "mime": mime}
+                zf.writestr(f"audio/{key}", audio)
+            zf.writestr("index.json", json.dumps(index, ensure_ascii=False))
+        os.replace(tmp_path, self.bundle_path)
+
+    # ==========================================
+    # PRE-SÍNTESIS
+    # ==========================================
+
+    async def warm(self):
+        """
+        Sintetiza en segundo plano las frases que falten.
+        Usa SOLO el motor principal: no queremos congelar en memoria
+        el audio de un motor de respaldo.
+        """
+        engine = get_engine(config.TTS_ENGINE)
+        if engine is None or not engine.is_available():
+            print("⚠️ Phrase bank: motor principal no disponible, se omite la pre-síntesis")
+            return
+
+        added = 0
+        for text in self.load_phrases():
+            if text in self._audio:
+                continue
+            try:
+                self._audio[text] = await engine.synthesize(text)
+                added += 1
+            except Exception as e:
+                print(f"⚠️ Phrase bank: no se pudo sintetizar '{text[:30]}...': {e}")
+
+        if added:
+            await asyncio.to_thread(self.save_bundle)
+        print(f"✅ Phrase bank listo: {len(self._audio)} frases ({added} nuevas)")
+
+# Instancia global
+phrase_bank = PhraseBank()
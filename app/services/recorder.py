@@ -0,0 +1,131 @@
+import asyncio
+import io
+import os
+import random
+import threading
+import time
+import uuid
+import wave
+import numpy as np
+import orjson
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple, Union
+from app.config import config
+
+# ==========================================
+# GRABACIÓN DE TURNOS (opt-in: TURN_RECORD_DIR)
+# ==========================================
+# Cada turno grabado deja una línea en <dir>/<AAAAMMDD>/turns.jsonl (transcripción,
+# mensajes enviados al LLM, respuesta y tiempos por etapa) y su audio de entrada
+# en <dir>/<AAAAMMDD>/audio/<turn_id>.<ext>. benchmarks/replay.py lo reproduce.
+# Igual que en tracing, el registro activo viaja en un ContextVar: el LLM
+# (en el threadpool) aporta su payload sin cambiar firmas.
+
+PCM_MIME = "audio/pcm;rate=16000"
+AUDIO_EXTENSIONS = {
+    "audio/webm": "webm",
+    "audio/webm;codecs=opus": "webm",
+    "audio/wav": "wav",
+    "audio/mpeg": "mp3",
+    PCM_MIME: "wav",  # Segmentos del VAD: se guardan como WAV int16
+}
+
+_current: ContextVar[Optional["TurnRecord"]] = ContextVar("vapi_turn_record", default=None)
+
+class TurnRecord:
+    """Lo necesario para reproducir un turno: entrada, payload del LLM, salida y tiempos"""
+
+    def __init__(self, session_id: str, bot_mode: str, ingest: str, audio: bytes, audio_mime: str):
+        self.turn_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.bot_mode = bot_mode
+        self.ingest = ingest
+        self.started_at = time.time()
+        self.audio = audio
+        self.audio_mime = audio_mime
+        self.transcript: Optional[str] = None
+        self.user_message: Optional[str] = None
+        self.messages: Optional[List[Dict[str, str]]] = None
+        self.temperature: Optional[float] = None
+        self.speculative = False
+        self.response: Optional[str] = None
+        self.outcome: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+
+    def to_json(self, audio_file: str) -> Dict[str, Any]:
+        data = {k: v for k, v in vars(self).items() if k != "audio"}
+        data["audio_file"] = audio_file
+        return data
+
+def pcm_to_wav(samples: np.ndarray) -> bytes:
+    """float32 mono 16 kHz (segmento del VAD) -> WAV int16"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+class TurnRecorder:
+    """Grabador de turnos para reproducirlos offline (desactivado si TURN_RECORD_DIR está vacío)"""
+
+    def __init__(self, root: str = config.TURN_RECORD_DIR, sample: float = config.TURN_RECORD_SAMPLE):
+        self.root = root
+        self.sample = sample
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root) and self.sample > 0
+
+    def start(
+        self,
+        session_id: str,
+        bot_mode: str,
+        ingest: str,
+        audio: Union[Tuple[bytes, Optional[str]], np.ndarray, None]
+    ) -> Optional[TurnRecord]:
+        """Abre el registro del turno (None si no se graba: desactivado, muestreo o sin audio)"""
+        if not self.enabled or audio is None or random.random() >= self.sample:
+            return None
+        if isinstance(audio, np.ndarray):
+            data, mime = pcm_to_wav(audio), PCM_MIME
+        else:
+            data, mime = bytes(audio[0]), audio[1] or "audio/webm"
+        record = TurnRecord(session_id, bot_mode, ingest, data, mime)
+        _current.set(record)
+        return record
+
+    async def finish(self, record: TurnRecord, **fields):
+        """Cierra el registro y lo escribe en disco (en un hilo)"""
+        if _current.get() is record:
+            _current.set(None)
+        for key, value in fields.items():
+            setattr(record, key, value)
+        await asyncio.to_thread(self._write, record)
+
+    @staticmethod
+    def capture(**fields):
+        """Añade datos al turno que se está grabando (no-op si no se graba)"""
+        record = _current.get()
+        if record is not None:
+            for key, value in fields.items():
+                setattr(record, key, value)
+
+    def _write(self, record: TurnRecord):
+        day_dir = os.path.join(self.root, time.strftime("%Y%m%d", time.localtime(record.started_at)))
+        audio_file = f"audio/{record.turn_id}.{AUDIO_EXTENSIONS.get(record.audio_mime, 'bin')}"
+        try:
+            os.makedirs(os.path.join(day_dir, "audio"), exist_ok=True)
+            with open(os.path.join(day_dir, audio_file), "wb") as f:
+                f.write(record.audio)
+            line = orjson.dumps(record.to_json(audio_file)) + b"\n"
+            with self._lock, open(os.path.join(day_dir, "turns.jsonl"), "ab") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"⚠️ No se pudo grabar el turno {record.turn_id}: {e}")
+
+# Instancia global
+recorder = TurnRecorder()
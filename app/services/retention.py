@@ -0,0 +1,21 @@
+import asyncio
+from app.config import config
+from app.database import db
+
+async def retention_loop():
+    """
+    Tarea de fondo del proceso: archiva las sesiones caducadas y compacta
+    la BD (incremental_vacuum + checkpoint del WAL) cada RETENTION_INTERVAL_HOURS.
+    """
+    while True:
+        try:
+            if config.RETENTION_DAYS > 0:
+                archived = await asyncio.to_thread(db.archive_old_sessions, config.RETENTION_DAYS, config.ARCHIVE_DIR)
+                if archived:
+                    print(f"🗄️ Retención: {archived} mensajes archivados (> {config.RETENTION_DAYS} días)")
+            await asyncio.to_thread(db.compact)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Error en retención del historial: {e}")
+        await asyncio.sleep(config.RETENTION_INTERVAL_HOURS * 3600)
@@ -0,0 +1,102 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+from typing import Any, Callable, List, Optional, Set
+
+class Deadline:
+    """Plazo registrado en el scheduler (cancelación perezosa: se descarta al salir del heap)"""
+    __slots__ = ("when", "seq", "callback", "cancelled")
+
+    def __init__(self, when: float, seq: int, callback: Callable[[], Any]):
+        self.when = when
+        self.seq = seq
+        self.callback = callback
+        self.cancelled = False
+
+    def __lt__(self, other: "Deadline") -> bool:
+        return (self.when, self.seq) < (other.when, other.seq)
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            scheduler._on_cancel()
+
+    def remaining(self) -> float:
+        """Segundos hasta el plazo (para pausar y reprogramar después)"""
+        return max(0.0, self.when - scheduler.now())
+
+class DeadlineScheduler:
+    """
+    Scheduler de plazos compartido por todo el proceso.
+    Un heap ordenado por instante (reloj monotónico del event loop) y un único
+    loop.call_at armado para el plazo más próximo: miles de sesiones cuestan
+    un despertar por plazo vencido, no un bucle de sondeo por sesión.
+    """
+
+    def __init__(self):
+        self._heap: List[Deadline] = []
+        self._seq = itertools.count()
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._armed_at: Optional[float] = None
+        self._cancelled = 0
+        self._tasks: Set[asyncio.Task] = set()  # Referencias a callbacks async en curso
+
+    @staticmethod
+    def now() -> float:
+        return asyncio.get_running_loop().time()
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._cancelled
+
+    def call_later(self, delay: float, callback: Callable[[], Any]) -> Deadline:
+        """Programa callback (función o corrutina) dentro de delay segundos"""
+        deadline = Deadline(self.now() + max(0.0, delay), next(self._seq), callback)
+        heapq.heappush(self._heap, deadline)
+        if self._armed_at is None or deadline.when < self._armed_at:
+            self._arm()
+        return deadline
+
+    def _on_cancel(self):
+        self._cancelled += 1
+        # Compactar si la mayoría del heap son plazos cancelados
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [d for d in self._heap if not d.cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _arm(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+            self._armed_at = None
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+        if self._heap:
+            self._armed_at = self._heap[0].when
+            # Contexto vacío: los callbacks no heredan la traza del turno que armó el plazo
+            self._handle = asyncio.get_running_loop().call_at(self._armed_at, self._run, context=contextvars.Context())
+
+    def _run(self):
+        self._handle = None
+        self._armed_at = None
+        now = self.now()
+        while self._heap and self._heap[0].when <= now:
+            deadline = heapq.heappop(self._heap)
+            if deadline.cancelled:
+                self._cancelled -= 1
+                continue
+            deadline.cancelled = True  # Ya disparado: cancel() posterior no cuenta
+            try:
+                result = deadline.callback()
+                if asyncio.iscoroutine(result):
+                    task = asyncio.create_task(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            except Exception as e:
+                print(f"❌ Error en plazo programado: {e}")
+        self._arm()
+
+# Instancia global
+scheduler = DeadlineScheduler()
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.config import config
+from app.models import ExamState
+from app.services.scheduler import scheduler, Deadline
+
+class SessionRegistry:
+    """
+    Sesiones desconectadas a la espera de reconexión (mismo client_id).
+    Guarda el estado del examen y el último audio enviado durante
+    SESSION_GRACE_SECONDS; al reconectar se reanuda sin LLM ni TTS.
+
+    Es por proceso, igual que ContextCache (app/database.py): con varios
+    workers sólo se reanuda si la reconexión cae en el mismo worker; si no,
+    la sesión empieza de cero con el historial de la BD.
+    """
+
+    def __init__(self):
+        self._sessions: "OrderedDict[str, ExamState]" = OrderedDict()
+        self._expiry: Dict[str, Deadline] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def park(self, state: ExamState):
+        """Guarda una sesión recién desconectada"""
+        self._discard(state.session_id)
+        self._sessions[state.session_id] = state
+        self._expiry[state.session_id] = scheduler.call_later(
+            config.SESSION_GRACE_SECONDS, lambda: self._expire(state.session_id)
+        )
+        # Tope de memoria (audio incluido): fuera las más antiguas
+        while len(self._sessions) > config.SESSION_REGISTRY_MAX:
+            oldest = next(iter(self._sessions))
+            self._discard(oldest)
+        print(f"💤 Sesión {state.session_id} en espera de reconexión ({config.SESSION_GRACE_SECONDS}s)")
+
+    def resume(self, session_id: str, bot_mode: str) -> Optional[ExamState]:
+        """Recupera (y retira) una sesión en espera del mismo modo"""
+        state = self._sessions.get(session_id)
+        if state is None or state.bot_mode != bot_mode:
+            return None
+        self._discard(session_id)
+        return state
+
+    def _discard(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        deadline = self._expiry.pop(session_id, None)
+        if deadline:
+            deadline.cancel()
+
+    def _expire(self, session_id: str):
+        self._expiry.pop(session_id, None)
+        if self._sessions.pop(session_id, None) is not None:
+            print(f"⌛ Sesión {session_id} expirada (sin reconexión)")
+
+# Instancia global
+session_registry = SessionRegistry()
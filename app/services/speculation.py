@@ -0,0 +1,94 @@
+import asyncio
+import re
+import time
+import unicodedata
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+def normalize_transcript(text: str) -> str:
+    """Minúsculas, sin tildes ni puntuación y espacios colapsados (Whisper varía en eso entre pasadas)"""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.findall(r"\w+", text))
+
+class SpeculativeLLM:
+    """
+    Generación LLM especulativa de una conexión.
+    Arranca con la transcripción parcial de la pausa; si la transcripción final
+    coincide (normalizada) y el contexto que acompaña al mensaje (p.ej. los
+    metadatos del examen) sigue igual, se reutiliza la respuesta; si no se cancela.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.transcript = ""
+        self.user_msg = ""
+        self.context = ""
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.stats = {'attempts': 0, 'hits': 0, 'misses': 0, 'saved_ms': 0}
+
+    def start(self, transcript: str, user_msg: str, generate: Callable[[str], Awaitable[Any]], context: str = ""):
+        """Lanza la generación salvo que ya haya una en curso para el mismo texto y contexto (prefijo estable)"""
+        if self.task and normalize_transcript(transcript) == normalize_transcript(self.transcript) and context == self.context:
+            return
+        self.cancel()
+        self.transcript = transcript
+        self.user_msg = user_msg
+        self.context = context
+        self.started_at = time.perf_counter()
+        self.finished_at = 0.0
+        self.task = asyncio.create_task(generate(user_msg))
+        self.task.add_done_callback(self._on_done)
+        self.stats['attempts'] += 1
+
+    def _on_done(self, task: asyncio.Task):
+        self.finished_at = time.perf_counter()
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.task = None
+
+    async def take(self, final_transcript: str, context: str = "") -> Optional[Tuple[str, Any]]:
+        """
+        (mensaje de usuario, resultado de generate) si la especulación corresponde
+        a la transcripción final y al contexto actual; None (y se cancela) en
+        caso contrario o si falló.
+        """
+        task = self.task
+        if task is None:
+            return None
+        self.task = None
+
+        if normalize_transcript(final_transcript) != normalize_transcript(self.transcript):
+            task.cancel()
+            self.stats['misses'] += 1
+            print(f"🔮 Especulación descartada: '{self.transcript.strip()}' ≠ '{final_transcript.strip()}'")
+            return None
+        if context != self.context:
+            task.cancel()
+            self.stats['misses'] += 1
+            print("🔮 Especulación descartada: el contexto cambió desde la pausa")
+            return None
+
+        # Tiempo que el LLM ya llevaba trabajando cuando llegó la transcripción final
+        head_start = (self.finished_at or time.perf_counter()) - self.started_at
+        try:
+            response = await task
+        except Exception as e:
+            print(f"⚠️ Especulación fallida: {e}")
+            self.stats['misses'] += 1
+            return None
+
+        saved_ms = int(head_start * 1000)
+        self.stats['hits'] += 1
+        self.stats['saved_ms'] += saved_ms
+        print(f"🔮 Especulación acertada: -{saved_ms} ms de LLM")
+        return self.user_msg, response
+
+    def summary(self) -> str:
+        attempts = self.stats['attempts']
+        hits = self.stats['hits']
+        rate = hits / attempts * 100 if attempts else 0
+        avg = self.stats['saved_ms'] // hits if hits else 0
+        return f"{hits}/{attempts} especulaciones acertadas ({rate:.0f}%), {avg} ms ahorrados de media"
@@ -1,22 +1,28 @@
-import whisper
+import numpy as np
 import tempfile
 import os
 from fastapi import HTTPException
 from app.config import config
+from app.services import tracing
+from app.services.metrics import STT_SECONDS
+from app.services.model_client import model_client, ModelServerError
+from app.services.model_server import load_whisper_model
 
-print(f"🎤 Cargando modelo Whisper '{config.STT_MODEL}'...")
-try:
-    whisper_model = whisper.load_model(config.STT_MODEL)
-    print("✅ Modelo Whisper cargado")
-except Exception as e:
-    print(f"❌ Error cargando Whisper: {e}")
+# Con MODEL_SERVER_SOCKET el modelo vive en el servidor de modelos (uno para todos los workers)
+if model_client.enabled:
+    print(f"🎤 STT remoto: servidor de modelos en {model_client.path}")
     whisper_model = None
+else:
+    whisper_model = load_whisper_model(config.STT_MODEL)
 
 class STTService:
     """Servicio de Speech-to-Text con Whisper"""
     
     @staticmethod
     def transcribe(audio_data: bytes, language: str = "es"):
+        if model_client.enabled:
+            with tracing.span("stt", input_bytes=len(audio_data), remote=True), STT_SECONDS.time():
+                return STTService._remote(audio_data, "file", language)
         if not whisper_model:
             raise HTTPException(status_code=500, detail="Modelo Whisper no inicializado")
             
@@ -26,11 +32,12 @@ class STTService:
                 tmp_file.write(audio_data)
                 tmp_path = tmp_file.name
             
-            result = whisper_model.transcribe(
-                audio=tmp_path,
-                language=language,
-                fp16=False 
-            )
+            with tracing.span("stt", input_bytes=len(audio_data)), STT_SECONDS.time():
+                result = whisper_model.transcribe(
+                    audio=tmp_path,
+                    language=language,
+                    fp16=False 
+                )
             
             if tmp_path and os.path.exists(tmp_path):
                 os.unlink(tmp_path)
@@ -42,4 +49,31 @@ class STTService:
                 try: os.unlink(tmp_path)
                 except OSError: 
                     pass
-            raise HTTPException(status_code=500, detail=f"Error STT: {str(e)}")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=f"Error STT: {str(e)}")
+
+    @staticmethod
+    def transcribe_pcm(samples: np.ndarray, language: str = "es"):
+        """Transcribe audio ya decodificado (float32 mono 16 kHz, p.ej. segmentos del VAD)"""
+        if model_client.enabled:
+            with tracing.span("stt", audio_ms=len(samples) * 1000 // 16000, remote=True), STT_SECONDS.time():
+                return STTService._remote(samples.astype(np.float32, copy=False).tobytes(), "pcm", language)
+        if not whisper_model:
+            raise HTTPException(status_code=500, detail="Modelo Whisper no inicializado")
+
+        try:
+            with tracing.span("stt", audio_ms=len(samples) * 1000 // 16000), STT_SECONDS.time():
+                result = whisper_model.transcribe(
+                    audio=samples.astype(np.float32, copy=False),
+                    language=language,
+                    fp16=False
+                )
+            return result["text"]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error STT: {str(e)}")
+
+    @staticmethod
+    def _remote(audio: bytes, kind: str, language: str):
+        try:
+            return model_client.transcribe(audio, kind, language)
+        except ModelServerError as e:
+            raise HTTPException(status_code=500, detail=f"Error STT: {str(e)}")
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import threading
+import time
+import orjson
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+from app.config import config
+from app.services.metrics import QUEUE_WAIT_SECONDS
+
+# ==========================================
+# TRAZAS POR TURNO (formato OTLP/JSON, sin dependencias)
+# ==========================================
+# Cada turno de voz es una traza con un span raíz ("turn") y un span por etapa:
+# decode, admission.wait, stt.queue_wait, stt, llm.queue_wait, llm.context,
+# llm.prefill, llm.first_token, llm.total, tts.first_byte, tts.total, encode y send.
+# La traza activa viaja en un ContextVar: asyncio.to_thread copia el contexto,
+# así los servicios (STT/LLM/TTS) registran sus spans sin recibir parámetros.
+# Sin traza activa, span() y record() no hacen nada.
+
+SERVICE_NAME = "vapi-wannabe"
+SCOPE_NAME = "app.voice"
+
+# Reloj monotónico para duraciones; se traduce a epoch sólo al exportar
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+_current: ContextVar[Optional["TurnTrace"]] = ContextVar("vapi_turn_trace", default=None)
+
+def now_ns() -> int:
+    return time.perf_counter_ns()
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # OTLP/JSON codifica int64 como string
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], start_ns: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or now_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self, trace_id: str) -> Dict[str, Any]:
+        span = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns + _EPOCH_OFFSET_NS),
+            "endTimeUnixNano": str((self.end_ns or self.start_ns) + _EPOCH_OFFSET_NS),
+            "attributes": _otlp_attributes(self.attributes),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+class TurnTrace:
+    """Traza de un turno: span raíz + spans de etapa (hijos directos del raíz)"""
+
+    def __init__(self, session_id: str, bot_mode: str, start_ns: Optional[int] = None, **attributes):
+        self.trace_id = _new_id(16)
+        self.common = {"session.id": session_id, "bot.mode": bot_mode}
+        self.root = Span("turn", None, start_ns or now_ns(), {**self.common, **attributes})
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()  # Los spans de STT/LLM se cierran desde el threadpool
+
+    def add(self, name: str, start_ns: int, end_ns: int, **attributes) -> Span:
+        """Span ya medido (p.ej. duraciones que devuelve Ollama)"""
+        span = Span(name, self.root.span_id, start_ns, {**self.common, **attributes})
+        span.end_ns = end_ns
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def set(self, **attributes):
+        self.root.attributes.update(attributes)
+
+    def end(self):
+        if self.root.end_ns is None:
+            self.root.end_ns = now_ns()
+
+    def timings(self) -> Dict[str, float]:
+        """Milisegundos por etapa (sumados si una etapa se repite) + total del turno"""
+        stages: Dict[str, float] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stages[span.name] = stages.get(span.name, 0.0) + span.duration_ms
+        result = {name: round(ms, 1) for name, ms in stages.items()}
+        result["total"] = round(self.root.duration_ms, 1)
+        return result
+
+    def server_timing(self) -> str:
+        """Resumen con la sintaxis de la cabecera HTTP Server-Timing"""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings().items())
+
+    def to_otlp(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [self.root] + self.spans
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+                "scopeSpans": [{
+                    "scope": {"name": SCOPE_NAME},
+                    "spans": [span.to_otlp(self.trace_id) for span in spans]
+                }]
+            }]
+        }
+
+# ==========================================
+# EXPORTACIÓN
+# ==========================================
+
+class TraceExporter:
+    """
+    TRACE_EXPORT=file: una línea OTLP/JSON por turno en TRACE_FILE
+    (formato del file exporter de OpenTelemetry; lo ingiere un collector con otlpjsonfile).
+    TRACE_EXPORT=console: una línea resumen por turno. TRACE_EXPORT=off: nada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, trace: TurnTrace):
+        mode = config.TRACE_EXPORT
+        if mode == "console":
+            print(f"🧭 Turno {trace.root.attributes['session.id']} ({trace.root.attributes['bot.mode']}): {trace.server_timing()}")
+        elif mode == "file":
+            line = orjson.dumps(trace.to_otlp()) + b"\n"
+            with self._lock:
+                try:
+                    if self._file is None:
+                        self._file = open(config.TRACE_FILE, "ab")
+                    self._file.write(line)
+                    self._file.flush()
+                except OSError as e:
+                    print(f"⚠️ No se pudo escribir la traza: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+# Instancia global
+exporter = TraceExporter()
+
+# ==========================================
+# API PARA LOS SERVICIOS
+# ==========================================
+
+def start_turn(session_id: str, bot_mode: str, start_ns: Optional[int] = None, **attributes) -> TurnTrace:
+    """Crea la traza del turno y la deja activa en el contexto actual"""
+    trace = TurnTrace(session_id, bot_mode, start_ns, **attributes)
+    _current.set(trace)
+    return trace
+
+def finish_turn(trace: TurnTrace):
+    """Cierra la traza, la exporta y la desactiva"""
+    trace.end()
+    if _current.get() is trace:
+        _current.set(None)
+    exporter.export(trace)
+
+def current() -> Optional[TurnTrace]:
+    return _current.get()
+
+def record(name: str, start_ns: int, end_ns: int, **attributes):
+    """Span ya medido en la traza activa (no-op sin traza)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, start_ns, end_ns, **attributes)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Mide el bloque como span de la traza activa (no-op sin traza)"""
+    trace = _current.get()
+    if trace is None:
+        yield attributes
+        return
+    start = now_ns()
+    try:
+        yield attributes  # El bloque puede añadir atributos al dict
+    finally:
+        trace.add(name, start, now_ns(), **attributes)
+
+async def to_thread(name: str, fn: Callable, *args, **kwargs):
+    """
+    asyncio.to_thread registrando '<name>.queue_wait': la espera hasta que un hilo
+    del threadpool recoge el trabajo (la ejecución la mide el propio servicio).
+    La espera se observa también en las métricas aunque no haya traza activa.
+    """
+    trace = _current.get()
+    submitted = now_ns()
+
+    def run():
+        started = now_ns()
+        QUEUE_WAIT_SECONDS.observe((started - submitted) / 1e9)
+        if trace is not None:
+            trace.add(f"{name}.queue_wait", submitted, started)
+        return fn(*args, **kwargs)
+
+    return await asyncio.to_thread(run)
@@ -1,49 +1,92 @@
-import requests
+import asyncio
+import time
 from typing import Optional, Tuple
 from fastapi import HTTPException
 from app.config import config
-
-audio_mpeg = "audio/mpeg"
+from app.services.tts_engines import get_engine, get_engine_chain, ElevenLabsEngine
+from app.services.phrase_bank import phrase_bank
+from app.services.audio_codec import transcode
+from app.services import tracing
+from app.services.metrics import TTS_SECONDS
 
 class TTSService:
-    """Servicio de Text-to-Speech"""    
-    
+    """Servicio de Text-to-Speech con registro de motores y failover automático"""
+
+    @staticmethod
+    async def elevenlabs_tts(text: str, voice_id: Optional[str] = None) -> bytes:
+        engine: ElevenLabsEngine = get_engine(ElevenLabsEngine.name)
+        audio, _ = await engine.synthesize(text, voice_id)
+        return audio
+
     @staticmethod
-    def elevenlabs_tts(text: str, voice_id: Optional[str] = None) -> bytes:
-        if not config.ELEVENLABS_API_KEY:
-            raise HTTPException(status_code=500, detail="ELEVENLABS_API_KEY no configurada")
-        
-        voice = voice_id or config.ELEVENLABS_VOICE_ID
-        url = f"{config.ELEVENLABS_API_URL}/{voice}"
-        headers = {
-            "xi-api-key": config.ELEVENLABS_API_KEY,
-            "Content-Type": "application/json",
-            "Accept": audio_mpeg
-        }
-        payload = {
-            "text": text,
-            "voice_settings": {
-                "stability": 0.7,
-                "similarity_boost": 0.7
-            }
-        }
-        
+    async def encode(audio: bytes, mime: str, audio_format: Optional[str]) -> Tuple[bytes, str]:
+        """Convierte al formato negociado con el cliente (PyAV, en un hilo)"""
+        if not audio_format:
+            return audio, mime
         try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=30, stream=True)
-            if resp.status_code not in (200, 201):
-                try: err = resp.json()
-                except ValueError: err = resp.text
-                raise HTTPException(status_code=502, detail=f"ElevenLabs error: {resp.status_code} - {err}")
-            
-            audio_bytes = resp.content
-            if not audio_bytes:
-                raise HTTPException(status_code=502, detail="ElevenLabs devolvió audio vacío")
-            return audio_bytes
-        except requests.RequestException as e:
-            raise HTTPException(status_code=502, detail=f"Error conectando a ElevenLabs: {str(e)}")
-    
+            with tracing.span("tts.transcode", target=audio_format):
+                return await asyncio.to_thread(transcode, audio, mime, audio_format)
+        except Exception as e:
+            # Mejor entregar el formato original que no entregar nada
+            print(f"⚠️ Transcodificación a '{audio_format}' falló: {e}")
+            return audio, mime
+
+    @staticmethod
+    async def from_phrase_bank(text: str, audio_format: Optional[str] = None) -> Optional[Tuple[bytes, str]]:
+        """Audio de una frase fija ya pre-sintetizada (None si no está en el banco)"""
+        if audio_format:
+            variant = phrase_bank.get(text, audio_format)
+            if variant:
+                return variant
+        cached = phrase_bank.get(text)
+        if not cached:
+            return None
+        if not audio_format:
+            return cached
+        variant = await TTSService.encode(*cached, audio_format)
+        phrase_bank.put_variant(text, audio_format, variant)
+        return variant
+
+    @staticmethod
+    async def synthesize(text: str, audio_format: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Frases fijas: se sirven desde el phrase bank (sin síntesis).
+        Resto: recorre la cadena de motores (principal -> respaldos) saltando los que
+        tienen el circuito abierto. Cada intento tiene un plazo máximo
+        (TTS_ENGINE_TIMEOUT), así un proveedor degradado cuesta un fallo rápido.
+        El resultado se entrega en el formato negociado (audio_format).
+        """
+        with tracing.span("tts.total") as attrs:
+            cached = await TTSService.from_phrase_bank(text, audio_format)
+            if cached:
+                attrs['engine'] = "phrase_bank"
+                return cached
+            return await TTSService._synthesize_chain(text, audio_format, attrs)
+
     @staticmethod
-    def synthesize(text: str) -> Tuple[bytes, str]:
-        audio = TTSService.elevenlabs_tts(text)
-        mime = audio_mpeg
-        return audio, mime
\ No newline at end of file
+    async def _synthesize_chain(text: str, audio_format: Optional[str], attrs: dict) -> Tuple[bytes, str]:
+        """Cadena de motores con failover (attrs: atributos del span tts.total)"""
+        last_error = None
+        for engine in get_engine_chain():
+            if not engine.breaker.allow():
+                continue
+
+            t0 = time.monotonic()
+            try:
+                audio, mime = await asyncio.wait_for(engine.synthesize(text), timeout=config.TTS_ENGINE_TIMEOUT)
+            except Exception as e:
+                engine.breaker.record_failure()
+                last_error = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)
+                print(f"⚠️ TTS '{engine.name}' falló ({last_error}) → siguiente motor")
+                continue
+            except BaseException:
+                # Cancelado (barge-in, desconexión): no es fallo del motor, pero la prueba half-open queda libre
+                engine.breaker.release()
+                raise
+
+            engine.breaker.record_success(time.monotonic() - t0)
+            TTS_SECONDS.observe(time.monotonic() - t0)
+            attrs['engine'] = engine.name
+            return await TTSService.encode(audio, mime, audio_format)
+
+        raise HTTPException(status_code=502, detail=f"Ningún motor TTS disponible: {last_error}")
@@ -0,0 +1,255 @@
+import abc
+import asyncio
+import io
+import math
+import shutil
+import time
+import wave
+import httpx
+from typing import Dict, List, Optional, Tuple, Type
+from fastapi import HTTPException
+from app.config import config
+from app.services.http_client import get_http_client, retry_delay, RETRYABLE_STATUS
+from app.services import tracing
+
+audio_mpeg = "audio/mpeg"
+audio_wav = "audio/wav"
+
+# ==========================================
+# CIRCUIT BREAKER
+# ==========================================
+
+class CircuitBreaker:
+    """
+    Circuito por motor: tras N fallos consecutivos se abre y el motor se salta
+    hasta que pase el tiempo de reset. Una respuesta lenta (latencia media fuera
+    de presupuesto, con al menos min_samples medidas) cuenta como fallo.
+    Después deja pasar UNA petición de prueba (half-open).
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, latency_budget: float, min_samples: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.latency_budget = latency_budget
+        self.min_samples = min_samples
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.ewma_latency: Optional[float] = None
+        self.samples = 0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """¿Se puede usar el motor ahora?"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self, latency: float):
+        self.ewma_latency = latency if self.ewma_latency is None else 0.7 * self.ewma_latency + 0.3 * latency
+        self.samples += 1
+        if self.samples >= self.min_samples and self.ewma_latency > self.latency_budget:
+            # Responde, pero demasiado lento: se trata como degradado
+            self.record_failure()
+            return
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            # Tras reabrir, la latencia se vuelve a medir desde cero
+            self.ewma_latency = None
+            self.samples = 0
+
+    def release(self):
+        """Petición abandonada (cancelada) sin resultado: no cuenta, pero libera la prueba half-open"""
+        self._probe_in_flight = False
+
+# ==========================================
+# MOTORES
+# ==========================================
+
+class TTSEngine(abc.ABC):
+    """Interfaz de un motor TTS: texto -> (audio, mime)"""
+    name = "base"
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.TTS_BREAKER_FAILURES,
+            reset_seconds=config.TTS_BREAKER_RESET_SECONDS,
+            latency_budget=config.TTS_LATENCY_BUDGET,
+            min_samples=config.TTS_LATENCY_MIN_SAMPLES
+        )
+
+    def is_available(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    async def synthesize(self, text: str) -> Tuple[bytes, str]:
+        ...
+
+class ElevenLabsEngine(TTSEngine):
+    """ElevenLabs vía el cliente HTTP compartido (keep-alive + reintentos con jitter)"""
+    name = "elevenlabs"
+
+    def is_available(self) -> bool:
+        return bool(config.ELEVENLABS_API_KEY)
+
+    async def synthesize(self, text: str, voice_id: Optional[str] = None) -> Tuple[bytes, str]:
+        if not config.ELEVENLABS_API_KEY:
+            raise HTTPException(status_code=500, detail="ELEVENLABS_API_KEY no configurada")
+
+        voice = voice_id or config.ELEVENLABS_VOICE_ID
+        url = f"{config.ELEVENLABS_API_URL}/{voice}"
+        headers = {
+            "xi-api-key": config.ELEVENLABS_API_KEY,
+            "Content-Type": "application/json",
+            "Accept": audio_mpeg
+        }
+        payload = {
+            "text": text,
+            "voice_settings": {
+                "stability": 0.7,
+                "similarity_boost": 0.7
+            }
+        }
+
+        client = get_http_client()
+        for attempt in range(config.TTS_MAX_RETRIES + 1):
+            is_last = attempt == config.TTS_MAX_RETRIES
+            t0 = tracing.now_ns()
+            try:
+                # En streaming para medir el primer byte (lo que tardaría en empezar a sonar)
+                async with client.stream("POST", url, json=payload, headers=headers) as resp:
+                    if resp.status_code in RETRYABLE_STATUS and not is_last:
+                        retry = True
+                    else:
+                        retry = False
+                        if resp.status_code not in (200, 201):
+                            await resp.aread()
+                            try: err = resp.json()
+                            except ValueError: err = resp.text
+                            raise HTTPException(status_code=502, detail=f"ElevenLabs error: {resp.status_code} - {err}")
+
+                        chunks = []
+                        async for chunk in resp.aiter_bytes():
+                            if not chunks:
+                                tracing.record("tts.first_byte", t0, tracing.now_ns(), engine=self.name, attempt=attempt)
+                            chunks.append(chunk)
+            except httpx.TransportError as e:
+                # Timeouts de conexión/lectura y errores de red: reintento con jitter
+                if is_last:
+                    raise HTTPException(status_code=502, detail=f"Error conectando a ElevenLabs: {str(e)}")
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+
+            if retry:
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+
+            audio_bytes = b"".join(chunks)
+            if not audio_bytes:
+                raise HTTPException(status_code=502, detail="ElevenLabs devolvió audio vacío")
+            return audio_bytes, audio_mpeg
+
+class EspeakEngine(TTSEngine):
+    """Motor offline en el propio servidor (espeak-ng). Sin red ni coste por uso."""
+    name = "espeak"
+
+    def __init__(self):
+        super().__init__()
+        self.binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def is_available(self) -> bool:
+        return self.binary is not None
+
+    async def synthesize(self, text: str) -> Tuple[bytes, str]:
+        if not self.binary:
+            raise HTTPException(status_code=500, detail="espeak-ng no instalado")
+
+        proc = await asyncio.create_subprocess_exec(
+            self.binary, "-v", config.ESPEAK_VOICE, "--stdout", text,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            audio_bytes, err = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            raise
+        if proc.returncode != 0 or not audio_bytes:
+            raise HTTPException(status_code=502, detail=f"espeak error: {err.decode(errors='ignore')}")
+        return audio_bytes, audio_wav
+
+class SyntheticEngine(TTSEngine):
+    """
+    Motor sintético para pruebas de carga: genera un WAV con un tono suave
+    de duración proporcional al texto. Nunca falla y no consume CPU apreciable.
+    No está en la cadena por defecto: se activa con TTS_ENGINE / TTS_FALLBACK_ENGINES.
+    """
+    name = "synthetic"
+    SAMPLE_RATE = 16000
+    SECONDS_PER_WORD = 0.3
+
+    async def synthesize(self, text: str) -> Tuple[bytes, str]:
+        words = max(1, len(text.split()))
+        n_samples = int(self.SAMPLE_RATE * self.SECONDS_PER_WORD * words)
+        tone = bytearray()
+        for i in range(min(n_samples, 400)):
+            sample = int(2000 * math.sin(2 * math.pi * 440 * i / self.SAMPLE_RATE))
+            tone += sample.to_bytes(2, "little", signed=True)
+        silence = b"\x00\x00" * (n_samples - len(tone) // 2)
+
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.SAMPLE_RATE)
+            wf.writeframes(bytes(tone) + silence)
+        return buf.getvalue(), audio_wav
+
+# ==========================================
+# REGISTRO
+# ==========================================
+
+TTS_ENGINES: Dict[str, Type[TTSEngine]] = {
+    ElevenLabsEngine.name: ElevenLabsEngine,
+    EspeakEngine.name: EspeakEngine,
+    SyntheticEngine.name: SyntheticEngine,
+}
+
+_instances: Dict[str, TTSEngine] = {}
+
+def get_engine(name: str) -> Optional[TTSEngine]:
+    """Instancia única por motor (cada una con su propio circuit breaker)"""
+    if name not in _instances:
+        engine_cls = TTS_ENGINES.get(name)
+        if engine_cls is None:
+            print(f"⚠️ Motor TTS desconocido: '{name}'")
+            return None
+        _instances[name] = engine_cls()
+    return _instances[name]
+
+def get_engine_chain() -> List[TTSEngine]:
+    """Motor principal (TTS_ENGINE) seguido de los de respaldo, sin duplicados"""
+    chain = []
+    for name in [config.TTS_ENGINE] + config.TTS_FALLBACK_ENGINES:
+        engine = get_engine(name)
+        if engine and engine not in chain and engine.is_available():
+            chain.append(engine)
+    return chain
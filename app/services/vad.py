@@ -0,0 +1,402 @@
+import asyncio
+import copy
+import importlib.util
+import os
+import numpy as np
+import onnxruntime as ort
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from app.config import config
+from app.services.audio_buffer import PCMRingBuffer, PreRollBuffer, UtteranceBuffer, INT16_SCALE
+from app.services.model_client import ModelServerError
+
+# Eventos que emite el segmentador
+SPEECH_START = "speech_start"
+SPEECH_PAUSE = "speech_pause"
+UTTERANCE = "utterance"
+FALSE_DETECTION = "speech_false_detection"
+
+# ==========================================
+# BACKEND TORCH (una inferencia por sesión)
+# ==========================================
+
+_torch_model = None  # Modelo base: sólo se copia, nunca infiere
+
+def load_torch_vad():
+    """
+    Silero VAD (torch.hub) para una sesión, sólo si VAD_BACKEND=torch.
+    El modelo guarda el estado recurrente dentro: cada sesión recibe su copia
+    del base (cargado una vez) para que reset_states() y las inferencias de
+    una no toquen a las demás.
+    """
+    global _torch_model
+    if _torch_model is None:
+        import torch
+        print("🔊 Cargando Silero VAD (torch)...")
+        _torch_model, _ = torch.hub.load(
+            repo_or_dir='snakers4/silero-vad',
+            model='silero_vad',
+            force_reload=False,
+            trust_repo=True
+        )
+        print("✅ Silero VAD cargado")
+    return copy.deepcopy(_torch_model)
+
+def torch_speech_prob(model, chunk: np.ndarray) -> float:
+    """Inferencia torch de un chunk (se ejecuta en el threadpool, fuera del event loop)"""
+    import torch
+    return model(torch.from_numpy(chunk), config.VAD_SAMPLE_RATE).item()
+
+# ==========================================
+# BACKEND ONNX (batch compartido entre sesiones)
+# ==========================================
+
+def default_onnx_path() -> str:
+    """Modelo ONNX incluido en el paquete silero-vad (sin importarlo: arrastraría torch)"""
+    if config.VAD_ONNX_PATH:
+        return config.VAD_ONNX_PATH
+    spec = importlib.util.find_spec("silero_vad")
+    if spec is None or not spec.submodule_search_locations:
+        raise RuntimeError("Paquete silero-vad no instalado y VAD_ONNX_PATH vacío")
+    return os.path.join(spec.submodule_search_locations[0], "data", "silero_vad.onnx")
+
+class BatchedVADEngine:
+    """
+    Motor VAD compartido por todas las conexiones.
+    Cada sesión registra un stream con su propio estado recurrente; en cada
+    tick se juntan los chunks de 512 muestras pendientes de TODOS los streams
+    y se resuelven en una sola llamada a onnxruntime.
+    """
+    CONTEXT_SIZE = 64  # Muestras del chunk anterior que Silero v5 espera como contexto (16 kHz)
+
+    def __init__(self, model_path: Optional[str] = None):
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1
+        opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path or default_onnx_path(), sess_options=opts, providers=["CPUExecutionProvider"])
+        self._sr = np.array(config.VAD_SAMPLE_RATE, dtype=np.int64)
+
+        self._states: Dict[int, np.ndarray] = {}
+        self._contexts: Dict[int, np.ndarray] = {}
+        self._pending: Dict[int, Deque[Tuple[np.ndarray, asyncio.Future]]] = {}
+        self._next_id = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # --- Streams ---
+
+    def register(self) -> int:
+        stream_id = self._next_id
+        self._next_id += 1
+        self.reset(stream_id)
+        return stream_id
+
+    def reset(self, stream_id: int):
+        self._states[stream_id] = np.zeros((2, 128), dtype=np.float32)
+        self._contexts[stream_id] = np.zeros(self.CONTEXT_SIZE, dtype=np.float32)
+
+    def unregister(self, stream_id: int):
+        self._states.pop(stream_id, None)
+        self._contexts.pop(stream_id, None)
+        for _, fut in self._pending.pop(stream_id, ()):
+            fut.cancel()
+
+    @property
+    def active_streams(self) -> int:
+        return len(self._states)
+
+    async def close(self):
+        """Apagado: cancela el batch programado o en curso"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+
+    # --- Inferencia ---
+
+    def submit(self, stream_id: int, chunk: np.ndarray) -> asyncio.Future:
+        """Encola un chunk sin esperar (el orden de llegada por stream queda fijado ya)"""
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(stream_id, deque()).append((chunk, fut))
+        self._schedule_flush()
+        return fut
+
+    async def infer(self, stream_id: int, chunk: np.ndarray) -> float:
+        """Probabilidad de voz de un chunk (se resuelve en el próximo batch)"""
+        return await self.submit(stream_id, chunk)
+
+    def _schedule_flush(self):
+        if self._flush_handle or (self._flush_task and not self._flush_task.done()):
+            return
+        loop = asyncio.get_running_loop()
+        delay = 0 if len(self._pending) >= config.VAD_MAX_BATCH else config.VAD_BATCH_TICK_MS / 1000
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._flush_handle = None
+        self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        # Un chunk por stream y batch (el estado recurrente obliga a ir en orden)
+        while self._pending:
+            ids = list(self._pending)[:config.VAD_MAX_BATCH]
+            heads = []
+            for stream_id in ids:
+                queue = self._pending[stream_id]
+                heads.append(queue.popleft())
+                if not queue:
+                    del self._pending[stream_id]
+
+            chunks = np.stack([chunk for chunk, _ in heads])
+            contexts = np.stack([self._contexts[sid] for sid in ids])
+            states = np.stack([self._states[sid] for sid in ids], axis=1)
+            try:
+                probs, states_n, x = await asyncio.to_thread(self.run_batch, chunks, contexts, states)
+            except Exception as e:
+                for _, fut in heads:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            # El estado se actualiza en el hilo del event loop (sin carreras con reset/unregister)
+            for i, ((_, fut), stream_id) in enumerate(zip(heads, ids)):
+                if stream_id in self._states and not fut.cancelled():
+                    self._states[stream_id] = states_n[:, i, :]
+                    self._contexts[stream_id] = x[i, -self.CONTEXT_SIZE:]
+                if not fut.done():
+                    fut.set_result(float(probs[i]))
+
+    def run_batch(self, chunks: np.ndarray, contexts: np.ndarray, states: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Una inferencia para B streams: chunks (B, 512), contexts (B, 64), states (2, B, 128)"""
+        x = np.concatenate([contexts, chunks], axis=1)
+        out, states_n = self.session.run(None, {"input": x, "state": states, "sr": self._sr})
+        return out[:, 0], states_n, x
+
+_engine = None
+_local_engine: Optional[BatchedVADEngine] = None  # También el de respaldo si el servidor de modelos cae
+
+def get_local_vad_engine() -> BatchedVADEngine:
+    """Motor en proceso (BatchedVADEngine), cargado la primera vez que se pide"""
+    global _local_engine
+    if _local_engine is None:
+        print("🔊 Cargando Silero VAD (onnxruntime, batch compartido)...")
+        _local_engine = BatchedVADEngine()
+        print("✅ Silero VAD cargado")
+    return _local_engine
+
+def get_vad_engine():
+    """Motor del proceso: local (BatchedVADEngine) o el del servidor de modelos si MODEL_SERVER_SOCKET"""
+    global _engine
+    if _engine is None and config.MODEL_SERVER_SOCKET:
+        from app.services.model_client import RemoteVADEngine
+        print(f"🔊 Silero VAD remoto: servidor de modelos en {config.MODEL_SERVER_SOCKET}")
+        _engine = RemoteVADEngine(config.MODEL_SERVER_SOCKET)
+    if _engine is None:
+        _engine = get_local_vad_engine()
+    return _engine
+
+async def close_vad_engine():
+    """Apagado: libera los motores del proceso (conexión con el servidor de modelos incluida)"""
+    global _engine, _local_engine
+    engines = dict.fromkeys(e for e in (_engine, _local_engine) if e is not None)
+    _engine = _local_engine = None
+    for engine in engines:
+        await engine.close()
+
+# ==========================================
+# SEGMENTADOR POR CONEXIÓN
+# ==========================================
+
+class StreamingVAD:
+    """
+    Segmentador de voz en streaming (una instancia por conexión).
+    Recibe PCM int16 16 kHz en frames de cualquier tamaño, lo procesa en
+    chunks de 512 muestras y devuelve los enunciados completos (con pre-roll)
+    listos para STT. La histéresis replica la de VADIterator de Silero.
+    Con endpointing=True, la primera pausa de ENDPOINT_MIN_SILENCE_MS emite
+    SPEECH_PAUSE con lo dicho hasta entonces y el turno se cierra cuando el
+    silencio alcanza lo fijado con set_required_silence_ms() (por defecto el máximo).
+    """
+
+    def __init__(self, endpointing: bool = False):
+        try:
+            if config.VAD_BACKEND == "torch":
+                self.engine = None
+                self.torch_model = load_torch_vad()
+            else:
+                self.engine = get_vad_engine()
+                self.stream_id = self.engine.register()
+        except Exception as e:
+            raise RuntimeError(f"Modelo Silero VAD no inicializado: {e}")
+
+        chunk_ms = config.VAD_CHUNK_SIZE / config.VAD_SAMPLE_RATE * 1000
+        self.min_utterance_samples = int(config.VAD_SAMPLE_RATE * config.VAD_MIN_UTTERANCE_MS / 1000)
+        if endpointing:
+            self.pause_samples = self._ms_to_samples(config.ENDPOINT_MIN_SILENCE_MS)
+            self.default_silence_samples = self._ms_to_samples(config.ENDPOINT_MAX_SILENCE_MS)
+        else:
+            self.pause_samples = 0
+            self.default_silence_samples = self._ms_to_samples(config.VAD_MIN_SILENCE_MS)
+        self.min_silence_samples = self.default_silence_samples
+        self.threshold = config.VAD_THRESHOLD
+        self.neg_threshold = max(config.VAD_THRESHOLD - 0.15, 0.01)
+
+        # Buffers preasignados: nada se realoca en el bucle caliente
+        self.pcm_buffer = PCMRingBuffer(config.VAD_CHUNK_SIZE * 64)
+        self.pre_roll = PreRollBuffer(int(config.VAD_PRE_ROLL_MS // chunk_ms), config.VAD_CHUNK_SIZE)
+        self.utterance = UtteranceBuffer(config.VAD_SAMPLE_RATE * config.VAD_MAX_UTTERANCE_S)
+        self._chunk_f32 = np.empty(config.VAD_CHUNK_SIZE, dtype=np.float32)
+
+        self.triggered = False
+        self.current_sample = 0
+        self.temp_end = 0
+        self.paused = False  # Ya se emitió SPEECH_PAUSE en el silencio actual
+        self.pause_id = 0
+        self.last_prob = 0.0
+        self.last_silence_ms = 0
+        self.ended_in_pause = False  # El último enunciado terminó en la pausa notificada (sin voz posterior)
+
+    @staticmethod
+    def _ms_to_samples(ms: float) -> int:
+        return int(config.VAD_SAMPLE_RATE * ms / 1000)
+
+    @property
+    def trailing_silence_ms(self) -> float:
+        if not self.triggered or not self.temp_end:
+            return 0
+        return (self.current_sample - self.temp_end) * 1000 / config.VAD_SAMPLE_RATE
+
+    def set_required_silence_ms(self, ms: float):
+        """Silencio necesario para cerrar el enunciado en curso (lo decide el endpointer)"""
+        self.min_silence_samples = self._ms_to_samples(ms)
+
+    def commit_if_ready(self) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """Cierra el enunciado si el silencio acumulado ya cubre el requerido"""
+        if self.triggered and self.temp_end and self.current_sample - self.temp_end >= self.min_silence_samples:
+            return [self._finish()]
+        return []
+
+    def reset(self):
+        """Descarta el estado (p.ej. mientras el bot está hablando)"""
+        if self.engine:
+            self.engine.reset(self.stream_id)
+        else:
+            self.torch_model.reset_states()
+        self.pcm_buffer.clear()
+        self.pre_roll.clear()
+        self.utterance.clear()
+        self.triggered = False
+        self.current_sample = 0
+        self.temp_end = 0
+        self.paused = False
+        self.min_silence_samples = self.default_silence_samples
+
+    def close(self):
+        if self.engine:
+            self.engine.unregister(self.stream_id)
+
+    def _fallback_to_local(self, error: Exception):
+        """El servidor de modelos falla: esta sesión sigue con el VAD en proceso (el estado recurrente empieza de cero)"""
+        engine = get_local_vad_engine()
+        print(f"⚠️ Servidor de modelos sin VAD ({error}): la sesión pasa al VAD en proceso")
+        self.engine.unregister(self.stream_id)
+        self.engine = engine
+        self.stream_id = engine.register()
+
+    async def _speech_prob(self, chunk: np.ndarray) -> float:
+        if self.engine:
+            try:
+                return await self.engine.infer(self.stream_id, chunk)
+            except ModelServerError as e:
+                # Sólo lo lanza RemoteVADEngine; las sesiones nuevas vuelven a probar el servidor
+                self._fallback_to_local(e)
+                return await self.engine.infer(self.stream_id, chunk)
+        # El buffer del chunk no se reutiliza hasta que termina la inferencia (feed espera aquí)
+        return await asyncio.to_thread(torch_speech_prob, self.torch_model, chunk)
+
+    def _finish(self) -> Tuple[str, Optional[np.ndarray]]:
+        """Cierra el enunciado en curso: UTTERANCE si es suficientemente largo"""
+        self.last_silence_ms = self.trailing_silence_ms
+        self.ended_in_pause = self.paused
+        self.triggered = False
+        self.temp_end = 0
+        self.paused = False
+        self.min_silence_samples = self.default_silence_samples
+        if len(self.utterance) >= self.min_utterance_samples:
+            event = (UTTERANCE, self.utterance.float32())
+        else:
+            event = (FALSE_DETECTION, None)
+        self.utterance.clear()
+        return event
+
+    async def feed(self, pcm: bytes) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """
+        Procesa un frame PCM int16. Devuelve los eventos detectados:
+        (SPEECH_START, None), (SPEECH_PAUSE, audio float32 hasta la pausa),
+        (UTTERANCE, audio float32) o (FALSE_DETECTION, None).
+        Tras una pausa o un fin de enunciado se detiene: el resto del PCM queda
+        en el buffer y se procesa con la siguiente llamada (feed(b"") vale).
+        """
+        events = []
+        pcm_samples = np.frombuffer(pcm, dtype=np.int16)
+        if pcm_samples.size:
+            self.pcm_buffer.write(pcm_samples)
+
+        # Procesar chunks de tamaño fijo (vistas int16 del buffer, sin copia)
+        while len(self.pcm_buffer) >= config.VAD_CHUNK_SIZE:
+            chunk = self.pcm_buffer.read(config.VAD_CHUNK_SIZE)
+            self.current_sample += config.VAD_CHUNK_SIZE
+
+            # float32 sólo para el modelo, en un buffer reutilizado
+            np.multiply(chunk, INT16_SCALE, out=self._chunk_f32)
+            prob = await self._speech_prob(self._chunk_f32)
+            self.last_prob = prob
+            is_speech_start = False
+            is_speech_end = False
+            is_pause = False
+
+            # Histéresis (misma lógica que VADIterator)
+            if prob >= self.threshold and self.temp_end:
+                # Vuelve a hablar: la pausa no era fin de turno
+                self.temp_end = 0
+                self.paused = False
+                self.min_silence_samples = self.default_silence_samples
+            if prob >= self.threshold and not self.triggered:
+                is_speech_start = True
+            elif prob < self.neg_threshold and self.triggered:
+                if not self.temp_end:
+                    self.temp_end = self.current_sample
+                silence = self.current_sample - self.temp_end
+                if silence >= self.min_silence_samples:
+                    is_speech_end = True
+                elif self.pause_samples and not self.paused and silence >= self.pause_samples:
+                    is_pause = True
+
+            # INICIO de voz: volcar el pre-roll
+            if is_speech_start:
+                self.utterance.clear()
+                self.pre_roll.drain_into(self.utterance)
+                self.triggered = True
+                events.append((SPEECH_START, None))
+
+            if self.triggered:
+                self.utterance.extend(chunk)
+                # Buffer lleno: se cierra el enunciado aunque siga hablando
+                is_speech_end = is_speech_end or self.utterance.is_full
+            else:
+                self.pre_roll.append(chunk)
+
+            # FIN de voz: entregar el enunciado (float32, listo para STT) si es suficientemente largo
+            if is_speech_end:
+                events.append(self._finish())
+                break
+
+            # PAUSA: candidata a fin de turno, lo dicho hasta ahora para la transcripción parcial
+            if is_pause:
+                self.paused = True
+                self.pause_id += 1
+                events.append((SPEECH_PAUSE, self.utterance.float32()))
+                break
+
+        return events
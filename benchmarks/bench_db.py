@@ -0,0 +1,115 @@
+"""
+Benchmark: turnos/s contra SQLite con N sesiones simultáneas.
+
+Un turno replica lo que hace LLMService.process_user_interaction en BD:
+add_message(user) -> get_recent_context -> add_message(assistant), cada
+llamada en el threadpool (asyncio.to_thread) como en el servidor.
+Compara la conexión nueva por llamada (journal rollback), las conexiones
+persistentes por hilo en WAL con commit por mensaje, y DatabaseManager
+(WAL + cola write-behind con executemany por lotes + caché de contexto).
+
+Uso:
+    python -m benchmarks.bench_db --sessions 50 200 --turns 20
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from app.database import DatabaseManager, INSERT_MESSAGE_SQL
+
+class ConnectPerCallManager(DatabaseManager):
+    """Comportamiento anterior: sqlite3.connect + commit + close en cada llamada"""
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def add_message(self, session_id, role, content, options=None):
+        conn = self._get_connection()
+        conn.execute(
+            "INSERT INTO conversation_history (session_id, role, content, options_json) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, None)
+        )
+        conn.commit()
+        conn.close()
+
+    def get_recent_context(self, session_id, limit=5):
+        conn = self._get_connection()
+        rows = conn.execute(
+            "SELECT role, content FROM conversation_history WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        conn.close()
+        return [{"role": r[0], "content": r[1]} for r in rows][::-1]
+
+    def close(self):
+        pass
+
+class SyncWriteManager(DatabaseManager):
+    """Conexión persistente por hilo en WAL pero un commit síncrono por mensaje (sin caché de contexto)"""
+
+    def add_message(self, session_id, role, content, options=None):
+        conn = self._get_connection()
+        with conn:
+            conn.execute(INSERT_MESSAGE_SQL, (session_id, role, content, None))
+
+    def get_recent_context(self, session_id, limit=5):
+        return self._read_context(session_id, limit)
+
+async def run_sessions(manager: DatabaseManager, n_sessions: int, turns: int) -> tuple:
+    latencies = []
+
+    async def session(i: int):
+        session_id = f"bench-{i}"
+        for t in range(turns):
+            t0 = time.perf_counter()
+            await asyncio.to_thread(manager.add_message, session_id, "user", f"pregunta {t}")
+            await asyncio.to_thread(manager.get_recent_context, session_id, 5)
+            await asyncio.to_thread(manager.add_message, session_id, "assistant", f"respuesta {t} " * 20)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(n_sessions)))
+    return time.perf_counter() - t0, latencies
+
+def bench(label: str, factory, n_sessions: int, turns: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = factory(os.path.join(tmp, "bench.db"))
+        wall, latencies = asyncio.run(run_sessions(manager, n_sessions, turns))
+        manager.close()  # Incluye el volcado final de la cola
+        
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        written = conn.execute("SELECT COUNT(*) FROM conversation_history").fetchone()[0]
+        conn.close()
+        assert written == 2 * n_sessions * turns, f"{label}: {written} filas escritas"
+
+    latencies.sort()
+    result = {
+        "label": label,
+        "sessions": n_sessions,
+        "turns": len(latencies),
+        "turns_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+    }
+    print(f"{label:<26} sesiones={n_sessions:<5} {result['turns_per_s']:>9.1f} turnos/s  "
+          f"p50={result['p50_ms']:>8.2f} ms  p95={result['p95_ms']:>8.2f} ms")
+    return result
+
+def main(args) -> list:
+    results = []
+    for n in args.sessions:
+        results.append(bench("conexión por llamada", ConnectPerCallManager, n, args.turns))
+        results.append(bench("persistente por hilo (WAL)", SyncWriteManager, n, args.turns))
+        results.append(bench("write-behind + caché", DatabaseManager, n, args.turns))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--turns", type=int, default=20, help="Turnos por sesión")
+    main(parser.parse_args())
@@ -0,0 +1,92 @@
+"""
+Benchmark: búsqueda en el historial con LIKE '%...%' (escaneo completo)
+contra el índice FTS5 (bm25 + snippet) sobre una tabla de N filas.
+
+La BD se crea con DatabaseManager (mismas migraciones y triggers que en
+producción) y se llena con mensajes sintéticos: texto de relleno de un
+vocabulario amplio y, en una fracción pequeña de filas (--hit-rate), un
+síntoma concreto, como en un historial real donde cada búsqueda es rara.
+El LIKE ordena por recencia (id DESC) con LIMIT, la consulta ad-hoc habitual.
+
+Uso:
+    python -m benchmarks.bench_fts --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.database import DatabaseManager, INSERT_MESSAGE_SQL
+
+SYMPTOMS = ["dolor de rodilla", "dolor de cabeza", "fiebre alta por la noche", "tos seca", "mareos",
+            "dolor de espalda", "náuseas", "insomnio y ansiedad", "presión alta", "acidez", "rodilla al subir escaleras"]
+QUERIES = ["dolor de rodilla", "fiebre noche", "presión", "escaleras rodilla", "insomnio ansiedad"]
+SYLLABLES = ["ma", "te", "ri", "lo", "sa", "ne", "co", "pu", "di", "ga", "ve", "bo", "char", "tul", "mien", "cla"]
+
+def populate(manager: DatabaseManager, rows: int, sessions: int, hit_rate: float, batch: int = 50_000):
+    rng = random.Random(0)
+    vocabulary = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    conn = manager._get_connection()
+    t0 = time.perf_counter()
+    for start in range(0, rows, batch):
+        data = []
+        for i in range(start, min(rows, start + batch)):
+            words = rng.choices(vocabulary, k=rng.randint(8, 30))
+            if rng.random() < hit_rate:
+                words.insert(rng.randint(0, len(words)), rng.choice(SYMPTOMS))
+            text = " ".join(words).capitalize() + "."
+            data.append((f"session-{i % sessions}", "user" if i % 2 == 0 else "assistant", text, None))
+        with conn:
+            conn.executemany(INSERT_MESSAGE_SQL, data)
+    print(f"📥 {rows} filas insertadas (con triggers FTS) en {time.perf_counter() - t0:.1f} s")
+
+def timed(fn, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+def main(args) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        manager = DatabaseManager(path)
+        populate(manager, args.rows, args.sessions, args.hit_rate)
+        conn = manager._get_connection()
+        print(f"💾 Tamaño: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        for query in QUERIES:
+            terms = [t for t in query.split() if t != "de"]
+            like_sql = (
+                "SELECT id, session_id, content FROM conversation_history WHERE "
+                + " AND ".join("content LIKE ?" for _ in terms) + " ORDER BY id DESC LIMIT ?"
+            )
+            like_params = [f"%{t}%" for t in terms] + [args.limit]
+            like = timed(lambda: conn.execute(like_sql, like_params).fetchall(), args.repeat)
+            fts = timed(lambda: manager.search_history(query, args.limit), args.repeat)
+
+            result = {
+                "query": query,
+                "rows": args.rows,
+                "like_p50_ms": round(statistics.median(like), 2),
+                "fts_p50_ms": round(statistics.median(fts), 2),
+            }
+            results.append(result)
+            print(f"'{query}':{'':<{22 - len(query)}} LIKE p50={result['like_p50_ms']:>9.2f} ms   "
+                  f"FTS5 p50={result['fts_p50_ms']:>8.2f} ms")
+        manager.close()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=20_000)
+    parser.add_argument("--hit-rate", type=float, default=0.0005, help="Fracción de filas que mencionan un síntoma")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,85 @@
+"""
+Benchmark: conexión nueva por frase (equivalente al antiguo requests.post)
+contra el cliente HTTP compartido con keep-alive.
+
+Uso:
+    python -m benchmarks.bench_tts_client --turns 50
+    python -m benchmarks.bench_tts_client --url https://api.elevenlabs.io/v1/text-to-speech
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.fake_tts import FakeTTSServer
+
+SENTENCE = "Hola, recuerda tomar agua y descansar un poco antes de seguir."
+
+def summarize(label: str, samples: list) -> dict:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) >= 20 else samples[-1]
+    result = {
+        "label": label,
+        "turns": len(samples),
+        "mean_ms": round(statistics.mean(samples), 2),
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(p95, 2),
+    }
+    print(f"{label:<22} mean={result['mean_ms']:>8.2f} ms  p50={result['p50_ms']:>8.2f} ms  p95={result['p95_ms']:>8.2f} ms")
+    return result
+
+async def run_cold(url: str, headers: dict, turns: int, http2: bool) -> list:
+    """Un cliente (y por tanto un handshake) por cada frase"""
+    samples = []
+    for _ in range(turns):
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(http2=http2) as client:
+            resp = await client.post(url, json={"text": SENTENCE}, headers=headers)
+            resp.raise_for_status()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+async def run_pooled(url: str, headers: dict, turns: int, http2: bool) -> list:
+    """Cliente compartido: sólo el primer turno paga la conexión"""
+    samples = []
+    async with httpx.AsyncClient(http2=http2) as client:
+        for _ in range(turns):
+            t0 = time.perf_counter()
+            resp = await client.post(url, json={"text": SENTENCE}, headers=headers)
+            resp.raise_for_status()
+            samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+async def main(args) -> list:
+    server = None
+    url = args.url
+    if not url:
+        server = FakeTTSServer(latency_ms=(args.latency_ms, args.latency_ms)).start_background()
+        url = server.url
+    url = f"{url}/{args.voice_id}"
+    headers = {"xi-api-key": os.getenv("ELEVENLABS_API_KEY", "fake"), "Accept": "audio/mpeg"}
+
+    print(f"🎯 Destino: {url} ({args.turns} turnos, http2={args.http2})")
+    results = [
+        summarize("conexión por turno", await run_cold(url, headers, args.turns, args.http2)),
+        summarize("cliente compartido", await run_pooled(url, headers, args.turns, args.http2)),
+    ]
+    saved = results[0]["mean_ms"] - results[1]["mean_ms"]
+    print(f"⚡ Setup de conexión eliminado: ~{saved:.2f} ms por turno")
+
+    if server:
+        server.shutdown()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="", help="Endpoint TTS real (por defecto: servidor falso local)")
+    parser.add_argument("--voice-id", default=os.getenv("ELEVENLABS_VOICE_ID", "LnGOA2SxH2fX1e1iNzEp"))
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latencia simulada del servidor falso")
+    parser.add_argument("--http2", action="store_true", help="Negociar HTTP/2 (requiere TLS en el destino)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+Benchmark: streams de VAD servidos por núcleo.
+
+Compara el iterador por sesión (una inferencia torch por chunk de 32 ms y sesión)
+con el motor ONNX compartido (un batch por tick con todos los streams activos).
+Cada stream en tiempo real necesita 31.25 chunks/s; "streams/núcleo" es
+chunks procesados por segundo de CPU / 31.25.
+
+Uso:
+    python -m benchmarks.bench_vad --streams 50 200 --seconds 5
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+from app.config import config
+from app.services.vad import BatchedVADEngine
+
+CHUNKS_PER_SECOND = config.VAD_SAMPLE_RATE / config.VAD_CHUNK_SIZE
+
+def make_chunks(n_chunks: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal((n_chunks, config.VAD_CHUNK_SIZE)) * 0.05).astype(np.float32)
+
+def report(label: str, n_streams: int, n_chunks: int, cpu: float, wall: float) -> dict:
+    per_core = n_chunks / cpu / CHUNKS_PER_SECOND if cpu else float("inf")
+    result = {
+        "label": label,
+        "streams": n_streams,
+        "chunks": n_chunks,
+        "cpu_us_per_chunk": round(cpu / n_chunks * 1e6, 2),
+        "streams_per_core": round(per_core, 1),
+        "realtime_factor": round(n_chunks / CHUNKS_PER_SECOND / n_streams / wall, 2),
+    }
+    print(f"{label:<28} streams={n_streams:<5} {result['cpu_us_per_chunk']:>9.2f} µs CPU/chunk   "
+          f"{result['streams_per_core']:>8.1f} streams/núcleo")
+    return result
+
+def bench_torch_per_session(n_streams: int, seconds: float) -> dict:
+    """Un modelo (estado) por sesión y una llamada por chunk, como VADIterator"""
+    import torch
+    from silero_vad import load_silero_vad
+
+    torch.set_num_threads(1)
+    models = [load_silero_vad() for _ in range(min(n_streams, 8))]
+    chunks = torch.from_numpy(make_chunks(int(seconds * CHUNKS_PER_SECOND)))
+
+    t_cpu, t_wall = time.process_time(), time.perf_counter()
+    with torch.no_grad():
+        for chunk in chunks:
+            for s in range(n_streams):
+                models[s % len(models)](chunk, config.VAD_SAMPLE_RATE)
+    return report("torch por sesión", n_streams, len(chunks) * n_streams,
+                  time.process_time() - t_cpu, time.perf_counter() - t_wall)
+
+async def bench_onnx_batched(n_streams: int, seconds: float, tick_ms: float) -> dict:
+    """Streams concurrentes en el event loop resolviéndose en batches compartidos"""
+    config.VAD_BATCH_TICK_MS = tick_ms
+    engine = BatchedVADEngine()
+    chunks = make_chunks(int(seconds * CHUNKS_PER_SECOND))
+
+    async def stream():
+        stream_id = engine.register()
+        for chunk in chunks:
+            await engine.infer(stream_id, chunk)
+        engine.unregister(stream_id)
+
+    t_cpu, t_wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(stream() for _ in range(n_streams)))
+    return report(f"onnx batch (tick {tick_ms:g} ms)", n_streams, len(chunks) * n_streams,
+                  time.process_time() - t_cpu, time.perf_counter() - t_wall)
+
+def bench_onnx_per_session(n_streams: int, seconds: float) -> dict:
+    """Mismo modelo ONNX pero batch=1 por sesión (aísla el efecto del batching)"""
+    engine = BatchedVADEngine()
+    chunks = make_chunks(int(seconds * CHUNKS_PER_SECOND))
+    contexts = np.zeros((1, engine.CONTEXT_SIZE), dtype=np.float32)
+    states = np.zeros((2, 1, 128), dtype=np.float32)
+
+    t_cpu, t_wall = time.process_time(), time.perf_counter()
+    for chunk in chunks:
+        for _ in range(n_streams):
+            engine.run_batch(chunk[None, :], contexts, states)
+    return report("onnx por sesión (batch=1)", n_streams, len(chunks) * n_streams,
+                  time.process_time() - t_cpu, time.perf_counter() - t_wall)
+
+def main(args) -> list:
+    results = []
+    for n in args.streams:
+        try:
+            results.append(bench_torch_per_session(n, args.seconds))
+        except ImportError:
+            print("⚠️ torch/silero-vad no disponibles: se omite el iterador torch")
+        results.append(bench_onnx_per_session(n, args.seconds))
+        results.append(asyncio.run(bench_onnx_batched(n, args.seconds, args.tick_ms)))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--seconds", type=float, default=3.0, help="Segundos de audio por stream")
+    parser.add_argument("--tick-ms", type=float, default=config.VAD_BATCH_TICK_MS)
+    main(parser.parse_args())
@@ -0,0 +1,101 @@
+"""
+Servidor Ollama falso (POST /api/chat sin streaming) para pruebas de carga.
+La latencia sigue una distribución configurable y se reparte entre prefill
+(prompt_eval_duration) y generación (eval_duration) como en un Ollama real,
+así las trazas del servidor (llm.prefill / llm.first_token) también tienen datos.
+
+Uso (el servidor VAPI lo encuentra con OLLAMA_HOST):
+    python -m benchmarks.fake_ollama --port 8902 --latency lognormal:600,0.4
+    OLLAMA_HOST=http://127.0.0.1:8902 uvicorn main:app
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple, Union
+
+from benchmarks.latency import Latency, sample_ms
+
+PREFILL_FRACTION = 0.3  # Parte de la latencia atribuida a evaluar el prompt
+
+# Respuestas con el formato que esperan los bots (VitalBot ofrece opciones A/B/C)
+REPLIES = {
+    "vitalbot": "Entiendo. ¿Desde cuándo lo notas? A) Desde hoy B) Desde hace días C) Desde hace semanas",
+    "exabot": "Correcto, buena respuesta. Pasemos a la siguiente pregunta: ¿qué órgano bombea la sangre?",
+}
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive habilitado
+    disable_nagle_algorithm = True  # Cabeceras y cuerpo van en escrituras separadas: sin esto, +40 ms por ACK retardado
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+
+        server: "FakeOllamaServer" = self.server
+        delay_ns = int(sample_ms(server.latency_ms) * 1e6)
+        time.sleep(delay_ns / 1e9)
+        with server.lock:
+            server.requests += 1
+
+        system = next((m["content"] for m in body.get("messages", []) if m.get("role") == "system"), "")
+        content = REPLIES["exabot"] if "ExaBot" in system else REPLIES["vitalbot"]
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        prefill_ns = int(delay_ns * PREFILL_FRACTION)
+        payload = json.dumps({
+            "model": body.get("model", "fake"),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": delay_ns,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": prefill_ns,
+            "eval_count": len(content) // 4,
+            "eval_duration": delay_ns - prefill_ns,
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: Union[Latency, Tuple[float, float]] = (0, 0)):
+        super().__init__((host, port), FakeOllamaHandler)
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_background(self) -> "FakeOllamaServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor Ollama falso")
+    parser.add_argument("--port", type=int, default=8902)
+    parser.add_argument("--latency", type=Latency.parse, default="lognormal:600,0.4", help="fixed:MS | uniform:MIN,MAX | lognormal:MEDIANA,SIGMA")
+    args = parser.parse_args()
+
+    srv = FakeOllamaServer(port=args.port, latency_ms=args.latency)
+    print(f"🦙 Fake Ollama en {srv.url} (latencia {args.latency})")
+    srv.serve_forever()
@@ -0,0 +1,66 @@
+"""
+Servidor TTS falso (compatible con la ruta de ElevenLabs) para benchmarks y pruebas de carga.
+Responde MP3 sintético con una latencia configurable (tupla uniforme o benchmarks.latency.Latency).
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple, Union
+
+from benchmarks.latency import Latency, sample_ms
+
+# Cabecera de frame MPEG-1 Layer III (128 kbps, 44.1 kHz) + relleno
+FAKE_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+class FakeTTSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive habilitado
+    disable_nagle_algorithm = True  # Cabeceras y cuerpo van en escrituras separadas: sin esto, +40 ms por ACK retardado
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        server: "FakeTTSServer" = self.server
+        delay_ms = sample_ms(server.latency_ms)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        # ~1 frame por cada 4 bytes de texto enviado
+        audio = FAKE_MP3_FRAME * max(1, len(body) // 4)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        self.wfile.write(audio)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeTTSServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: Union[Latency, Tuple[float, float]] = (0, 0)):
+        super().__init__((host, port), FakeTTSHandler)
+        self.latency_ms = latency_ms
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/text-to-speech"
+
+    def start_background(self) -> "FakeTTSServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor TTS falso")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=Latency.parse, default="uniform:50,150", help="fixed:MS | uniform:MIN,MAX | lognormal:MEDIANA,SIGMA")
+    args = parser.parse_args()
+
+    srv = FakeTTSServer(port=args.port, latency_ms=args.latency)
+    print(f"🔊 Fake TTS en {srv.url}")
+    srv.serve_forever()
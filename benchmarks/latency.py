@@ -0,0 +1,44 @@
+"""
+Distribuciones de latencia para los servidores falsos (TTS, Ollama).
+
+Especificación en texto (para argparse):
+    fixed:200              siempre 200 ms
+    uniform:50,150         uniforme entre 50 y 150 ms
+    lognormal:400,0.5      log-normal con mediana 400 ms y sigma 0.5 (cola larga, como un LLM real)
+"""
+
+import math
+import random
+from typing import Tuple, Union
+
+class Latency:
+    def __init__(self, kind: str, a: float, b: float = 0.0):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Distribución desconocida: {kind}")
+        self.kind = kind
+        self.a = a
+        self.b = b
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v]
+        if not values:
+            raise ValueError(f"Latencia sin parámetros: {spec}")
+        return cls(kind, *values[:2])
+
+    def sample_ms(self) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return random.uniform(self.a, self.b)
+        return random.lognormvariate(math.log(max(self.a, 1e-3)), self.b)
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{self.a:g}" + (f",{self.b:g}" if self.kind != "fixed" else "")
+
+def sample_ms(latency: Union[Latency, Tuple[float, float]]) -> float:
+    """Acepta también la tupla (min, max) histórica de FakeTTSServer (uniforme)"""
+    if isinstance(latency, Latency):
+        return latency.sample_ms()
+    return random.uniform(*latency) if any(latency) else 0.0
@@ -0,0 +1,359 @@
+"""
+Prueba de carga de /ws/voice: N sesiones simultáneas (vitalbot, exabot o mezcla)
+que reproducen clips de audio grabados con tiempos de reflexión realistas,
+simulan la reproducción de cada respuesta y envían playback_complete.
+
+Mide el tiempo hasta el primer audio (TTFA: desde que se envía el clip hasta
+que llega el audio de la respuesta) para cada nivel de concurrencia y estima
+el codo: el mayor nivel que aún cumple el SLO de p95 sin errores relevantes.
+Los rechazos del control de admisión ('busy') se cuentan aparte: no son
+errores, y el TTFA sólo mide los turnos admitidos.
+
+Con --start-server se levantan un Ollama falso, un TTS falso (ElevenLabs) y
+un uvicorn apuntando a ellos; STT (Whisper) y VAD son los reales, que es lo
+que se quiere dimensionar.
+
+Uso:
+    python -m benchmarks.load_ws --start-server --sessions 1 4 8 16 --clips grabaciones/*.wav
+    python -m benchmarks.load_ws --url ws://maquina:8000/ws/voice --mode exabot --sessions 10 20 40
+"""
+
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+import websockets
+
+from app.protocol import FRAME_AUDIO, PROTOCOL_V2, pack_frame, unpack_frame
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.fake_tts import FakeTTSServer
+from benchmarks.latency import Latency
+
+DEFAULT_SENTENCE = "Me duele la cabeza desde ayer por la tarde"
+MP3_BYTES_PER_S = 128_000 / 8  # Lo que sirve el TTS falso (128 kbps)
+WAV_BYTES_PER_S = 16_000 * 2
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[rank], 1)
+
+def load_clips(patterns: List[str]) -> List[bytes]:
+    paths = [p for pattern in patterns for p in sorted(glob.glob(pattern))]
+    if paths:
+        return [open(p, "rb").read() for p in paths]
+
+    # Sin grabaciones: una frase sintetizada con espeak-ng (si está instalado)
+    binary = shutil.which("espeak-ng") or shutil.which("espeak")
+    if not binary:
+        sys.exit("❌ Sin clips (--clips) y sin espeak-ng para generar uno")
+    clip = subprocess.run([binary, "-v", "es", "--stdout", DEFAULT_SENTENCE], capture_output=True, check=True).stdout
+    print(f"🎙️ Sin --clips: usando '{DEFAULT_SENTENCE}' sintetizada con espeak-ng")
+    return [clip]
+
+def playback_seconds(size: int, mime: str, max_s: float) -> float:
+    """Duración aproximada del audio recibido (lo que tardaría en sonar en el navegador)"""
+    rate = WAV_BYTES_PER_S if "wav" in mime or "pcm" in mime else MP3_BYTES_PER_S
+    return min(max_s, size / rate)
+
+# ==========================================
+# SESIÓN SIMULADA
+# ==========================================
+
+class SessionResult:
+    def __init__(self, bot_mode: str):
+        self.bot_mode = bot_mode
+        self.ttfa_ms: List[float] = []
+        self.turns = 0
+        self.no_voice = 0
+        self.busy = 0  # Turnos y sesiones rechazados por el control de admisión
+        self.rejected = False  # Sesión rechazada al conectar
+        self.errors: List[str] = []
+
+class VoiceSession:
+    """Un cliente de /ws/voice: lector en segundo plano + guion de turnos"""
+
+    def __init__(self, args, bot_mode: str, clips: List[bytes]):
+        self.args = args
+        self.bot_mode = bot_mode
+        self.clips = clips
+        self.result = SessionResult(bot_mode)
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.ws = None
+
+    async def reader(self):
+        """Traduce lo recibido a eventos ('audio', bytes, mime) | ('json', dict)"""
+        try:
+            async for raw in self.ws:
+                if isinstance(raw, bytes):
+                    frame_type, mime, payload = unpack_frame(raw)
+                    if frame_type == FRAME_AUDIO:
+                        await self.events.put(("audio", len(payload), mime))
+                    continue
+                message = json.loads(raw)
+                if message.get("type") == "busy":
+                    self.result.busy += 1
+                    self.result.rejected = self.result.rejected or message.get("scope") == "session"
+                if message.get("type") == "audio":
+                    await self.events.put(("audio", len(message["data"]) * 3 // 4, message.get("format", "")))
+                else:
+                    await self.events.put(("json", message, None))
+        except websockets.ConnectionClosed:
+            pass
+        await self.events.put(("closed", None, None))
+
+    async def play(self, size: int, mime: str):
+        """Simula la reproducción y avisa al servidor (reanuda timers/VAD)"""
+        await asyncio.sleep(playback_seconds(size, mime, self.args.max_playback_s) / self.args.playback_speed)
+        await self.ws.send(json.dumps({"type": "playback_complete"}))
+
+    async def wait_audio(self, timeout: float) -> Tuple[str, Optional[int], Optional[str], bool]:
+        """
+        Espera el audio de la respuesta. Devuelve (estado, bytes, mime, hubo_transcripción)
+        con estado 'audio' | 'silent' (sin voz y sin audio) | 'busy' | 'timeout' | 'closed'.
+        Los mensajes 'error' se anotan en el resultado de la sesión.
+        """
+        transcribed = False
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return "timeout", None, None, transcribed
+            try:
+                kind, data, mime = await asyncio.wait_for(self.events.get(), remaining)
+            except asyncio.TimeoutError:
+                return "timeout", None, None, transcribed
+            if kind == "closed":
+                return "closed", None, None, transcribed
+            if kind == "audio":
+                return "audio", data, mime, transcribed
+            kind = data.get("type")
+            if kind == "transcription":
+                transcribed = True
+            elif kind == "error":
+                self.result.errors.append(data.get("message", "error"))
+                # Tras un error el servidor aún puede enviar la frase fija de disculpa
+            elif kind == "playback_complete":
+                return "silent", None, None, transcribed
+            elif kind == "busy":
+                return "busy", None, None, transcribed
+
+    async def think(self, seconds: float):
+        """Tiempo de reflexión: atiende el audio no solicitado (avisos del timer de ExaBot)"""
+        deadline = time.monotonic() + seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                kind, data, mime = await asyncio.wait_for(self.events.get(), remaining)
+            except asyncio.TimeoutError:
+                return
+            if kind == "audio":
+                await self.play(data, mime)
+            elif kind == "closed":
+                return
+
+    async def send_clip(self, clip: bytes):
+        if self.args.protocol == PROTOCOL_V2:
+            await self.ws.send(pack_frame(FRAME_AUDIO, "audio/wav", clip))
+        else:
+            await self.ws.send(json.dumps({"type": "audio", "data": base64.b64encode(clip).decode("ascii"), "format": "audio/wav"}))
+
+    async def run(self) -> SessionResult:
+        args = self.args
+        url = f"{args.url}?client_id=load-{uuid.uuid4().hex[:12]}&bot_mode={self.bot_mode}&protocol={args.protocol}"
+        try:
+            async with websockets.connect(url, max_size=None, open_timeout=args.timeout) as ws:
+                self.ws = ws
+                reader = asyncio.create_task(self.reader())
+                try:
+                    if self.bot_mode == "exabot":
+                        # Bienvenida: hay que escucharla antes de que el examen acepte respuestas
+                        state, size, mime, _ = await self.wait_audio(args.timeout)
+                        if state == "busy":
+                            return self.result
+                        if state != "audio":
+                            self.result.errors.append(f"bienvenida: {state}")
+                            return self.result
+                        await self.play(size, mime)
+
+                    for _ in range(args.turns):
+                        await self.think(random.uniform(*args.think_s))
+                        if self.result.rejected:
+                            break
+                        errors_before = len(self.result.errors)
+                        t0 = time.perf_counter()
+                        await self.send_clip(random.choice(self.clips))
+                        state, size, mime, transcribed = await self.wait_audio(args.timeout)
+                        if state == "busy":
+                            continue
+                        if state in ("timeout", "closed"):
+                            self.result.errors.append(state)
+                            if state == "closed":
+                                break
+                            continue
+                        self.result.turns += 1
+                        failed = len(self.result.errors) > errors_before
+                        if not transcribed and not failed:
+                            self.result.no_voice += 1
+                        if state == "audio":
+                            # El audio de un turno fallido es la disculpa fija: no cuenta para TTFA
+                            if transcribed and not failed:
+                                self.result.ttfa_ms.append((time.perf_counter() - t0) * 1000)
+                            await self.play(size, mime)
+                finally:
+                    reader.cancel()
+        except (OSError, websockets.WebSocketException, asyncio.TimeoutError) as e:
+            self.result.errors.append(f"conexión: {type(e).__name__}")
+        return self.result
+
+# ==========================================
+# NIVELES DE CONCURRENCIA
+# ==========================================
+
+def session_modes(mode: str, n: int) -> List[str]:
+    if mode == "mixed":
+        return ["exabot" if i % 2 else "vitalbot" for i in range(n)]
+    return [mode] * n
+
+async def run_level(args, n: int, clips: List[bytes]) -> dict:
+    async def staggered(i: int, bot_mode: str):
+        await asyncio.sleep(args.ramp_s * i / max(1, n))
+        return await VoiceSession(args, bot_mode, clips).run()
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(staggered(i, m) for i, m in enumerate(session_modes(args.mode, n))))
+    elapsed = time.perf_counter() - t0
+
+    ttfa = [ms for r in results for ms in r.ttfa_ms]
+    turns = sum(r.turns for r in results)
+    errors = sum(len(r.errors) for r in results)
+    level = {
+        "sessions": n,
+        "turns": turns,
+        "no_voice": sum(r.no_voice for r in results),
+        "errors": errors,
+        "busy": sum(r.busy for r in results),
+        "rejected_sessions": sum(r.rejected for r in results),
+        "error_rate": round(errors / max(1, turns + errors), 4),
+        "turns_per_s": round(turns / elapsed, 2),
+        "ttfa_p50_ms": percentile(ttfa, 50),
+        "ttfa_p95_ms": percentile(ttfa, 95),
+        "ttfa_p99_ms": percentile(ttfa, 99),
+        "by_mode": {
+            mode: {"ttfa_p95_ms": percentile([ms for r in results if r.bot_mode == mode for ms in r.ttfa_ms], 95)}
+            for mode in sorted({r.bot_mode for r in results})
+        },
+        "sample_errors": sorted({e for r in results for e in r.errors})[:5],
+    }
+    print(f"👥 {n:>4} sesiones: {turns:>5} turnos ({level['turns_per_s']:>6.2f}/s)  TTFA p50={level['ttfa_p50_ms']} "
+          f"p95={level['ttfa_p95_ms']} p99={level['ttfa_p99_ms']} ms  errores={errors}  sin voz={level['no_voice']}  "
+          f"ocupado={level['busy']} ({level['rejected_sessions']} sesiones)")
+    return level
+
+def find_knee(levels: List[dict], slo_ms: float, max_error_rate: float) -> Optional[int]:
+    """Mayor concurrencia que cumple el SLO de p95 y la tasa de errores (antes de degradarse)"""
+    knee = None
+    for level in levels:
+        p95 = level["ttfa_p95_ms"]
+        if p95 is None or p95 > slo_ms or level["error_rate"] > max_error_rate:
+            break
+        knee = level["sessions"]
+    return knee
+
+# ==========================================
+# SERVIDOR LOCAL CON BACKENDS FALSOS
+# ==========================================
+
+def start_stack(args, workdir: str) -> subprocess.Popen:
+    ollama = FakeOllamaServer(latency_ms=args.llm_latency).start_background()
+    tts = FakeTTSServer(latency_ms=args.tts_latency).start_background()
+    env = dict(
+        os.environ,
+        OLLAMA_HOST=ollama.url,
+        ELEVENLABS_API_URL=tts.url,
+        ELEVENLABS_API_KEY="fake",
+        TTS_ENGINE="elevenlabs",
+        TTS_FALLBACK_ENGINES="synthetic",
+    )
+    print(f"🦙 Ollama falso {ollama.url} ({args.llm_latency}) | 🔊 TTS falso {tts.url} ({args.tts_latency})")
+    # cwd temporal: la BD de la prueba no ensucia vapi_history.db
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.getcwd(), "--port", str(args.port), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+    return proc
+
+async def wait_ready(port: int, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.5)
+    sys.exit(f"❌ El servidor no arrancó en {timeout:.0f} s")
+
+async def main(args) -> dict:
+    clips = load_clips(args.clips)
+    proc = None
+    workdir = tempfile.mkdtemp(prefix="vapi-load-")
+    if args.start_server:
+        args.url = f"ws://127.0.0.1:{args.port}/ws/voice"
+        proc = start_stack(args, workdir)
+        await wait_ready(args.port, args.startup_timeout)
+
+    try:
+        levels = [await run_level(args, n, clips) for n in args.sessions]
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    knee = find_knee(levels, args.slo_ms, args.max_error_rate)
+    criteria = f"TTFA p95 <= {args.slo_ms:.0f} ms y errores <= {args.max_error_rate:.0%}"
+    if knee:
+        print(f"📈 Codo: {knee} sesiones ({criteria})")
+    else:
+        print(f"📈 Ningún nivel cumple {criteria}")
+    report = {"mode": args.mode, "protocol": args.protocol, "slo_ms": args.slo_ms, "knee_sessions": knee, "levels": levels}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/voice")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Niveles de concurrencia, en orden")
+    parser.add_argument("--mode", choices=["vitalbot", "exabot", "mixed"], default="mixed")
+    parser.add_argument("--turns", type=int, default=5, help="Turnos por sesión")
+    parser.add_argument("--clips", nargs="*", default=[], help="WAV grabados (se aceptan globs)")
+    parser.add_argument("--think-s", type=float, nargs=2, default=(1.0, 4.0), help="Reflexión entre turnos (uniforme)")
+    parser.add_argument("--playback-speed", type=float, default=1.0, help=">1 acorta la reproducción simulada")
+    parser.add_argument("--max-playback-s", type=float, default=8.0)
+    parser.add_argument("--protocol", type=int, choices=[1, 2], default=PROTOCOL_V2)
+    parser.add_argument("--ramp-s", type=float, default=2.0, help="Las sesiones de un nivel arrancan repartidas en este tiempo")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Espera máxima por respuesta")
+    parser.add_argument("--slo-ms", type=float, default=3000.0, help="SLO de TTFA p95 para el codo")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--json", help="Informe en JSON")
+    parser.add_argument("--start-server", action="store_true", help="Arranca uvicorn + Ollama/TTS falsos en local")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Carga de Whisper incluida")
+    parser.add_argument("--llm-latency", type=Latency.parse, default="lognormal:600,0.4")
+    parser.add_argument("--tts-latency", type=Latency.parse, default="lognormal:250,0.3")
+    asyncio.run(main(parser.parse_args()))
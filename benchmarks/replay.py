@@ -0,0 +1,199 @@
+"""
+Reproducción offline de turnos grabados (TURN_RECORD_DIR) contra el código actual.
+
+Cada turno se vuelve a pasar por STTService / LLMService / TTSService (o por
+lo grabado, etapa a etapa) y se compara con lo que ocurrió en producción:
+latencia por etapa (p50/p95 grabado frente a reproducido) y salidas
+(transcripciones y respuestas que cambian, con su similitud).
+Una semana de tráfico real sirve así de corpus de regresión de rendimiento.
+
+Uso:
+    python -m benchmarks.replay grabaciones/ --stt real --llm real --tts real
+    python -m benchmarks.replay grabaciones/20261019 --stt real --llm recorded --json replay.json
+    python -m benchmarks.replay grabaciones/ --llm real --temperature 0 --limit 200
+"""
+
+import argparse
+import asyncio
+import difflib
+import glob
+import io
+import json
+import os
+import time
+import wave
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.config import config
+from app.prompts import HEALTH_SYSTEM_PROMPT, EXABOT_SYSTEM_PROMPT
+
+# Etapa -> nombre del span en los tiempos grabados (tracing)
+STAGES = {"stt": "stt", "llm": "llm.total", "tts": "tts.total"}
+
+def iter_turns(paths: List[str]) -> Iterator[dict]:
+    """Turnos de uno o varios bundles (directorios con turns.jsonl), en orden de grabación"""
+    manifests = []
+    for path in paths:
+        if os.path.isfile(path):
+            manifests.append(path)
+        else:
+            manifests += glob.glob(os.path.join(path, "**", "turns.jsonl"), recursive=True)
+    for manifest in sorted(set(manifests)):
+        base = os.path.dirname(manifest)
+        with open(manifest, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    turn = json.loads(line)
+                    turn["audio_path"] = os.path.join(base, turn["audio_file"])
+                    yield turn
+
+def wav_to_pcm(data: bytes) -> np.ndarray:
+    """WAV int16 grabado de un segmento del VAD -> float32 (entrada de transcribe_pcm)"""
+    with wave.open(io.BytesIO(data), "rb") as wf:
+        pcm = np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2")
+    return pcm.astype(np.float32) / 32768.0
+
+def similarity(a: Optional[str], b: Optional[str]) -> float:
+    return difflib.SequenceMatcher(None, (a or "").strip().lower(), (b or "").strip().lower()).ratio()
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 1)
+
+# ==========================================
+# REPRODUCCIÓN
+# ==========================================
+
+class Replayer:
+    def __init__(self, args):
+        self.args = args
+        self.stt = None
+        if args.stt == "real":
+            from app.services.stt import STTService  # Carga Whisper: sólo si hace falta
+            self.stt = STTService
+        if args.llm == "real":
+            from app.services.llm import LLMService
+            self.llm = LLMService
+        if args.tts == "real":
+            from app.services.tts import TTSService
+            self.tts = TTSService
+
+    def transcribe(self, turn: dict) -> Dict:
+        with open(turn["audio_path"], "rb") as f:
+            audio = f.read()
+        t0 = time.perf_counter()
+        if turn["audio_mime"].startswith("audio/pcm"):
+            text = self.stt.transcribe_pcm(wav_to_pcm(audio))
+        else:
+            text = self.stt.transcribe(audio)
+        return {"text": text, "ms": (time.perf_counter() - t0) * 1000}
+
+    def messages_for(self, turn: dict, transcript: str) -> List[dict]:
+        """Payload grabado; los aciertos especulativos no lo tienen y se reconstruye sin historial"""
+        if turn.get("messages") and transcript == turn.get("transcript"):
+            return turn["messages"]
+        if turn.get("messages"):
+            history = turn["messages"][:-1]  # Sin el mensaje de usuario original
+        else:
+            system = EXABOT_SYSTEM_PROMPT if turn["bot_mode"] == "exabot" else HEALTH_SYSTEM_PROMPT
+            history = [{"role": "system", "content": system}]
+        user = turn.get("user_message") if transcript == turn.get("transcript") else transcript
+        return history + [{"role": "user", "content": user or transcript}]
+
+    async def replay(self, turn: dict) -> dict:
+        result = {"turn_id": turn["turn_id"], "bot_mode": turn["bot_mode"], "recorded": {}, "replayed": {}}
+        timings = turn.get("timings") or {}
+        for stage, span in STAGES.items():
+            if span in timings:
+                result["recorded"][stage] = timings[span]
+
+        transcript = turn.get("transcript")
+        if self.stt:
+            stt = await asyncio.to_thread(self.transcribe, turn)
+            result["replayed"]["stt"] = stt["ms"]
+            result["transcript_similarity"] = similarity(transcript, stt["text"])
+            result["transcript"] = stt["text"]
+            transcript = stt["text"]
+
+        response = turn.get("response")
+        if self.args.llm == "real" and transcript and transcript.strip():
+            messages = self.messages_for(turn, transcript)
+            temperature = self.args.temperature if self.args.temperature is not None else (turn.get("temperature") or 0.7)
+            t0 = time.perf_counter()
+            response = await asyncio.to_thread(self.llm.complete, messages, temperature)
+            result["replayed"]["llm"] = (time.perf_counter() - t0) * 1000
+            result["response_similarity"] = similarity(turn.get("response"), response)
+            result["response"] = response
+
+        if self.args.tts == "real" and response:
+            t0 = time.perf_counter()
+            await self.tts.synthesize(response)
+            result["replayed"]["tts"] = (time.perf_counter() - t0) * 1000
+        return result
+
+def summarize(results: List[dict], args) -> dict:
+    stages = {}
+    for stage in STAGES:
+        recorded = [r["recorded"][stage] for r in results if stage in r["recorded"] and stage in r["replayed"]]
+        replayed = [r["replayed"][stage] for r in results if stage in r["replayed"]]
+        if not replayed:
+            continue
+        stages[stage] = {
+            "turns": len(replayed),
+            "recorded_p50_ms": percentile(recorded, 50),
+            "recorded_p95_ms": percentile(recorded, 95),
+            "replayed_p50_ms": percentile(replayed, 50),
+            "replayed_p95_ms": percentile(replayed, 95),
+        }
+
+    def changed(key: str) -> dict:
+        scores = [r[key] for r in results if key in r]
+        return {
+            "compared": len(scores),
+            "changed": sum(1 for s in scores if s < args.match),
+            "mean_similarity": round(sum(scores) / len(scores), 3) if scores else None,
+        }
+
+    return {"turns": len(results), "stages": stages, "transcripts": changed("transcript_similarity"), "responses": changed("response_similarity")}
+
+async def main(args) -> dict:
+    replayer = Replayer(args)
+    results = []
+    for i, turn in enumerate(iter_turns(args.bundles)):
+        if args.limit and i >= args.limit:
+            break
+        try:
+            results.append(await replayer.replay(turn))
+        except Exception as e:
+            print(f"⚠️ Turno {turn['turn_id']}: {e}")
+
+    summary = summarize(results, args)
+    print(f"🔁 {summary['turns']} turnos reproducidos (stt={args.stt}, llm={args.llm}, tts={args.tts}, modelo {config.LLM_MODEL})")
+    for stage, s in summary["stages"].items():
+        print(f"⏱️ {stage:<4} grabado p50={s['recorded_p50_ms']} p95={s['recorded_p95_ms']} ms  →  "
+              f"reproducido p50={s['replayed_p50_ms']} p95={s['replayed_p95_ms']} ms  ({s['turns']} turnos)")
+    for key in ("transcripts", "responses"):
+        s = summary[key]
+        if s["compared"]:
+            print(f"📝 {key}: {s['changed']}/{s['compared']} cambian (similitud media {s['mean_similarity']})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "turns": results}, f, indent=2, ensure_ascii=False)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bundles", nargs="+", help="Directorios de TURN_RECORD_DIR (o turns.jsonl concretos)")
+    parser.add_argument("--stt", choices=["real", "recorded"], default="real")
+    parser.add_argument("--llm", choices=["real", "recorded"], default="recorded")
+    parser.add_argument("--tts", choices=["real", "skip"], default="skip")
+    parser.add_argument("--temperature", type=float, help="Por defecto la grabada; 0 para comparar salidas de forma estable")
+    parser.add_argument("--match", type=float, default=0.9, help="Similitud mínima para considerar igual una salida")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--json", help="Detalle por turno en JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,353 @@
+"""
+Suite de micro-benchmarks de los caminos calientes, con salida JSON y
+comparación contra una línea base (regresiones visibles antes de desplegar).
+
+Casos (cada uno aislado, con modelos pequeños o stubs):
+    stt        decodificación + STTService.transcribe (Whisper 'tiny' y un stub sin inferencia)
+    prompts    extract_options_from_text
+    db         DatabaseManager add/get con hilos concurrentes (como el threadpool)
+    timers     ExamTimer / IdleMonitor sobre el scheduler con 10k sesiones
+    framing    VoiceChannel v1 (base64 + JSON) frente a v2 (frame binario)
+    tts        ElevenLabsEngine contra el TTS falso local (cliente compartido)
+
+Todas las métricas son microsegundos por operación (menos es mejor).
+La comparación usa la mejor muestra (min_us): en una máquina compartida la
+mediana arrastra el ruido de otros procesos; median_us y p95_us quedan en el JSON.
+
+Uso:
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --baseline bench.json --threshold 0.15
+    python -m benchmarks.suite --only prompts framing
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import orjson
+
+from app.config import config
+
+class Skip(Exception):
+    """El caso no puede correr en este entorno (dependencia o modelo ausente)"""
+
+def summarize(samples_us: List[float], ops: int) -> Dict[str, float]:
+    ordered = sorted(samples_us)
+    return {
+        "min_us": round(ordered[0], 3),
+        "median_us": round(statistics.median(ordered), 3),
+        "p95_us": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "ops": ops,
+    }
+
+def measure(fn: Callable[[], object], repeat: int, number: int) -> Dict[str, float]:
+    """repeat muestras de number llamadas; cada muestra en µs por llamada"""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number * 1e6)
+    return summarize(samples, repeat * number)
+
+async def measure_async(fn: Callable[[], object], repeat: int, number: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        samples.append((time.perf_counter() - t0) / number * 1e6)
+    return summarize(samples, repeat * number)
+
+def speech_like_wav(seconds: float = 3.0) -> bytes:
+    """WAV 16 kHz con tono modulado (no hace falta voz real para medir decodificación)"""
+    import numpy as np
+    t = np.arange(int(16000 * seconds)) / 16000
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes((signal * 32767).astype("<i2").tobytes())
+    return buf.getvalue()
+
+# ==========================================
+# CASOS
+# ==========================================
+
+def bench_stt(args) -> Dict[str, dict]:
+    config.STT_MODEL = "tiny"  # Antes de importar stt (carga el modelo al importar)
+    try:
+        import whisper
+        from app.services import stt
+    except ImportError as e:
+        raise Skip(f"whisper no instalado ({e})")
+    if stt.whisper_model is None:
+        raise Skip("no se pudo cargar Whisper 'tiny'")
+
+    clip = speech_like_wav()
+    results = {"stt.transcribe.tiny": measure(lambda: stt.STTService.transcribe(clip), args.repeat_slow, 1)}
+
+    class StubWhisper:
+        """Decodifica como Whisper (ffmpeg) pero sin inferencia: coste propio del servicio"""
+        def transcribe(self, audio, **kwargs):
+            if isinstance(audio, str):
+                whisper.load_audio(audio)
+            return {"text": "hola"}
+
+    real_model, stt.whisper_model = stt.whisper_model, StubWhisper()
+    try:
+        results["stt.decode.stub"] = measure(lambda: stt.STTService.transcribe(clip), args.repeat_slow, 5)
+    finally:
+        stt.whisper_model = real_model
+    return results
+
+def bench_prompts(args) -> Dict[str, dict]:
+    from app.prompts import extract_options_from_text
+    with_options = "Entiendo. ¿Cómo te sientes?\nA) Bien, gracias\nB) Regular\nC) Mal, me duele la cabeza\n\nCuéntame más."
+    plain = "Perfecto, recuerda beber agua y descansar. Si el dolor sigue mañana, consulta a tu médico. " * 3
+    return {
+        "prompts.extract_options.list": measure(lambda: extract_options_from_text(with_options), args.repeat, 2000),
+        "prompts.extract_options.plain": measure(lambda: extract_options_from_text(plain), args.repeat, 2000),
+    }
+
+def bench_db(args) -> Dict[str, dict]:
+    from app.database import DatabaseManager
+    threads, sessions, turns = 8, 64, 20
+
+    def run_once(manager: DatabaseManager) -> float:
+        def session(i: int):
+            sid = f"bench-{i}"
+            for t in range(turns):
+                manager.add_message(sid, "user", f"mensaje {t} de la sesión {i}")
+                manager.get_recent_context(sid, 5)
+                manager.add_message(sid, "assistant", f"respuesta {t} de la sesión {i}")
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(session, range(sessions)))
+        manager.flush()
+        return (time.perf_counter() - t0) / (sessions * turns) * 1e6
+
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for r in range(args.repeat_slow):
+            with contextlib.redirect_stdout(io.StringIO()):  # Mensajes de migración
+                manager = DatabaseManager(os.path.join(tmp, f"bench-{r}.db"))
+            samples.append(run_once(manager))
+            manager.close()
+    return {"db.turn.concurrent": summarize(samples, args.repeat_slow * sessions * turns)}
+
+def bench_timers(args) -> Dict[str, dict]:
+    from app.services.exam_timer import ExamTimer
+    from app.services.idle_monitor import IdleMonitor
+    n = args.sessions
+
+    async def noop(*_):
+        pass
+
+    async def run() -> Dict[str, dict]:
+        results = {}
+
+        def per_op(label: str, fn: Callable[[], None], items: list):
+            samples = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                for item in items:
+                    fn(item)
+                samples.append((time.perf_counter() - t0) / len(items) * 1e6)
+            results[label] = summarize(samples, args.repeat * len(items))
+
+        monitors = [IdleMonitor(config.IDLE_TIMEOUT_SECONDS, noop) for _ in range(n)]
+        per_op("timers.idle.start", lambda m: m.start(), monitors)  # Reinicia: cancela el plazo anterior
+        per_op("timers.idle.cancel", lambda m: m.cancel(), monitors)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            timers = [ExamTimer(noop) for _ in range(n)]
+            for timer in timers:
+                timer.prepare_exam()
+            t0 = time.perf_counter()
+            for timer in timers:
+                timer.start_counting()
+            start_us = (time.perf_counter() - t0) / n * 1e6
+            per_op("timers.exam.pause_resume", lambda t: (t.pause(), t.resume()), timers)
+            for timer in timers:
+                timer.stop()
+        results["timers.exam.start"] = summarize([start_us], n)
+
+        # Vencimiento masivo: 10k plazos en la misma ventana, un solo despertar del loop
+        fired = 0
+        done = asyncio.Event()
+
+        def on_fire():
+            nonlocal fired
+            fired += 1
+            if fired == n:
+                done.set()
+
+        from app.services.scheduler import scheduler
+        loop = asyncio.get_running_loop()
+        due = loop.time() + 0.05
+        for _ in range(n):
+            scheduler.call_later(due - loop.time(), on_fire)
+        await done.wait()
+        results["timers.expire.burst"] = summarize([(loop.time() - due) / n * 1e6], n)
+        return results
+
+    return asyncio.run(run())
+
+class NullWebSocket:
+    """WebSocket sin red: mide sólo la codificación/decodificación del protocolo"""
+    def __init__(self, incoming: dict = None):
+        self.incoming = incoming
+
+    async def send_text(self, data: str):
+        pass
+
+    async def send_bytes(self, data: bytes):
+        pass
+
+    async def receive(self) -> dict:
+        return self.incoming
+
+def bench_framing(args) -> Dict[str, dict]:
+    from app.protocol import VoiceChannel, PROTOCOL_V1, PROTOCOL_V2, FRAME_AUDIO, pack_frame
+    audio = os.urandom(args.audio_kb * 1024)
+    v1_in = {"type": "websocket.receive", "text": orjson.dumps({"type": "audio", "data": base64.b64encode(audio).decode("ascii"), "format": "audio/webm"}).decode("utf-8")}
+    v2_in = {"type": "websocket.receive", "bytes": pack_frame(FRAME_AUDIO, "audio/webm", audio)}
+
+    async def run() -> Dict[str, dict]:
+        v1_out, v2_out = VoiceChannel(NullWebSocket(), PROTOCOL_V1), VoiceChannel(NullWebSocket(), PROTOCOL_V2)
+        v1_rx, v2_rx = VoiceChannel(NullWebSocket(v1_in), PROTOCOL_V1), VoiceChannel(NullWebSocket(v2_in), PROTOCOL_V2)
+        return {
+            "framing.send.v1_base64": await measure_async(lambda: v1_out.send_audio(audio, "audio/mpeg"), args.repeat, 200),
+            "framing.send.v2_binary": await measure_async(lambda: v2_out.send_audio(audio, "audio/mpeg"), args.repeat, 200),
+            "framing.receive.v1_base64": await measure_async(v1_rx.receive, args.repeat, 200),
+            "framing.receive.v2_binary": await measure_async(v2_rx.receive, args.repeat, 200),
+        }
+
+    return asyncio.run(run())
+
+def bench_tts(args) -> Dict[str, dict]:
+    from benchmarks.fake_tts import FakeTTSServer
+    from app.services.http_client import close_http_client
+    from app.services.tts_engines import ElevenLabsEngine
+
+    server = FakeTTSServer().start_background()
+    config.ELEVENLABS_API_KEY = config.ELEVENLABS_API_KEY or "fake"
+    config.ELEVENLABS_API_URL = server.url
+    engine = ElevenLabsEngine()
+    sentence = "Hola, recuerda tomar agua y descansar un poco antes de seguir."
+
+    async def run() -> Dict[str, dict]:
+        try:
+            await engine.synthesize(sentence)  # Conexión ya abierta, como en régimen estable
+            return {"tts.elevenlabs.fake": await measure_async(lambda: engine.synthesize(sentence), args.repeat, 20)}
+        finally:
+            await close_http_client()
+            server.shutdown()
+
+    return asyncio.run(run())
+
+CASES: Dict[str, Callable] = {
+    "stt": bench_stt,
+    "prompts": bench_prompts,
+    "db": bench_db,
+    "timers": bench_timers,
+    "framing": bench_framing,
+    "tts": bench_tts,
+}
+
+# ==========================================
+# EJECUCIÓN Y COMPARACIÓN
+# ==========================================
+
+def environment() -> Dict[str, str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": str(os.cpu_count()),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def run_suite(args) -> dict:
+    report = {"environment": environment(), "results": {}, "skipped": {}}
+    for name in args.only or CASES:
+        t0 = time.perf_counter()
+        try:
+            results = CASES[name](args)
+        except Skip as e:
+            report["skipped"][name] = str(e)
+            print(f"⏭️ {name}: omitido ({e})")
+            continue
+        report["results"].update(results)
+        for metric, values in results.items():
+            print(f"⏱️ {metric:<32} {values['median_us']:>12.2f} µs  (p95 {values['p95_us']:.2f})")
+        print(f"   {name} en {time.perf_counter() - t0:.1f} s")
+    return report
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Compara la mejor muestra de cada métrica; devuelve las que empeoran más que threshold"""
+    regressions = []
+    print(f"\n📊 Comparación con la línea base ({baseline.get('environment', {}).get('commit') or '?'}), umbral {threshold:.0%}")
+    for metric, values in report["results"].items():
+        base = baseline.get("results", {}).get(metric)
+        if not base:
+            print(f"   {metric:<32} nuevo")
+            continue
+        before, after = base.get("min_us", base["median_us"]), values["min_us"]
+        change = after / before - 1 if before else 0.0
+        if change > threshold:
+            regressions.append(metric)
+            mark = "🔺"
+        elif change < -threshold:
+            mark = "🟢"
+        else:
+            mark = "  "
+        print(f"{mark} {metric:<32} {before:>12.2f} → {after:>12.2f} µs  ({change:+.1%})")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(CASES), help="Casos a ejecutar (por defecto todos)")
+    parser.add_argument("--output", help="Guarda los resultados en JSON")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento relativo que cuenta como regresión")
+    parser.add_argument("--repeat", type=int, default=7, help="Muestras por métrica rápida")
+    parser.add_argument("--repeat-slow", type=int, default=3, help="Muestras por métrica lenta (STT, BD)")
+    parser.add_argument("--sessions", type=int, default=10_000, help="Sesiones simuladas en los timers")
+    parser.add_argument("--audio-kb", type=int, default=48, help="Tamaño del audio en framing (≈3 s de MP3)")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados en {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ Sin regresiones")
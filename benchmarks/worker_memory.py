@@ -0,0 +1,184 @@
+"""
+Memoria por worker de uvicorn: modelos en cada proceso (local) frente a
+servidor de modelos compartido (shared, MODEL_SERVER_SOCKET).
+
+Para cada número de workers se levanta uvicorn --workers N, se calienta cada
+worker con sesiones ?ingest=vad (carga el VAD y recorre el camino de audio) y
+se mide RSS y PSS (/proc/<pid>/smaps_rollup; PSS reparte las páginas
+compartidas, así que la suma no cuenta dos veces las librerías). El coste de
+cada worker añadido es la pendiente de la memoria total frente a N.
+
+Uso:
+    python -m benchmarks.worker_memory --workers 1 2 4 8
+    python -m benchmarks.worker_memory --mode shared --workers 1 4 --json memoria.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import websockets
+
+from app.protocol import FRAME_PCM_STREAM, PROTOCOL_V2, pack_frame
+from app.services.recorder import PCM_MIME
+
+MB = 1024 * 1024
+
+def smaps_rollup(pid: int) -> Dict[str, int]:
+    """RSS y PSS de un proceso en bytes"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower()] = int(rest.split()[0]) * 1024
+    return values
+
+def children(pid: int) -> List[int]:
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    return pids
+
+def slope(xs: List[int], ys: List[float]) -> Optional[float]:
+    """Mínimos cuadrados: memoria por worker añadido"""
+    if len(set(xs)) < 2:
+        return None
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+# ==========================================
+# PROCESOS
+# ==========================================
+
+def wait_for(check, timeout: float, what: str):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return
+        time.sleep(0.25)
+    raise RuntimeError(f"{what} no arrancó en {timeout:.0f} s")
+
+def start_model_server(workdir: str, socket_path: str, args) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "app.services.model_server", "--socket", socket_path]
+    if args.no_stt:
+        cmd.append("--no-stt")
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env)
+    wait_for(lambda: os.path.exists(socket_path) or proc.poll() is not None, args.startup_timeout, "El servidor de modelos")
+    if proc.poll() is not None:
+        raise RuntimeError("El servidor de modelos terminó al arrancar")
+    return proc
+
+def start_uvicorn(workdir: str, n: int, socket_path: Optional[str], args) -> subprocess.Popen:
+    env = dict(os.environ, TTS_ENGINE="synthetic", TTS_FALLBACK_ENGINES="synthetic", MODEL_SERVER_SOCKET=socket_path or "")
+    # cwd temporal: la BD de la prueba no ensucia vapi_history.db
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.getcwd(), "--port", str(args.port),
+         "--workers", str(n), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+
+async def warm(port: int, sessions: int, seconds: float):
+    """Sesiones VAD con silencio: cada worker carga (o conecta) el VAD y procesa audio"""
+    url = f"ws://127.0.0.1:{port}/ws/voice?ingest=vad&protocol={PROTOCOL_V2}"
+    frame = pack_frame(FRAME_PCM_STREAM, PCM_MIME, bytes(16000 * 2 // 50))  # 20 ms de silencio
+
+    async def one():
+        async with websockets.connect(url, max_size=None) as ws:
+            for _ in range(int(seconds * 50)):
+                await ws.send(frame)
+                await asyncio.sleep(0.02)
+
+    await asyncio.gather(*[one() for _ in range(sessions)])
+
+async def wait_ready(port: int, timeout: float, proc: subprocess.Popen):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn terminó al arrancar")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"uvicorn no arrancó en {timeout:.0f} s")
+
+def measure_level(mode: str, n: int, workdir: str, args) -> dict:
+    socket_path = os.path.join(workdir, "models.sock") if mode == "shared" else None
+    server = start_model_server(workdir, socket_path, args) if socket_path else None
+    uv = start_uvicorn(workdir, n, socket_path, args)
+    try:
+        asyncio.run(wait_ready(args.port, args.startup_timeout, uv))
+        # Los workers importan la app después de abrir el puerto: esperar a que estén todos
+        wait_for(lambda: len(children(uv.pid)) >= n, args.startup_timeout, "Los workers")
+        asyncio.run(warm(args.port, n * args.sessions_per_worker, args.warm_seconds))
+        time.sleep(1.0)
+
+        workers = [smaps_rollup(pid) for pid in children(uv.pid)]
+        result = {
+            "mode": mode,
+            "workers": n,
+            "worker_rss_mb": [round(w["rss"] / MB, 1) for w in workers],
+            "worker_pss_mb": [round(w["pss"] / MB, 1) for w in workers],
+            "master_pss_mb": round(smaps_rollup(uv.pid)["pss"] / MB, 1),
+            "model_server_pss_mb": round(smaps_rollup(server.pid)["pss"] / MB, 1) if server else 0.0,
+        }
+        result["total_pss_mb"] = round(sum(result["worker_pss_mb"]) + result["master_pss_mb"] + result["model_server_pss_mb"], 1)
+        return result
+    finally:
+        for proc in (uv, server):
+            if proc:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+def main(args) -> dict:
+    modes = ["local", "shared"] if args.mode == "both" else [args.mode]
+    report = {"levels": [], "per_worker_mb": {}}
+    for mode in modes:
+        for n in args.workers:
+            with tempfile.TemporaryDirectory(prefix="vapi-mem-") as workdir:
+                try:
+                    level = measure_level(mode, n, workdir, args)
+                except RuntimeError as e:
+                    print(f"❌ {mode} x{n}: {e}")
+                    continue
+            report["levels"].append(level)
+            avg_pss = sum(level["worker_pss_mb"]) / max(1, len(level["worker_pss_mb"]))
+            avg_rss = sum(level["worker_rss_mb"]) / max(1, len(level["worker_rss_mb"]))
+            print(f"🧮 {mode:<6} workers={n:<2} total PSS {level['total_pss_mb']:>7.1f} MB | por worker RSS {avg_rss:.1f} / PSS {avg_pss:.1f} MB"
+                  f" | servidor de modelos {level['model_server_pss_mb']:.1f} MB")
+
+        levels = [l for l in report["levels"] if l["mode"] == mode]
+        per_worker = slope([l["workers"] for l in levels], [l["total_pss_mb"] for l in levels])
+        if per_worker is not None:
+            report["per_worker_mb"][mode] = round(per_worker, 1)
+            print(f"📈 {mode}: +{per_worker:.1f} MB (PSS) por worker añadido")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["local", "shared", "both"], default="both")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8910)
+    parser.add_argument("--sessions-per-worker", type=int, default=2)
+    parser.add_argument("--warm-seconds", type=float, default=2.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--no-stt", action="store_true", help="Servidor de modelos sin Whisper (sólo VAD)")
+    parser.add_argument("--json", help="Resultados en JSON")
+    main(parser.parse_args())
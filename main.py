@@ -1,15 +1,48 @@
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.config import config
-from app.routers import api, websocket, web
+from app.routers import api, websocket, web, history, metrics
+from app.services.http_client import close_http_client
+from app.services.vad import close_vad_engine
+from app.services.phrase_bank import phrase_bank
+from app.database import db
+from app.services.retention import retention_loop
+from app.services.tracing import exporter as trace_exporter
+from app.services.metrics import install_executor, loop_lag_monitor
+from app.services.admission import admission
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Recursos compartidos del proceso (arranque / apagado)"""
+    # Executor de asyncio.to_thread con tamaño fijo y ocupación visible en /metrics
+    executor = install_executor(asyncio.get_running_loop())
+    lag_task = asyncio.create_task(loop_lag_monitor())
+    # Phrase bank: primero lo persistido, luego pre-síntesis en segundo plano
+    await asyncio.to_thread(phrase_bank.load_bundle)
+    warm_task = asyncio.create_task(phrase_bank.warm())
+    # Historial: archivado de sesiones caducadas + compactación periódica
+    retention_task = asyncio.create_task(retention_loop())
+    yield
+    warm_task.cancel()
+    retention_task.cancel()
+    lag_task.cancel()
+    await close_http_client()
+    await close_vad_engine()
+    db.close()
+    trace_exporter.close()
+    executor.shutdown(wait=False, cancel_futures=True)
 
 # Inicializar FastAPI
-app = FastAPI(title="VAPI - Voice API Real-Time", version="2.1.0")
+app = FastAPI(title="VAPI - Voice API Real-Time", version="2.1.0", lifespan=lifespan)
 
 # Incluir Routers
 app.include_router(web.router)
 app.include_router(websocket.router)
 app.include_router(api.router)
+app.include_router(history.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -21,8 +54,10 @@ async def root():
         "components": {
             "llm": config.LLM_MODEL,
             "stt": f"Whisper-{config.STT_MODEL}",
+            "model_server": config.MODEL_SERVER_SOCKET or None,
             "tts": config.TTS_ENGINE                            
-        }
+        },
+        "admission": admission.snapshot()
     }
 
 if __name__ == "__main__":
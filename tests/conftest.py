@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+def pytest_configure(config):
+    # app.database crea su instancia global sobre vapi_history.db en el directorio actual:
+    # las pruebas trabajan en uno temporal para no tocar el historial real
+    os.chdir(tempfile.mkdtemp(prefix="vapi-tests-"))
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from app.services.admission import AdmissionController, Busy
+
+def controller(**overrides) -> AdmissionController:
+    params = dict(max_sessions=2, max_turns=2, max_wait_s=2.0, stage_limits={"stt": 1, "llm": 2, "tts": 2}, enabled=True)
+    params.update(overrides)
+    return AdmissionController(**params)
+
+def test_tope_de_sesiones():
+    adm = controller()
+    assert adm.open_session() is None
+    assert adm.open_session() is None
+    busy = adm.open_session()
+    assert busy.scope == "session" and busy.retry_after >= 1
+    assert busy.to_message()["type"] == "busy"
+    adm.close_session()
+    assert adm.open_session() is None
+
+def test_turnos_en_cola_y_rechazo():
+    async def run():
+        adm = controller()
+        await adm.acquire_turn()
+        await adm.acquire_turn()
+        assert adm.saturated and not adm.has_capacity()
+
+        order = []
+
+        async def queued(i):
+            await adm.acquire_turn()
+            order.append(i)
+
+        # Turno medio 3.3 s con 2 huecos: el primero en cola espera ~1.65 s (cabe en max_wait_s)
+        task = asyncio.create_task(queued(1))
+        await asyncio.sleep(0)
+        assert len(adm._waiters) == 1
+        # El segundo esperaría ~3.3 s: se rechaza
+        with pytest.raises(Busy) as rejected:
+            await adm.acquire_turn()
+        assert rejected.value.scope == "turn"
+
+        adm.release_turn()  # El hueco pasa al de la cola sin bajar el contador
+        await task
+        assert order == [1] and adm.turns == 2
+        adm.release_turn()
+        adm.release_turn()
+        assert adm.turns == 0 and not adm.saturated
+
+    asyncio.run(run())
+
+def test_cola_fifo():
+    async def run():
+        adm = controller(max_turns=1, max_wait_s=10.0)
+        await adm.acquire_turn()
+        order = []
+
+        async def queued(i):
+            await adm.acquire_turn()
+            order.append(i)
+            adm.release_turn()
+
+        tasks = [asyncio.create_task(queued(i)) for i in (1, 2, 3)]
+        await asyncio.sleep(0)
+        adm.release_turn()
+        await asyncio.gather(*tasks)
+        assert order == [1, 2, 3] and adm.turns == 0
+
+    asyncio.run(run())
+
+def test_cancelar_en_cola_no_pierde_huecos():
+    async def run():
+        adm = controller(max_turns=1, max_wait_s=10.0)
+        await adm.acquire_turn()
+        waiter = asyncio.create_task(adm.acquire_turn())
+        await asyncio.sleep(0)
+        adm.release_turn()  # El hueco pasa al que espera...
+        waiter.cancel()  # ...que se cancela antes de despertar
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert adm.turns == 0 and not adm._waiters
+
+    asyncio.run(run())
+
+def test_etapas_y_ewma():
+    adm = controller()
+    before = adm.stage_seconds["stt"]
+    with adm.stage("stt"):
+        assert adm.stage_depth["stt"] == 1
+        assert not adm.has_capacity("stt") and adm.has_capacity("llm")
+    assert adm.stage_depth["stt"] == 0
+    assert adm.stage_seconds["stt"] < before  # Una etapa casi instantánea baja la media
+    with pytest.raises(RuntimeError):
+        with adm.stage("llm"):
+            raise RuntimeError
+    assert adm.stage_depth["llm"] == 0
+
+def test_desactivado_no_limita():
+    async def run():
+        adm = controller(max_turns=1, max_sessions=0, enabled=False)
+        await adm.acquire_turn()
+        await adm.acquire_turn()
+        return adm
+
+    adm = asyncio.run(run())
+    assert adm.turns == 2 and adm.has_capacity()
+    assert adm.open_session() is None
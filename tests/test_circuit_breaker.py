@@ -0,0 +1,66 @@
+from app.services.tts_engines import CircuitBreaker
+
+def make_breaker(**overrides) -> CircuitBreaker:
+    params = dict(failure_threshold=3, reset_seconds=30, latency_budget=1.0, min_samples=3)
+    params.update(overrides)
+    return CircuitBreaker(**params)
+
+def test_abre_tras_fallos_consecutivos():
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+def test_exito_reinicia_el_contador():
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_una_respuesta_lenta_no_abre():
+    breaker = make_breaker()
+    breaker.record_success(10.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+def test_latencia_media_fuera_de_presupuesto_abre():
+    breaker = make_breaker()
+    for _ in range(5):
+        breaker.record_success(10.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_half_open_deja_pasar_una_sola_prueba():
+    breaker = make_breaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+def test_half_open_exito_cierra():
+    breaker = make_breaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+def test_half_open_fallo_reabre():
+    breaker = make_breaker(reset_seconds=0)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_release_libera_la_prueba_sin_cambiar_estado():
+    breaker = make_breaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,39 @@
+import sqlite3
+from app.database import ContextCache, DatabaseManager
+
+def messages(n: int) -> list:
+    return [{"role": "user", "content": f"m{i}"} for i in range(n)]
+
+def test_ventana_acotada_y_append():
+    cache = ContextCache(max_messages=3)
+    cache.fill("s1", messages(5))
+    cache.append("s1", {"role": "assistant", "content": "r"})
+    assert [m["content"] for m in cache.get("s1", 3)] == ["m3", "m4", "r"]
+
+def test_caduca_tras_ttl():
+    cache = ContextCache(ttl=0)
+    cache.fill("s1", messages(2))
+    assert cache.get("s1", 2) is None
+    assert "s1" not in cache and cache.total_bytes == 0
+    assert cache.stats['expired'] == 1
+
+def test_expulsion_lru_por_memoria():
+    cache = ContextCache(max_bytes=ContextCache.MESSAGE_OVERHEAD * 3)
+    cache.fill("s1", messages(2))
+    cache.fill("s2", messages(2))
+    assert "s1" not in cache and "s2" in cache
+
+def test_invalidate_context_relee_lo_escrito_por_otro_worker(tmp_path):
+    db = DatabaseManager(str(tmp_path / "history.db"))
+    db.add_message("s1", "user", "hola")
+    db.flush()
+    assert [m["content"] for m in db.get_recent_context("s1")] == ["hola"]
+
+    # Otro proceso añade un mensaje a la misma sesión
+    with sqlite3.connect(db.db_path) as other:
+        other.execute("INSERT INTO conversation_history (session_id, role, content) VALUES ('s1', 'assistant', 'otro worker')")
+    assert [m["content"] for m in db.get_recent_context("s1")] == ["hola"]
+
+    db.invalidate_context("s1")
+    assert [m["content"] for m in db.get_recent_context("s1")] == ["hola", "otro worker"]
+    db.close()
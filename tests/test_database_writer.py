@@ -0,0 +1,68 @@
+import json
+import sqlite3
+import pytest
+from app import database
+from app.database import DatabaseManager
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_BUSY_TIMEOUT_MS", 10)
+    monkeypatch.setattr(database, "DB_WRITE_FLUSH_MS", 1)
+    monkeypatch.setattr(database, "DB_WRITE_MAX_RETRIES", 2)
+    db = DatabaseManager(str(tmp_path / "history.db"))
+    yield db
+    db.close()
+
+def count_rows(db: DatabaseManager) -> int:
+    with sqlite3.connect(db.db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM conversation_history").fetchone()[0]
+
+def dead_letters(db: DatabaseManager) -> list:
+    with open(db.dead_letter_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_escribe_en_lote(manager):
+    for i in range(5):
+        manager.add_message("s1", "user", f"hola {i}")
+    manager.flush()
+    assert count_rows(manager) == 5
+    assert not manager._queue and not manager._pending
+
+def test_error_permanente_desvia_solo_la_fila_mala(manager):
+    manager.add_message("s1", "user", "antes")
+    manager.add_message("s1", "user", None)  # NOT NULL: error permanente
+    manager.add_message("s1", "user", "después")
+    manager.flush()
+    assert count_rows(manager) == 2
+    [record] = dead_letters(manager)
+    assert record["reason"] == "permanent_error" and record["content"] is None
+    assert [m["content"] for m in manager.get_recent_context("s1")] == ["antes", "después"]
+
+def test_bloqueo_se_reintenta_y_luego_se_escribe(manager):
+    locker = sqlite3.connect(manager.db_path)
+    locker.execute("BEGIN EXCLUSIVE")
+    manager.add_message("s1", "user", "hola")
+    assert manager._write_batch() is False
+    locker.rollback()
+    manager.flush()
+    assert count_rows(manager) == 1
+    assert manager._write_failures == 0
+
+def test_bloqueo_persistente_agota_reintentos(manager):
+    locker = sqlite3.connect(manager.db_path)
+    locker.execute("BEGIN EXCLUSIVE")
+    manager.add_message("s1", "user", "hola")
+    manager.flush()  # Termina aunque la BD siga bloqueada
+    locker.rollback()
+    assert not manager._queue
+    assert [r["reason"] for r in dead_letters(manager)] == ["retries_exhausted"]
+
+def test_cola_acotada(manager, monkeypatch):
+    monkeypatch.setattr(database, "DB_WRITE_QUEUE_MAX", 2)
+    with manager._flush_lock:  # El escritor no puede vaciar la cola mientras tanto
+        for i in range(3):
+            manager.add_message("s1", "user", f"m{i}")
+        assert len(manager._queue) == 2
+    assert [r["content"] for r in dead_letters(manager)] == ["m2"]
+    manager.flush()
+    assert count_rows(manager) == 2
@@ -0,0 +1,39 @@
+import pytest
+from app.config import config
+from app.services.endpointing import EndpointDetector
+
+MODES = ["vitalbot", "exabot"]
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("text", ["Sí.", "sí", "si", "no", "No.", "a", "B", "opción a", "Opción C.", "la b", "la primera"])
+def test_respuestas_cortas_completas(mode, text):
+    score, reason = EndpointDetector(mode).completeness(text)
+    assert score == pytest.approx(0.9), reason
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("text", ["me duele la", "quiero ir a", "creo que", "sí, pero", "la primera vez que", "y si"])
+def test_conector_final_en_varias_palabras(mode, text):
+    score, _ = EndpointDetector(mode).completeness(text)
+    assert score == 0.0
+
+@pytest.mark.parametrize("text", ["sí,", "a...", "no -"])
+def test_pausa_a_media_frase(text):
+    assert EndpointDetector("vitalbot").completeness(text) == (0.0, "pausa a media frase")
+
+def test_vacio():
+    assert EndpointDetector("vitalbot").completeness("  ")[0] == 0.0
+
+def test_respuesta_numerica_solo_en_exabot():
+    assert EndpointDetector("exabot").completeness("son 12")[0] == pytest.approx(0.9)
+    assert EndpointDetector("vitalbot").completeness("son 12")[0] == pytest.approx(0.3)
+
+def test_puntuacion_de_cierre():
+    assert EndpointDetector("vitalbot").completeness("Me duele la cabeza.") == (pytest.approx(0.7), "puntuación de cierre")
+
+def test_decide_respuesta_corta_espera_poco():
+    detector = EndpointDetector("vitalbot")
+    quick = detector.decide("Sí.", speech_prob=0.01, silence_ms=0)
+    slow = detector.decide("quiero ir a", speech_prob=0.01, silence_ms=0)
+    assert quick.wait_ms < 400
+    assert slow.wait_ms > quick.wait_ms
+    assert config.ENDPOINT_MIN_SILENCE_MS <= quick.wait_ms <= config.ENDPOINT_MAX_SILENCE_MS
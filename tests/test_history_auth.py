@@ -0,0 +1,68 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.config import config
+from app.database import DatabaseManager
+from app.routers import history
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    db = DatabaseManager(str(tmp_path / "history.db"))
+    db.add_message("a", "user", "hola")
+    db.flush()
+    monkeypatch.setattr(history, "db", db)
+    monkeypatch.setattr(config, "HISTORY_API_TOKEN", "secreto")
+    app = FastAPI()
+    app.include_router(history.router)
+    yield TestClient(app)
+    db.close()
+
+@pytest.mark.parametrize("path", ["/v1/history", "/v1/history/export", "/v1/history/search?q=hola"])
+def test_sin_token_no_se_sirve(client, path):
+    assert client.get(path).status_code == 401
+    response = client.get(path, headers={"Authorization": "Bearer otro"})
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+@pytest.mark.parametrize("path", ["/v1/history", "/v1/history/export", "/v1/history/search?q=hola"])
+def test_token_no_configurado_deshabilita_la_api(client, monkeypatch, path):
+    monkeypatch.setattr(config, "HISTORY_API_TOKEN", "")
+    assert client.get(path, headers={"Authorization": "Bearer "}).status_code == 503
+
+def test_con_token_valido(client):
+    auth = {"Authorization": "Bearer secreto"}
+    assert client.get("/v1/history", headers=auth).json()["data"][0]["content"] == "hola"
+    assert b"hola" in client.get("/v1/history/export", headers=auth).content
+    assert client.get("/v1/history/search?q=hola", headers=auth).json()["data"]
+
+def test_exportacion_cierra_la_conexion_si_el_cliente_se_va(tmp_path, monkeypatch):
+    import asyncio
+    from contextlib import contextmanager
+    db = DatabaseManager(str(tmp_path / "history.db"))
+    for i in range(10):
+        db.add_message("a", "user", f"mensaje {i}")
+    db.flush()
+    opened, closed = [], []
+    base = db.read_only_connection
+
+    @contextmanager
+    def spy():
+        with base() as conn:
+            opened.append(conn)
+            try:
+                yield conn
+            finally:
+                closed.append(conn)
+    monkeypatch.setattr(db, "read_only_connection", spy)
+    monkeypatch.setattr(history, "db", db)
+    monkeypatch.setattr(history, "EXPORT_CHUNK_BYTES", 1)
+
+    async def disconnect_after_first_chunk():
+        chunks = history._ndjson_chunks(None, False)
+        stream = history._stream_chunks(chunks)
+        assert b"mensaje 0" in await stream.__anext__()
+        await stream.aclose()
+        return chunks  # Sigue vivo: el cierre no puede depender del GC
+    chunks = asyncio.run(disconnect_after_first_chunk())
+    assert len(opened) == 1 and closed == opened
+    db.close()
@@ -0,0 +1,37 @@
+import pytest
+from fastapi import HTTPException
+from app.database import DatabaseManager
+from app.routers.history import decode_cursor, encode_cursor
+
+@pytest.fixture
+def history(tmp_path):
+    db = DatabaseManager(str(tmp_path / "history.db"))
+    for session_id in ("b", "a", "c", "a", "b", "a"):
+        db.add_message(session_id, "user", f"mensaje de {session_id}")
+    db.flush()
+    yield db
+    db.close()
+
+def test_paginacion_keyset_recorre_todo_sin_repetir(history):
+    pages, cursor = [], None
+    while True:
+        items, cursor = history.page_history(limit=2, after=cursor)
+        pages.append(items)
+        if cursor is None:
+            break
+    keys = [(r["session_id"], r["id"]) for page in pages for r in page]
+    assert keys == sorted(keys)
+    assert len(keys) == 6 and len(set(keys)) == 6
+    assert keys == [(r["session_id"], r["id"]) for r in history.iter_history()]
+
+def test_paginacion_por_sesion(history):
+    items, cursor = history.page_history(limit=2, session_id="a")
+    assert [r["session_id"] for r in items] == ["a", "a"] and cursor is not None
+    items, cursor = history.page_history(limit=2, after=cursor, session_id="a")
+    assert len(items) == 1 and cursor is None
+
+def test_cursor_opaco():
+    assert decode_cursor(encode_cursor(("a", 3))) == ("a", 3)
+    assert decode_cursor(None) is None
+    with pytest.raises(HTTPException):
+        decode_cursor("no-es-un-cursor")
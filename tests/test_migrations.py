@@ -0,0 +1,45 @@
+import sqlite3
+from app.database import MIGRATIONS, DatabaseManager
+
+def legacy_db(path: str):
+    """Esquema anterior a las migraciones: tabla sin índices nuevos, user_version 0"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE conversation_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            options_json TEXT,
+            selected_option TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("CREATE INDEX idx_session_id ON conversation_history(session_id)")
+    conn.execute("INSERT INTO conversation_history (session_id, role, content) VALUES ('s1', 'user', 'Me duelen las rodillas')")
+    conn.commit()
+    conn.close()
+
+def test_migraciones_sobre_bd_existente(tmp_path):
+    path = str(tmp_path / "history.db")
+    legacy_db(path)
+    db = DatabaseManager(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_history_session_context", "idx_history_created_at"} <= indexes
+    assert not {"idx_session_id", "idx_history_session_id"} & indexes
+    # El contexto reciente se lee sólo del índice
+    plan = " ".join(r[-1] for r in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT role, content FROM conversation_history WHERE session_id = ? ORDER BY id DESC LIMIT 10", ("s1",)
+    ))
+    assert "COVERING INDEX idx_history_session_context" in plan
+    conn.close()
+    # Lo que ya existía queda indexado en FTS (sin tildes, por prefijo)
+    assert [r["id"] for r in db.search_history("rodilla")] == [1]
+    db.close()
+
+    # Reabrir no vuelve a migrar
+    db = DatabaseManager(path)
+    db.close()
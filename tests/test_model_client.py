@@ -0,0 +1,93 @@
+import asyncio
+import numpy as np
+import pytest
+from app.config import config
+from app.services import vad
+from app.services.model_client import ModelServerError, RemoteVADEngine, encode_frame, read_frame
+
+CHUNK = np.zeros(512, dtype=np.float32)
+
+async def start_server(path: str, answer: bool, drop: bool = False):
+    """Servidor de modelos mínimo: responde prob=0.25 a cada chunk, se los guarda sin contestar o corta la conexión"""
+    async def handle(reader, writer):
+        try:
+            while True:
+                header, _ = await read_frame(reader)
+                if drop and header.get("op") == "vad":
+                    writer.close()
+                    return
+                if answer and header.get("op") == "vad":
+                    writer.write(encode_frame({"id": header["id"], "ok": True, "prob": 0.25}))
+        except asyncio.IncompleteReadError:
+            writer.close()
+    return await asyncio.start_unix_server(handle, path=path)
+
+def test_inferencia_remota(tmp_path):
+    async def run():
+        path = str(tmp_path / "models.sock")
+        server = await start_server(path, answer=True)
+        engine = RemoteVADEngine(path)
+        stream = engine.register()
+        assert await engine.infer(stream, CHUNK) == 0.25
+        assert engine._reader_task is not None and not engine._reader_task.done()
+        await engine.close()
+        assert engine._reader_task is None and engine._writer is None
+        server.close()
+
+    asyncio.run(run())
+
+def test_close_falla_las_inferencias_pendientes(tmp_path):
+    async def run():
+        path = str(tmp_path / "models.sock")
+        server = await start_server(path, answer=False)
+        engine = RemoteVADEngine(path)
+        stream = engine.register()
+        pending = asyncio.create_task(engine.infer(stream, CHUNK))
+        await asyncio.sleep(0.05)
+        await engine.close()
+        with pytest.raises(ModelServerError):
+            await pending
+        server.close()
+
+    asyncio.run(run())
+
+def test_servidor_caido(tmp_path):
+    async def run():
+        engine = RemoteVADEngine(str(tmp_path / "no-existe.sock"))
+        with pytest.raises(ModelServerError):
+            await engine.infer(engine.register(), CHUNK)
+
+    asyncio.run(run())
+
+def test_conexion_cortada_a_mitad_de_peticion(tmp_path):
+    async def run():
+        path = str(tmp_path / "models.sock")
+        server = await start_server(path, answer=False, drop=True)
+        engine = RemoteVADEngine(path)
+        with pytest.raises(ModelServerError):
+            await asyncio.wait_for(engine.infer(engine.register(), CHUNK), 5)
+        assert engine._writer is None and not engine._pending
+        await engine.close()
+        server.close()
+
+    asyncio.run(run())
+
+def test_vad_pasa_al_motor_local_si_el_servidor_cae(tmp_path, monkeypatch):
+    async def run():
+        path = str(tmp_path / "models.sock")
+        server = await start_server(path, answer=False, drop=True)
+        monkeypatch.setattr(config, "MODEL_SERVER_SOCKET", path)
+        monkeypatch.setattr(config, "VAD_BACKEND", "onnx")
+        monkeypatch.setattr(vad, "_engine", None)
+        monkeypatch.setattr(vad, "_local_engine", None)
+        segmenter = vad.StreamingVAD()
+        assert isinstance(segmenter.engine, RemoteVADEngine)
+        await asyncio.wait_for(segmenter.feed(bytes(2 * config.VAD_CHUNK_SIZE * 2)), 5)
+        assert segmenter.engine is vad.get_local_vad_engine()
+        # La sesión sigue con el motor local; el remoto queda para sesiones nuevas
+        assert vad.get_vad_engine() is not segmenter.engine
+        segmenter.close()
+        await vad.close_vad_engine()
+        server.close()
+
+    asyncio.run(run())
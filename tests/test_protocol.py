@@ -0,0 +1,60 @@
+import asyncio
+import base64
+import pytest
+from app.protocol import (
+    FRAME_AUDIO, FRAME_PCM_STREAM, PCM_STREAM_MAX_BYTES, PROTOCOL_V2, ProtocolError, VoiceChannel, pack_frame
+)
+
+PCM_MIME = "audio/pcm;rate=16000"
+
+class FakeWebSocket:
+    """Entrega un único mensaje ASGI a VoiceChannel.receive"""
+
+    def __init__(self, raw: dict):
+        self.raw = raw
+
+    async def receive(self) -> dict:
+        return self.raw
+
+def receive(raw: dict):
+    return asyncio.run(VoiceChannel(FakeWebSocket(raw), PROTOCOL_V2).receive())
+
+def binary(frame_type: int, payload: bytes, mime: str = PCM_MIME) -> dict:
+    return {"type": "websocket.receive", "bytes": pack_frame(frame_type, mime, payload)}
+
+def text(body: str) -> dict:
+    return {"type": "websocket.receive", "text": body}
+
+def test_pcm_valido():
+    message, payload = receive(binary(FRAME_PCM_STREAM, bytes(640)))
+    assert message == {"type": "pcm_stream", "format": PCM_MIME}
+    assert len(payload) == 640
+
+@pytest.mark.parametrize("size", [1, 641, PCM_STREAM_MAX_BYTES + 2])
+def test_pcm_invalido(size):
+    with pytest.raises(ProtocolError):
+        receive(binary(FRAME_PCM_STREAM, bytes(size)))
+
+def test_audio_binario_admite_longitud_impar():
+    message, payload = receive(binary(FRAME_AUDIO, bytes(3), "audio/webm"))
+    assert message["type"] == "audio" and len(payload) == 3
+
+@pytest.mark.parametrize("body", ["[1, 2]", "\"hola\"", "{}", "{\"type\": 3}", "{\"type\": \"pcm_stream\"}",
+                                  "{\"type\": \"audio\"}", "{\"type\": \"audio\", \"data\": [1]}"])
+def test_control_invalido(body):
+    with pytest.raises(ProtocolError):
+        receive(text(body))
+
+@pytest.mark.parametrize("body", ["{not json", "{\"type\": \"audio\", \"data\": \"%%%\"}"])
+def test_json_o_base64_corrupto_es_value_error(body):
+    # El bucle de la sesión descarta cualquier ValueError sin cerrar la conexión
+    with pytest.raises(ValueError):
+        receive(text(body))
+
+def test_audio_legacy():
+    data = base64.b64encode(b"RIFF").decode("ascii")
+    message, audio = receive(text(f"{{\"type\": \"audio\", \"data\": \"{data}\"}}"))
+    assert message["type"] == "audio" and audio == b"RIFF"
+
+def test_control():
+    assert receive(text("{\"type\": \"playback_complete\"}")) == ({"type": "playback_complete"}, None)
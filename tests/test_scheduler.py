@@ -0,0 +1,53 @@
+import asyncio
+from app.services.scheduler import scheduler
+
+def test_dispara_en_orden():
+    async def run():
+        fired = []
+        scheduler.call_later(0.03, lambda: fired.append("b"))
+        scheduler.call_later(0.01, lambda: fired.append("a"))
+        scheduler.call_later(0.03, lambda: fired.append("c"))  # Empate: orden de registro
+        await asyncio.sleep(0.06)
+        return fired
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+    assert len(scheduler) == 0
+
+def test_cancelado_no_dispara():
+    async def run():
+        fired = []
+        deadline = scheduler.call_later(0.01, lambda: fired.append("x"))
+        scheduler.call_later(0.02, lambda: fired.append("y"))
+        deadline.cancel()
+        assert len(scheduler) == 1
+        await asyncio.sleep(0.04)
+        return fired
+
+    assert asyncio.run(run()) == ["y"]
+    assert len(scheduler) == 0
+
+def test_callback_async_y_errores():
+    async def run():
+        fired = []
+
+        async def later():
+            fired.append("async")
+
+        def boom():
+            raise RuntimeError("fallo")
+
+        scheduler.call_later(0.01, boom)  # Un callback que falla no detiene a los demás
+        scheduler.call_later(0.01, later)
+        await asyncio.sleep(0.03)
+        return fired
+
+    assert asyncio.run(run()) == ["async"]
+
+def test_remaining():
+    async def run():
+        deadline = scheduler.call_later(0.5, lambda: None)
+        remaining = deadline.remaining()
+        deadline.cancel()
+        return remaining
+
+    assert 0.4 < asyncio.run(run()) <= 0.5
@@ -0,0 +1,48 @@
+import asyncio
+from app.services.speculation import SpeculativeLLM, normalize_transcript
+
+async def generate(user_msg: str):
+    await asyncio.sleep(0)
+    return f"respuesta a {user_msg}", [{"role": "user", "content": user_msg}]
+
+def run_take(partial: str, final: str, context_at_pause: str = "", context_at_commit: str = ""):
+    async def run():
+        speculation = SpeculativeLLM()
+        speculation.start(partial, partial, generate, context=context_at_pause)
+        await asyncio.sleep(0.01)
+        return await speculation.take(final, context_at_commit), speculation.stats
+
+    return asyncio.run(run())
+
+def test_normalizacion():
+    assert normalize_transcript(" ¿Me duele LA rodílla? ") == "me duele la rodilla"
+
+def test_acierto_devuelve_el_resultado_con_el_payload():
+    hit, stats = run_take("Me duele la rodilla", "me duele la rodilla.")
+    user_msg, (response, messages) = hit
+    assert user_msg == "Me duele la rodilla"
+    assert response == "respuesta a Me duele la rodilla"
+    assert messages[-1]["content"] == user_msg
+    assert stats["hits"] == 1
+
+def test_transcripcion_distinta_es_fallo():
+    hit, stats = run_take("me duele la", "me duele la cabeza")
+    assert hit is None and stats["misses"] == 1
+
+def test_metadatos_cambiados_es_fallo():
+    hit, stats = run_take("cinco", "cinco", "[METADATA: Time spent: 12s]", "[METADATA: Time spent: 13s]")
+    assert hit is None and stats["misses"] == 1
+
+def test_misma_transcripcion_y_contexto_no_relanza():
+    async def run():
+        speculation = SpeculativeLLM()
+        speculation.start("hola", "hola", generate, context="a")
+        first = speculation.task
+        speculation.start("Hola.", "Hola.", generate, context="a")
+        same = speculation.task is first
+        speculation.start("hola", "hola", generate, context="b")
+        relaunched = speculation.task is not first
+        speculation.cancel()
+        return same, relaunched, speculation.stats["attempts"]
+
+    assert asyncio.run(run()) == (True, True, 2)
@@ -0,0 +1,33 @@
+import asyncio
+import pytest
+from app.services import tts as tts_module
+from app.services.tts import TTSService
+from app.services.tts_engines import CircuitBreaker, TTSEngine
+
+class SlowEngine(TTSEngine):
+    name = "slow"
+
+    async def synthesize(self, text: str):
+        await asyncio.sleep(10)
+        return b"", "audio/wav"
+
+def test_tts_engine_es_abstracto():
+    with pytest.raises(TypeError):
+        TTSEngine()
+
+def test_cancelacion_libera_la_prueba_half_open(monkeypatch):
+    engine = SlowEngine()
+    engine.breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0, latency_budget=10.0)
+    engine.breaker.record_failure()
+    monkeypatch.setattr(tts_module, "get_engine_chain", lambda: [engine])
+
+    async def run():
+        task = asyncio.create_task(TTSService._synthesize_chain("hola", None, {}))
+        await asyncio.sleep(0.01)
+        assert engine.breaker.state == CircuitBreaker.HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert engine.breaker.allow()